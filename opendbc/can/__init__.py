@@ -0,0 +1,20 @@
+def preload(dbc_names, max_workers=None):
+  """
+  Parses DBCs concurrently, e.g. the values of a platform's dbc_dict at startup, so the first
+  CANParser, CANPacker and CANDefine of each DBC doesn't parse it. None entries and DBCs that
+  are already parsed are skipped.
+  """
+  from concurrent.futures import ThreadPoolExecutor
+  from opendbc.can.parser import dbc_loaded, load_dbc
+
+  if isinstance(dbc_names, dict):
+    dbc_names = dbc_names.values()
+  names = [name for name in dict.fromkeys(dbc_names) if name is not None and not dbc_loaded(name)]
+  if not names:
+    return
+  with ThreadPoolExecutor(max_workers=max_workers) as pool:
+    found = list(pool.map(load_dbc, names))
+
+  missing = [name for name, ok in zip(names, found, strict=True) if not ok]
+  if missing:
+    raise RuntimeError(f"Can't find DBC: {', '.join(missing)}")
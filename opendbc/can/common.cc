@@ -1,76 +1,16 @@
+#include <algorithm>
 #include <array>
+#include <cstring>
 #include <unordered_map>
 
 #include "opendbc/can/common.h"
 
-unsigned int honda_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
-  int s = 0;
-  bool extended = address > 0x7FF;
-  while (address) { s += (address & 0xF); address >>= 4; }
-  for (int i = 0; i < d.size(); i++) {
-    uint8_t x = d[i];
-    if (i == d.size()-1) x >>= 4; // remove checksum
-    s += (x & 0xF) + (x >> 4);
-  }
-  s = 8-s;
-  if (extended) s += 3;  // extended can
-
-  return s & 0xF;
-}
-
-unsigned int toyota_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
-  unsigned int s = d.size();
-  while (address) { s += address & 0xFF; address >>= 8; }
-  for (int i = 0; i < d.size() - 1; i++) { s += d[i]; }
-
-  return s & 0xFF;
-}
-
-unsigned int subaru_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
-  unsigned int s = 0;
-  while (address) { s += address & 0xFF; address >>= 8; }
-
-  // skip checksum in first byte
-  for (int i = 1; i < d.size(); i++) { s += d[i]; }
-
-  return s & 0xFF;
-}
-
-unsigned int chrysler_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
-  // jeep chrysler canbus checksum from http://illmatics.com/Remote%20Car%20Hacking.pdf
-  uint8_t checksum = 0xFF;
-  for (int j = 0; j < (d.size() - 1); j++) {
-    uint8_t shift = 0x80;
-    uint8_t curr = d[j];
-    for (int i = 0; i < 8; i++) {
-      uint8_t bit_sum = curr & shift;
-      uint8_t temp_chk = checksum & 0x80U;
-      if (bit_sum != 0U) {
-        bit_sum = 0x1C;
-        if (temp_chk != 0U) {
-          bit_sum = 1;
-        }
-        checksum = checksum << 1;
-        temp_chk = checksum | 1U;
-        bit_sum ^= temp_chk;
-      } else {
-        if (temp_chk != 0U) {
-          bit_sum = 0x1D;
-        }
-        checksum = checksum << 1;
-        bit_sum ^= checksum;
-      }
-      checksum = bit_sum;
-      shift = shift >> 1;
-    }
-  }
-  return ~checksum & 0xFF;
-}
-
-// Static lookup table for fast computation of CRCs
+// Static lookup tables for fast computation of CRCs
 uint8_t crc8_lut_8h2f[256]; // CRC8 poly 0x2F, aka 8H2F/AUTOSAR
 uint8_t crc8_lut_j1850[256]; // CRC8 poly 0x1D, aka SAE J1850
+uint8_t crc8_lut_d5[256]; // CRC8 poly 0xD5
 uint16_t crc16_lut_xmodem[256]; // CRC16 poly 0x1021, aka XMODEM
+uint8_t nibble_sum_lut[256]; // sum of both nibbles of a byte
 
 void gen_crc_lookup_table_8(uint8_t poly, uint8_t crc_lut[]) {
   uint8_t crc;
@@ -105,17 +45,59 @@ void gen_crc_lookup_table_16(uint16_t poly, uint16_t crc_lut[]) {
   }
 }
 
-// Initializes CRC lookup tables at module initialization
+// Initializes lookup tables at module initialization
 struct CrcInitializer {
   CrcInitializer() {
     gen_crc_lookup_table_8(0x2F, crc8_lut_8h2f);  // CRC-8 8H2F/AUTOSAR for Volkswagen
     gen_crc_lookup_table_8(0x1D, crc8_lut_j1850);  // CRC-8 SAE-J1850
+    gen_crc_lookup_table_8(0xD5, crc8_lut_d5);  // CRC-8 for the comma pedal and body
     gen_crc_lookup_table_16(0x1021, crc16_lut_xmodem);  // CRC-16 XMODEM for HKG CAN FD
+    for (int i = 0; i < 256; i++) nibble_sum_lut[i] = (i & 0xF) + (i >> 4);  // Honda
   }
 };
 
 static CrcInitializer crcInitializer;
 
+unsigned int honda_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t len) {
+  int s = 0;
+  bool extended = address > 0x7FF;
+  while (address) { s += (address & 0xF); address >>= 4; }
+  for (size_t i = 0; i + 1 < len; i++) { s += nibble_sum_lut[d[i]]; }
+  if (len > 0) s += d[len-1] >> 4;  // remove checksum
+  s = 8-s;
+  if (extended) s += 3;  // extended can
+
+  return s & 0xF;
+}
+
+unsigned int toyota_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t len) {
+  unsigned int s = len;
+  while (address) { s += address & 0xFF; address >>= 8; }
+  for (size_t i = 0; i + 1 < len; i++) { s += d[i]; }
+
+  return s & 0xFF;
+}
+
+unsigned int subaru_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t len) {
+  unsigned int s = 0;
+  while (address) { s += address & 0xFF; address >>= 8; }
+
+  // skip checksum in first byte
+  for (size_t i = 1; i < len; i++) { s += d[i]; }
+
+  return s & 0xFF;
+}
+
+unsigned int chrysler_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t len) {
+  // jeep chrysler canbus checksum from http://illmatics.com/Remote%20Car%20Hacking.pdf
+  // it is CRC-8 SAE J1850 with init 0xFF and an inverted result
+  uint8_t crc = 0xFF;
+  for (size_t i = 0; i + 1 < len; i++) {
+    crc = crc8_lut_j1850[crc ^ d[i]];
+  }
+  return ~crc & 0xFF;
+}
+
 static const std::unordered_map<uint32_t, std::array<uint8_t, 16>> volkswagen_mqb_crc_constants {
   {0x40,  {0x40, 0x40, 0x40, 0x40, 0x40, 0x40, 0x40, 0x40, 0x40, 0x40, 0x40, 0x40, 0x40, 0x40, 0x40, 0x40}},  // Airbag_01
   {0x86,  {0x86, 0x86, 0x86, 0x86, 0x86, 0x86, 0x86, 0x86, 0x86, 0x86, 0x86, 0x86, 0x86, 0x86, 0x86, 0x86}},  // LWI_01
@@ -142,13 +124,13 @@ static const std::unordered_map<uint32_t, std::array<uint8_t, 16>> volkswagen_mq
   {0x65D, {0xAC, 0xB3, 0xAB, 0xEB, 0x7A, 0xE1, 0x3B, 0xF7, 0x73, 0xBA, 0x7C, 0x9E, 0x06, 0x5F, 0x02, 0xD9}},  // ESP_20
 };
 
-unsigned int volkswagen_mqb_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
+unsigned int volkswagen_mqb_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t len) {
   // This is AUTOSAR E2E Profile 2, CRC-8H2F with a "data ID" (varying by message/counter) appended to the payload
 
   uint8_t crc = 0xFF; // CRC-8H2F initial value
 
   // CRC over payload first, skipping the first byte where the CRC lives
-  for (int i = 1; i < d.size(); i++) {
+  for (size_t i = 1; i < len; i++) {
     crc ^= d[i];
     crc = crc8_lut_8h2f[crc];
   }
@@ -166,12 +148,12 @@ unsigned int volkswagen_mqb_checksum(uint32_t address, const Signal &sig, const
   return crc ^ 0xFF; // CRC-8H2F final XOR
 }
 
-unsigned int xor_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
+unsigned int xor_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t len) {
   uint8_t checksum = 0;
-  int checksum_byte = sig.start_bit / 8;
+  size_t checksum_byte = sig.start_bit / 8;
 
   // Simple XOR over the payload, except for the byte where the checksum lives.
-  for (int i = 0; i < d.size(); i++) {
+  for (size_t i = 0; i < len; i++) {
     if (i != checksum_byte) {
       checksum ^= d[i];
     }
@@ -180,28 +162,20 @@ unsigned int xor_checksum(uint32_t address, const Signal &sig, const std::vector
   return checksum;
 }
 
-unsigned int pedal_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
+unsigned int pedal_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t len) {
   uint8_t crc = 0xFF;
-  uint8_t poly = 0xD5; // standard crc8
 
   // skip checksum byte
-  for (int i = d.size()-2; i >= 0; i--) {
-    crc ^= d[i];
-    for (int j = 0; j < 8; j++) {
-      if ((crc & 0x80) != 0) {
-        crc = (uint8_t)((crc << 1) ^ poly);
-      } else {
-        crc <<= 1;
-      }
-    }
+  for (int i = (int)len - 2; i >= 0; i--) {
+    crc = crc8_lut_d5[crc ^ d[i]];
   }
   return crc;
 }
 
-unsigned int hkg_can_fd_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
+unsigned int hkg_can_fd_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t len) {
   uint16_t crc = 0;
 
-  for (int i = 2; i < d.size(); i++) {
+  for (size_t i = 2; i < len; i++) {
     crc = (crc << 8) ^ crc16_lut_xmodem[(crc >> 8) ^ d[i]];
   }
 
@@ -209,24 +183,24 @@ unsigned int hkg_can_fd_checksum(uint32_t address, const Signal &sig, const std:
   crc = (crc << 8) ^ crc16_lut_xmodem[(crc >> 8) ^ ((address >> 0) & 0xFF)];
   crc = (crc << 8) ^ crc16_lut_xmodem[(crc >> 8) ^ ((address >> 8) & 0xFF)];
 
-  if (d.size() == 8) {
+  if (len == 8) {
     crc ^= 0x5f29;
-  } else if (d.size() == 16) {
+  } else if (len == 16) {
     crc ^= 0x041d;
-  } else if (d.size() == 24) {
+  } else if (len == 24) {
     crc ^= 0x819d;
-  } else if (d.size() == 32) {
+  } else if (len == 32) {
     crc ^= 0x9f5b;
   }
 
   return crc;
 }
 
-unsigned int fca_giorgio_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d) {
+unsigned int fca_giorgio_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t len) {
   // CRC is in the last byte, poly is same as SAE J1850 but uses a different init value and final XOR
   uint8_t crc = 0x00;
 
-  for (int i = 0; i < d.size() - 1; i++) {
+  for (size_t i = 0; i + 1 < len; i++) {
     crc ^= d[i];
     crc = crc8_lut_j1850[crc];
   }
@@ -243,3 +217,83 @@ unsigned int fca_giorgio_checksum(uint32_t address, const Signal &sig, const std
   }
 
 }
+
+size_t verify_checksums(uint32_t address, const Signal &sig, const uint8_t *dat, size_t len, size_t stride, size_t n, bool *valid) {
+  size_t count = 0;
+  uint8_t buf[64 + 8] = {};
+  len = std::min<size_t>(len, 64);
+  for (size_t i = 0; i < n; i++) {
+    // padded copy so the checksum signal can be loaded without bounds checks
+    const uint8_t *frame = dat + i * stride;
+    std::memcpy(buf, frame, len);
+    valid[i] = sig.calc_checksum(address, sig, frame, len) == get_raw_value(buf, len, sig);
+    count += valid[i];
+  }
+  return count;
+}
+
+// Reference implementations the table-driven checksums are checked against
+
+unsigned int honda_checksum_bytewise(uint32_t address, const Signal &sig, const uint8_t *d, size_t len) {
+  int s = 0;
+  bool extended = address > 0x7FF;
+  while (address) { s += (address & 0xF); address >>= 4; }
+  for (size_t i = 0; i < len; i++) {
+    uint8_t x = d[i];
+    if (i == len-1) x >>= 4; // remove checksum
+    s += (x & 0xF) + (x >> 4);
+  }
+  s = 8-s;
+  if (extended) s += 3;  // extended can
+
+  return s & 0xF;
+}
+
+unsigned int chrysler_checksum_bitwise(uint32_t address, const Signal &sig, const uint8_t *d, size_t len) {
+  // jeep chrysler canbus checksum from http://illmatics.com/Remote%20Car%20Hacking.pdf
+  uint8_t checksum = 0xFF;
+  for (size_t j = 0; j + 1 < len; j++) {
+    uint8_t shift = 0x80;
+    uint8_t curr = d[j];
+    for (int i = 0; i < 8; i++) {
+      uint8_t bit_sum = curr & shift;
+      uint8_t temp_chk = checksum & 0x80U;
+      if (bit_sum != 0U) {
+        bit_sum = 0x1C;
+        if (temp_chk != 0U) {
+          bit_sum = 1;
+        }
+        checksum = checksum << 1;
+        temp_chk = checksum | 1U;
+        bit_sum ^= temp_chk;
+      } else {
+        if (temp_chk != 0U) {
+          bit_sum = 0x1D;
+        }
+        checksum = checksum << 1;
+        bit_sum ^= checksum;
+      }
+      checksum = bit_sum;
+      shift = shift >> 1;
+    }
+  }
+  return ~checksum & 0xFF;
+}
+
+unsigned int pedal_checksum_bitwise(uint32_t address, const Signal &sig, const uint8_t *d, size_t len) {
+  uint8_t crc = 0xFF;
+  uint8_t poly = 0xD5; // standard crc8
+
+  // skip checksum byte
+  for (int i = (int)len - 2; i >= 0; i--) {
+    crc ^= d[i];
+    for (int j = 0; j < 8; j++) {
+      if ((crc & 0x80) != 0) {
+        crc = (uint8_t)((crc << 1) ^ poly);
+      } else {
+        crc <<= 1;
+      }
+    }
+  }
+  return crc;
+}
@@ -1,8 +1,15 @@
 #pragma once
 
+#include <algorithm>
+#include <atomic>
+#include <functional>
+#include <list>
 #include <map>
+#include <memory>
+#include <queue>
 #include <set>
 #include <string>
+#include <string_view>
 #include <utility>
 #include <unordered_map>
 #include <vector>
@@ -17,17 +24,38 @@
 
 #define MAX_BAD_COUNTER 5
 #define CAN_INVALID_CNT 5
+#define HISTORY_SIZE 16
+#define PACK_CACHE_SIZE 32
+#define PROFILE_MAX_EVENTS (1 << 20)
+#define PROFILE_NO_ADDRESS 0xFFFFFFFFU
 
 // Car specific functions
-unsigned int honda_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d);
-unsigned int toyota_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d);
-unsigned int subaru_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d);
-unsigned int chrysler_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d);
-unsigned int volkswagen_mqb_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d);
-unsigned int xor_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d);
-unsigned int hkg_can_fd_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d);
-unsigned int fca_giorgio_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d);
-unsigned int pedal_checksum(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d);
+unsigned int honda_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t len);
+unsigned int toyota_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t len);
+unsigned int subaru_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t len);
+unsigned int chrysler_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t len);
+unsigned int volkswagen_mqb_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t len);
+unsigned int xor_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t len);
+unsigned int hkg_can_fd_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t len);
+unsigned int fca_giorgio_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t len);
+unsigned int pedal_checksum(uint32_t address, const Signal &sig, const uint8_t *d, size_t len);
+
+// The original bit- and byte-serial checksums, reference implementations for the table-driven ones
+unsigned int honda_checksum_bytewise(uint32_t address, const Signal &sig, const uint8_t *d, size_t len);
+unsigned int chrysler_checksum_bitwise(uint32_t address, const Signal &sig, const uint8_t *d, size_t len);
+unsigned int pedal_checksum_bitwise(uint32_t address, const Signal &sig, const uint8_t *d, size_t len);
+
+// Checks the checksums of n frames of one message, each len bytes and stride bytes apart.
+// Sets valid[i] per frame and returns the number of valid frames.
+size_t verify_checksums(uint32_t address, const Signal &sig, const uint8_t *dat, size_t len, size_t stride, size_t n, bool *valid);
+
+// Signal extraction and insertion. dat must be readable/writable for 8 bytes past each signal's
+// plan_offset (a 64 + 8 byte buffer), len is the payload length. The bytewise variants are the
+// reference implementation, used for signals without a single-window plan or truncated payloads.
+int64_t get_raw_value(const uint8_t *dat, size_t len, const Signal &sig);
+int64_t get_raw_value_bytewise(const uint8_t *dat, size_t len, const Signal &sig);
+void set_value(uint8_t *dat, size_t len, const Signal &sig, int64_t ival);
+void set_value_bytewise(uint8_t *dat, size_t len, const Signal &sig, int64_t ival);
 
 struct CanFrame {
   long src;
@@ -40,18 +68,75 @@ struct CanData {
   std::vector<CanFrame> frames;
 };
 
+// fixed-size frame record for bulk ingestion, layout must match CAN_FRAME_DTYPE in parser_pyx.pyx
+struct CanFrameRecord {
+  uint64_t nanos;
+  uint32_t address;
+  uint8_t src;
+  uint8_t len;
+  uint8_t dat[64];
+};
+
+// Fixed-capacity history of a message's decoded values and frame timestamps. Samples are appended
+// to rows of twice the capacity, and the newest capacity samples are moved back to the front when a
+// row is full, so the last n <= capacity samples are always contiguous.
+// Values are signal-major, signal i occupies vals[i * 2 * capacity, (i + 1) * 2 * capacity).
+class SignalHistory {
+public:
+  SignalHistory(size_t num_signals, size_t capacity);
+
+  size_t num_signals;
+  size_t capacity;
+  uint64_t count = 0;  // samples written, including overwritten ones
+  size_t end = 0;  // row offset after the newest sample
+  std::vector<double> vals;
+  std::vector<uint64_t> nanos;
+
+  void push(uint64_t nanos, const double *sample);
+  size_t size() const { return std::min<uint64_t>(count, capacity); }
+  // offset of the first of the last n samples within a signal's row and nanos
+  size_t start(size_t n) const { return end - n; }
+  const double *values(size_t sig, size_t n) const { return vals.data() + sig * 2 * capacity + start(n); }
+};
+
+// Streaming receive statistics of a message, counted from every frame including those failing checks.
+// Jitter is the deviation of each inter-arrival interval from the interval EWMA, binned by powers of two:
+// bin 0 holds deviations under 1us, bin k those in [2^(k-1), 2^k) us.
+struct MessageStats {
+  static constexpr int JITTER_BINS = 32;
+  static constexpr double EWMA_ALPHA = 1.0 / 32;
+
+  uint64_t frames = 0;
+  uint64_t checksum_failures = 0;
+  uint64_t counter_skips = 0;  // frames whose COUNTER wasn't the previous one + 1
+  uint64_t last_nanos = 0;
+  double interval_ewma = 0;  // nanos, 0 until two frames were seen
+  uint64_t jitter_bins[JITTER_BINS] = {};
+
+  void add_frame(uint64_t nanos, bool checksum_valid);
+  // upper edge of the bin holding the q quantile of the jitter, in nanos
+  uint64_t jitter_quantile(double q) const;
+};
+
 class MessageState {
 public:
-  std::string name;
+  const Msg *msg;  // in the shared DBC
+  std::vector<const Signal*> parse_sigs;  // decoded signals in msg->sigs order, all of them unless subscribed
   uint32_t address;
   unsigned int size;
 
-  std::vector<Signal> parse_sigs;
   std::vector<double> vals;
-  std::vector<std::vector<double>> all_vals;
+  std::vector<double> tmp_vals;  // decode scratch, values are only committed if checks pass
+
+  // the last history_size valid samples, views may hold on to it
+  std::shared_ptr<SignalHistory> history;
+  // every valid sample of the current update for vl_all, sample-major
+  std::vector<double> update_vals;
+  size_t update_samples;
 
   uint64_t last_seen_nanos;
   uint64_t check_threshold;
+  bool timed_out;  // missing or not seen within check_threshold, maintained by CANParser
 
   uint8_t counter;
   uint8_t counter_fail;
@@ -59,15 +144,52 @@ public:
   bool ignore_checksum = false;
   bool ignore_counter = false;
 
+  // set when a sample's value of parse_sigs[i] differs from the previous one, cleared every update.
+  // every signal changes with the first valid sample
+  bool track_changes = false;
+  bool has_sample = false;
+  std::vector<uint8_t> changed;
+
+  std::unique_ptr<MessageStats> stats;  // null unless enabled by CANParser::trackStats
+
+  // last decoded payload. when only the COUNTER and CHECKSUM bytes changed, the other signals'
+  // values are reused and only the signals in those bytes are decoded
+  uint8_t memo_dat[64 + 8] = {};
+  uint8_t memo_mask[64 + 8] = {};  // 0 for bytes of check signals
+  size_t memo_len = 0;
+  bool memo_valid = false;
+  std::vector<uint8_t> memo_decode;  // parse_sigs[i] is in a check signal's bytes
+  std::vector<double> memo_vals;
+  uint64_t memo_hits = 0;
+  uint64_t memo_misses = 0;
+
+  void init_memo();
+
   bool parse(uint64_t nanos, const std::vector<uint8_t> &dat);
+  // decodes all signals into out[i * stride] without updating vals, counter state is still advanced
+  void decode(const std::vector<uint8_t> &dat, double *out, size_t stride, bool &checksum_valid, bool &counter_valid);
   bool update_counter_generic(int64_t v, int cnt_size);
 };
 
 class CANParser {
+  friend class CANParserGroup;
+
 private:
   const int bus;
+  const size_t history_size;  // samples kept per message
   const DBC *dbc = NULL;
-  std::unordered_map<uint32_t, MessageState> message_states;
+  std::vector<MessageState> message_states;  // sorted by address
+  std::vector<int> std_address_index;  // 11-bit address -> index in message_states, -1 if not parsed
+  std::vector<bool> updated;  // per message state, parsed during the current update
+  std::vector<int> updated_indices;
+
+  // incremental validity: the next timeout deadline of every checked message that is not timed out,
+  // and running counts of timed out messages and messages with too many counter failures
+  std::priority_queue<std::pair<uint64_t, int>, std::vector<std::pair<uint64_t, int>>, std::greater<>> deadlines;
+  uint64_t last_valid_nanos = 0;
+  bool recheck_timeouts = false;  // time went backwards, rescan until it passes every last_seen_nanos again
+  int timed_out_count = 0;
+  int counter_fail_count = 0;
 
 public:
   bool can_valid = false;
@@ -77,25 +199,166 @@ public:
   uint64_t bus_timeout_threshold = 0;
   uint64_t can_invalid_cnt = CAN_INVALID_CNT;
 
+  // signals optionally limits the decoded signals of a message, its COUNTER and CHECKSUM are always decoded
   CANParser(int abus, const std::string& dbc_name,
-            const std::vector<std::pair<uint32_t, int>> &messages);
+            const std::vector<std::pair<uint32_t, int>> &messages, size_t ahistory_size = HISTORY_SIZE,
+            const std::unordered_map<uint32_t, std::vector<std::string>> &signals = {});
   CANParser(int abus, const std::string& dbc_name, bool ignore_checksum, bool ignore_counter);
-  std::set<uint32_t> update(const std::vector<CanData> &can_data);
-  MessageState *getMessageState(uint32_t address) { return &message_states.at(address); }
+  // return the sorted addresses of messages updated by these frames
+  std::vector<uint32_t> update(const std::vector<CanData> &can_data);
+  std::vector<uint32_t> update(const CanFrameRecord *frames, size_t count);
+  MessageState *getMessageState(uint32_t address);
+  // report the signals whose value changed in an update, as (address, parse_sigs index) sorted by address
+  void trackChanges(bool enable);
+  // frames decoded from the previous payload's values, see MessageState::memo_dat
+  std::pair<uint64_t, uint64_t> memoStats() const;
+  // keep MessageState::stats of every message, enabling resets them
+  void trackStats(bool enable);
+  std::vector<std::pair<uint32_t, int>> changes() const;
 
 protected:
-  void UpdateCans(const CanData &can, std::set<uint32_t> &updated_addresses);
+  std::vector<uint8_t> frame_dat;  // reused payload buffer for bulk ingestion
+
+  void BuildIndex();
+  int StateIndex(uint32_t address) const;
+  void ClearAllValues();
+  void ParseFrame(int idx, uint64_t nanos, const std::vector<uint8_t> &dat);
+  std::vector<uint32_t> UpdatedAddresses();
+  void UpdateCans(const CanData &can);
+  void UpdateBusTimeout(uint64_t nanos, bool bus_empty);
   void UpdateValid(uint64_t nanos);
+  void RecheckTimeouts(uint64_t nanos);
+};
+
+// Updates several parsers, e.g. one per bus, from one batch of frames. Every frame is routed to
+// the parsers on its bus in a single pass, each parser keeps its own values and validity.
+class CANParserGroup {
+private:
+  std::vector<CANParser*> parsers;  // not owned
+  std::vector<std::vector<int>> bus_parsers;  // bus -> indices into parsers
+  std::vector<bool> bus_empty;  // per parser, during the current step
+
+public:
+  CANParserGroup(const std::vector<CANParser*> &aparsers);
+  // return the sorted addresses of updated messages for each parser
+  std::vector<std::vector<uint32_t>> update(const std::vector<CanData> &can_data);
+};
+
+// A message with its signals resolved once by CANPacker::prepare, values are passed in the same order.
+// Only valid while its packer is alive.
+struct PreparedMessage {
+  uint32_t address;
+  size_t size;
+  std::vector<const Signal*> sigs;
+  bool counter_set;  // COUNTER is one of sigs
+  const Signal *counter;
+  const Signal *checksum;
+};
+
+// The last values packed for an address and their payload before the counter and checksum. COUNTER and
+// a computed CHECKSUM are set on every pack, they're not part of values.
+struct PackCacheEntry {
+  std::vector<SignalPackValue> values;
+  uint8_t dat[64 + 8];
+  const Signal *counter_sig;
+  const Signal *checksum_sig;
+  std::list<uint32_t>::iterator lru;
+
+  bool key_signal(const SignalPackValue &v) const {
+    return v.name != "COUNTER" && !(v.name == "CHECKSUM" && checksum_sig != nullptr && checksum_sig->calc_checksum != nullptr);
+  }
+  // sets counter to an explicit COUNTER value, if any
+  bool matches(const std::vector<SignalPackValue> &signals, const SignalPackValue *&counter) const;
 };
 
 class CANPacker {
 private:
   const DBC *dbc = NULL;
-  std::map<std::pair<uint32_t, std::string>, Signal> signal_lookup;
+  std::map<std::pair<uint32_t, std::string_view>, const Signal*> signal_lookup;  // names are owned by the DBC
   std::map<uint32_t, uint32_t> counters;
 
+  // messages sent with the same values frame after frame only get a new counter and checksum
+  const size_t cache_size;
+  std::unordered_map<uint32_t, PackCacheEntry> cache;
+  std::list<uint32_t> cache_lru;  // most recently used first
+
+  const Signal *lookup_signal(uint32_t address, const std::string &name) const;
+  void cache_store(uint32_t address, const std::vector<SignalPackValue> &signals, const uint8_t *dat, size_t size,
+                   const Signal *counter_sig, const Signal *checksum_sig);
+  void set_values(const PreparedMessage &msg, const double *values, uint8_t *dat);
+  void finish(uint32_t address, uint8_t *dat, size_t size, bool counter_set,
+              const Signal *counter, const Signal *checksum);
+
 public:
-  CANPacker(const std::string& dbc_name);
+  uint64_t cache_hits = 0;
+  uint64_t cache_misses = 0;
+
+  CANPacker(const std::string& dbc_name, size_t acache_size = PACK_CACHE_SIZE);
   std::vector<uint8_t> pack(uint32_t address, const std::vector<SignalPackValue> &values);
+  std::vector<std::vector<uint8_t>> pack(const std::vector<std::pair<uint32_t, std::vector<SignalPackValue>>> &msgs);
+  PreparedMessage prepare(uint32_t address, const std::vector<std::string> &signal_names) const;
+  std::vector<uint8_t> pack(const PreparedMessage &msg, const double *values);
+  // n frames from row-major values, written to out as n * msg.size bytes
+  void pack(const PreparedMessage &msg, const double *values, size_t n, uint8_t *out);
   const Msg* lookup_message(uint32_t address);
 };
+
+// Runtime switchable timing of the parser and packer hot paths. While profiling is off a hook is a
+// single relaxed load. Events are kept in memory, up to PROFILE_MAX_EVENTS, and timed in steady clock nanos.
+struct ProfileEvent {
+  const char *name;  // static strings
+  const char *category;
+  uint32_t address;  // PROFILE_NO_ADDRESS if not for one message
+  uint32_t tid;  // small per thread id
+  uint64_t start;
+  uint64_t duration;
+};
+
+extern std::atomic<bool> profile_enabled;
+inline bool profiling() { return profile_enabled.load(std::memory_order_relaxed); }
+// enabling clears the recorded events
+void profile_enable(bool enable);
+uint64_t profile_clock();
+void profile_record(const char *name, const char *category, uint32_t address, uint64_t start, uint64_t end);
+std::vector<ProfileEvent> profile_events();
+uint64_t profile_dropped();  // events over PROFILE_MAX_EVENTS since profiling was enabled
+
+// times its own lifetime while profiling is on
+class ProfileScope {
+public:
+  ProfileScope(const char *aname, const char *acategory, uint32_t aaddress = PROFILE_NO_ADDRESS)
+    : name(aname), category(acategory), address(aaddress),
+      start(profiling() ? profile_clock() : 0) {}
+  ~ProfileScope() {
+    if (start != 0) {
+      profile_record(name, category, address, start, profile_clock());
+    }
+  }
+
+private:
+  const char *name;
+  const char *category;
+  uint32_t address;
+  uint64_t start;
+};
+
+inline const char *checksum_profile_name(SignalType type) {
+  switch (type) {
+    case HONDA_CHECKSUM: return "honda_checksum";
+    case TOYOTA_CHECKSUM: return "toyota_checksum";
+    case PEDAL_CHECKSUM: return "pedal_checksum";
+    case VOLKSWAGEN_MQB_CHECKSUM: return "volkswagen_mqb_checksum";
+    case XOR_CHECKSUM: return "xor_checksum";
+    case SUBARU_CHECKSUM: return "subaru_checksum";
+    case CHRYSLER_CHECKSUM: return "chrysler_checksum";
+    case HKG_CAN_FD_CHECKSUM: return "hkg_can_fd_checksum";
+    case FCA_GIORGIO_CHECKSUM: return "fca_giorgio_checksum";
+    default: return "checksum";
+  }
+}
+
+// calc_checksum of a signal, profiled per algorithm
+inline unsigned int profiled_checksum(uint32_t address, const Signal &sig, const uint8_t *dat, size_t len) {
+  ProfileScope scope(checksum_profile_name(sig.type), "checksum", address);
+  return sig.calc_checksum(address, sig, dat, len);
+}
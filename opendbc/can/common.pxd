@@ -1,16 +1,16 @@
 # distutils: language = c++
 # cython: language_level=3
 
-from libc.stdint cimport uint8_t, uint32_t, uint64_t
+from libc.stdint cimport uint8_t, uint32_t, int64_t, uint64_t
 from libcpp cimport bool
+from libcpp.memory cimport shared_ptr, unique_ptr
 from libcpp.pair cimport pair
-from libcpp.set cimport set
 from libcpp.string cimport string
 from libcpp.vector cimport vector
 from libcpp.unordered_map cimport unordered_map
 
 
-ctypedef unsigned int (*calc_checksum_type)(uint32_t, const Signal&, const vector[uint8_t] &)
+ctypedef unsigned int (*calc_checksum_type)(uint32_t, const Signal&, const uint8_t *, size_t)
 
 cdef extern from "common_dbc.h":
   ctypedef enum SignalType:
@@ -45,7 +45,8 @@ cdef extern from "common_dbc.h":
     string name
     uint32_t address
     string def_val
-    vector[Signal] sigs
+    vector[pair[int64_t, string]] defs
+    bool defs_parsed
 
   cdef struct DBC:
     string name
@@ -60,13 +61,58 @@ cdef extern from "common_dbc.h":
 
 
 cdef extern from "common.h":
-  cdef const DBC* dbc_lookup(const string) except +
+  cdef const DBC* dbc_lookup(const string) except + nogil
+  cdef bool dbc_loaded(const string)
+  cdef size_t verify_checksums(uint32_t, const Signal&, const uint8_t*, size_t, size_t, size_t, bool*) nogil
+  cdef unsigned int honda_checksum_bytewise(uint32_t, const Signal&, const uint8_t*, size_t)
+  cdef unsigned int chrysler_checksum_bitwise(uint32_t, const Signal&, const uint8_t*, size_t)
+  cdef unsigned int pedal_checksum_bitwise(uint32_t, const Signal&, const uint8_t*, size_t)
+
+  cdef int HISTORY_SIZE
+  cdef uint32_t PROFILE_NO_ADDRESS
+
+  cdef struct ProfileEvent:
+    const char *name
+    const char *category
+    uint32_t address
+    uint32_t tid
+    uint64_t start
+    uint64_t duration
+
+  cdef void profile_enable(bool)
+  cdef bool profiling() nogil
+  cdef uint64_t profile_clock() nogil
+  cdef void profile_record(const char*, const char*, uint32_t, uint64_t, uint64_t) nogil
+  cdef vector[ProfileEvent] profile_events()
+  cdef uint64_t profile_dropped()
+
+  cdef cppclass SignalHistory:
+    size_t num_signals
+    size_t capacity
+    vector[double] vals
+    vector[uint64_t] nanos
+    size_t size()
+    size_t start(size_t)
+    const double *values(size_t, size_t)
+
+  cdef cppclass MessageStats:
+    uint64_t frames
+    uint64_t checksum_failures
+    uint64_t counter_skips
+    double interval_ewma
+    uint64_t jitter_quantile(double)
 
   cdef cppclass MessageState:
-    vector[Signal] parse_sigs
+    const Msg *msg
+    vector[const Signal*] parse_sigs
+    uint32_t address
     vector[double] vals
-    vector[vector[double]] all_vals
+    shared_ptr[SignalHistory] history
+    vector[double] update_vals
+    size_t update_samples
     uint64_t last_seen_nanos
+    unique_ptr[MessageStats] stats
+    void decode(const vector[uint8_t]&, double*, size_t, bool&, bool&) nogil
 
   cdef struct CanFrame:
     long src
@@ -77,13 +123,43 @@ cdef extern from "common.h":
     uint64_t nanos
     vector[CanFrame] frames
 
+  cdef struct CanFrameRecord:
+    uint64_t nanos
+    uint32_t address
+    uint8_t src
+    uint8_t len
+    uint8_t dat[64]
+
   cdef cppclass CANParser:
     bool can_valid
     bool bus_timeout
-    CANParser(int, string, vector[pair[uint32_t, int]]) except +
-    set[uint32_t] update(vector[CanData]&) except +
-    MessageState *getMessageState(uint32_t address)
+    CANParser(int, string, vector[pair[uint32_t, int]]) except + nogil
+    CANParser(int, string, vector[pair[uint32_t, int]], size_t) except + nogil
+    CANParser(int, string, vector[pair[uint32_t, int]], size_t, unordered_map[uint32_t, vector[string]]) except + nogil
+    vector[uint32_t] update(vector[CanData]&) except + nogil
+    vector[uint32_t] update(const CanFrameRecord*, size_t) except + nogil
+    MessageState *getMessageState(uint32_t address) except +
+    void trackChanges(bool)
+    vector[pair[uint32_t, int]] changes()
+    pair[uint64_t, uint64_t] memoStats()
+    void trackStats(bool)
+
+  cdef cppclass CANParserGroup:
+    CANParserGroup(vector[CANParser*]) except +
+    vector[vector[uint32_t]] update(vector[CanData]&) except + nogil
+
+  cdef cppclass PreparedMessage:
+    uint32_t address
+    size_t size
+
+  cdef int PACK_CACHE_SIZE
 
   cdef cppclass CANPacker:
-   CANPacker(string)
-   vector[uint8_t] pack(uint32_t, vector[SignalPackValue]&)
+   uint64_t cache_hits
+   uint64_t cache_misses
+   CANPacker(string, size_t) nogil
+   vector[uint8_t] pack(uint32_t, vector[SignalPackValue]&) nogil
+   vector[vector[uint8_t]] pack(vector[pair[uint32_t, vector[SignalPackValue]]]&) nogil
+   PreparedMessage prepare(uint32_t, vector[string]&) except +
+   vector[uint8_t] pack(const PreparedMessage&, const double*) nogil
+   void pack(const PreparedMessage&, const double*, size_t, uint8_t*) nogil
@@ -3,6 +3,7 @@
 #include <cstdint>
 #include <string>
 #include <unordered_map>
+#include <utility>
 #include <vector>
 
 struct SignalPackValue {
@@ -31,7 +32,16 @@ struct Signal {
   double factor, offset;
   bool is_little_endian;
   SignalType type;
-  unsigned int (*calc_checksum)(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d);
+  unsigned int (*calc_checksum)(uint32_t address, const Signal &sig, const uint8_t *d, size_t len);
+
+  // extraction plan: the signal is read from one 64-bit window of the payload
+  bool plan_fast;         // signal fits in a single window, else use the bytewise path
+  bool plan_swap;         // window is byte-swapped (big endian signal)
+  int plan_offset;        // first payload byte of the window
+  int plan_end;           // payload bytes needed for the window to cover the signal
+  int plan_shift;         // right shift from the window to the signal's lsb
+  uint64_t plan_mask;     // mask of size bits
+  uint64_t plan_sign;     // sign bit for sign extension, 0 if unsigned
 };
 
 struct Msg {
@@ -45,7 +55,8 @@ struct Val {
   std::string name;
   uint32_t address;
   std::string def_val;
-  std::vector<Signal> sigs;
+  std::vector<std::pair<int64_t, std::string>> defs;  // value and description pairs from def_val
+  bool defs_parsed = false;  // false when a value in def_val isn't an int64, defs is then empty
 };
 
 struct DBC {
@@ -63,10 +74,22 @@ typedef struct ChecksumState {
   int counter_start_bit;
   bool little_endian;
   SignalType checksum_type;
-  unsigned int (*calc_checksum)(uint32_t address, const Signal &sig, const std::vector<uint8_t> &d);
+  unsigned int (*calc_checksum)(uint32_t address, const Signal &sig, const uint8_t *d, size_t len);
 } ChecksumState;
 
+ChecksumState* get_checksum(const std::string& dbc_name);
+void set_signal_type(Signal& s, ChecksumState* chk, const std::string& dbc_name, int line_num);
+void set_signal_plan(Signal &s);
+void set_value_defs(Val &val);
+
+// binary cache of parsed DBCs, see dbc_cache.cc
+uint64_t dbc_content_hash(const std::string &content);
+std::string dbc_cache_dir();
+DBC* dbc_cache_load(const std::string &dir, const std::string &dbc_name, uint64_t hash);
+void dbc_cache_store(const std::string &dir, const DBC &dbc, uint64_t hash);
+
 DBC* dbc_parse(const std::string& dbc_path);
 DBC* dbc_parse_from_stream(const std::string &dbc_name, std::istream &stream, ChecksumState *checksum = nullptr, bool allow_duplicate_msg_name=false);
 const DBC* dbc_lookup(const std::string& dbc_name);
+bool dbc_loaded(const std::string& dbc_name);  // whether dbc_lookup already parsed it, never parses
 std::vector<std::string> get_dbc_names();
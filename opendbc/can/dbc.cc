@@ -1,24 +1,145 @@
 #include <algorithm>
+#include <atomic>
+#include <charconv>
+#include <cmath>
 #include <filesystem>
 #include <fstream>
 #include <map>
-#include <regex>
 #include <set>
 #include <sstream>
 #include <vector>
 #include <mutex>
 #include <iterator>
 #include <cstring>
-#include <clocale>
 
 #include "opendbc/can/common.h"
 #include "opendbc/can/common_dbc.h"
 
-std::regex bo_regexp(R"(^BO_ (\w+) (\w+) *: (\w+) (\w+))");
-std::regex sg_regexp(R"(^SG_ (\w+) : (\d+)\|(\d+)@(\d+)([\+|\-]) \(([0-9.+\-eE]+),([0-9.+\-eE]+)\) \[([0-9.+\-eE]+)\|([0-9.+\-eE]+)\] \"(.*)\" (.*))");
-std::regex sgm_regexp(R"(^SG_ (\w+) (\w+) *: (\d+)\|(\d+)@(\d+)([\+|\-]) \(([0-9.+\-eE]+),([0-9.+\-eE]+)\) \[([0-9.+\-eE]+)\|([0-9.+\-eE]+)\] \"(.*)\" (.*))");
-std::regex val_regexp(R"(VAL_ (\w+) (\w+) (\s*[-+]?[0-9]+\s+\".+?\"[^;]*))");
-std::regex val_split_regexp{R"([\"]+)"};  // split on "
+namespace {
+
+bool is_word(char c) { return (c >= 'a' && c <= 'z') || (c >= 'A' && c <= 'Z') || (c >= '0' && c <= '9') || c == '_'; }
+bool is_digit(char c) { return c >= '0' && c <= '9'; }
+bool is_number(char c) { return is_digit(c) || c == '.' || c == '+' || c == '-' || c == 'e' || c == 'E'; }
+bool is_space(char c) { return c == ' ' || c == '\t' || c == '\n' || c == '\v' || c == '\f' || c == '\r'; }
+
+// Cursor over one DBC line. Each method matches a token at the cursor and only advances past it
+// on success, the grammars below are written as chains of these.
+class LineLexer {
+public:
+  LineLexer(const std::string &text, size_t apos = 0) : line(text), pos(apos) {}
+
+  bool literal(const char *s) {
+    const size_t n = strlen(s);
+    if (line.compare(pos, n, s) != 0) return false;
+    pos += n;
+    return true;
+  }
+  bool one_of(const char *chars, char *out = nullptr) {
+    if (pos == line.size() || !strchr(chars, line[pos])) return false;
+    if (out) *out = line[pos];
+    pos++;
+    return true;
+  }
+  // one or more characters matching pred
+  bool span(bool (*pred)(char), std::string *out = nullptr) {
+    size_t end = pos;
+    while (end < line.size() && pred(line[end])) end++;
+    if (end == pos) return false;
+    if (out) out->assign(line, pos, end - pos);
+    pos = end;
+    return true;
+  }
+  bool word(std::string *out = nullptr) { return span(is_word, out); }
+  bool digits(std::string *out = nullptr) { return span(is_digit, out); }
+  bool number(std::string *out = nullptr) { return span(is_number, out); }
+  bool spaces() {
+    while (pos < line.size() && line[pos] == ' ') pos++;
+    return true;
+  }
+  // skip at least min_skip characters up to and past s, without crossing a line break
+  bool skip_past(const char *s, size_t min_skip = 0) {
+    const size_t found = line.find(s, pos + min_skip);
+    if (found == std::string::npos || line.find_first_of("\r\n", pos) < found) return false;
+    pos = found + strlen(s);
+    return true;
+  }
+  bool done() const { return pos == line.size(); }
+
+  const std::string &line;
+  size_t pos;
+};
+
+// BO_ <address> <name> *: <size> <transmitter>
+bool lex_message(const std::string &line, std::string &address, std::string &name, std::string &size) {
+  LineLexer lex(line);
+  return lex.literal("BO_ ") && lex.word(&address) && lex.literal(" ") && lex.word(&name) && lex.spaces() &&
+         lex.literal(": ") && lex.word(&size) && lex.literal(" ") && lex.word() && lex.done();
+}
+
+struct SignalTokens {
+  std::string name, start_bit, size, endianness, factor, offset;
+  char sign;
+};
+
+// SG_ <name> [<multiplexer> *]: <start>|<size>@<endianness><sign> (<factor>,<offset>) [<min>|<max>] "<unit>" <receivers>
+bool lex_signal(const std::string &line, SignalTokens &t) {
+  LineLexer lex(line);
+  if (!lex.literal("SG_ ") || !lex.word(&t.name)) return false;
+  if (!lex.literal(" : ") && !(lex.literal(" ") && lex.word() && lex.spaces() && lex.literal(": "))) return false;
+  return lex.digits(&t.start_bit) && lex.literal("|") && lex.digits(&t.size) && lex.literal("@") &&
+         lex.digits(&t.endianness) && lex.one_of("+|-", &t.sign) && lex.literal(" (") && lex.number(&t.factor) &&
+         lex.literal(",") && lex.number(&t.offset) && lex.literal(") [") && lex.number() && lex.literal("|") &&
+         lex.number() && lex.literal("] \"") && lex.skip_past("\" ");
+}
+
+// VAL_ <address> <signal> <value> "<description>" ... ;
+// found anywhere in the line, defs runs from the first value up to the next ';'
+bool lex_values(const std::string &line, std::string &address, std::string &name, std::string &defs) {
+  for (size_t start = line.find("VAL_ "); start != std::string::npos; start = line.find("VAL_ ", start + 1)) {
+    LineLexer lex(line, start);
+    if (!lex.literal("VAL_ ") || !lex.word(&address) || !lex.literal(" ") || !lex.word(&name) || !lex.literal(" ")) continue;
+
+    const size_t defs_start = lex.pos;
+    while (lex.pos < line.size() && is_space(line[lex.pos])) lex.pos++;
+    lex.one_of("+-");
+    if (lex.digits() && lex.span(is_space) && lex.literal("\"") && lex.skip_past("\"", 1)) {
+      const size_t defs_end = line.find(';', lex.pos);
+      defs = line.substr(defs_start, defs_end == std::string::npos ? std::string::npos : defs_end - defs_start);
+      return true;
+    }
+  }
+  return false;
+}
+
+// split on runs of ", a trailing empty piece is dropped
+std::vector<std::string> split_values(const std::string &defs) {
+  std::vector<std::string> words;
+  size_t start = 0;
+  while (start < defs.size()) {
+    const size_t quote = defs.find('"', start);
+    words.push_back(defs.substr(start, quote == std::string::npos ? std::string::npos : quote - start));
+    start = quote == std::string::npos ? quote : defs.find_first_not_of('"', quote);
+  }
+  return words;
+}
+
+// std::stod without the locale, DBCs are parsed concurrently and setlocale isn't thread safe
+double parse_double(const std::string &s) {
+  const char *first = s.data(), *last = s.data() + s.size();
+  if (first != last && *first == '+' && last - first > 1 && first[1] != '-' && first[1] != '+') {
+    first++;
+  }
+  double value;
+  auto [ptr, ec] = std::from_chars(first, last, value);
+  if (ec == std::errc::invalid_argument) {
+    throw std::invalid_argument("stod");
+  } else if (ec == std::errc::result_out_of_range || std::fpclassify(value) == FP_SUBNORMAL) {
+    throw std::out_of_range("stod");
+  }
+  return value;
+}
+
+}  // namespace
 
 #define DBC_ASSERT(condition, message)                             \
   do {                                                             \
@@ -101,6 +222,47 @@ void set_signal_type(Signal& s, ChecksumState* chk, const std::string& dbc_name,
   }
 }
 
+void set_signal_plan(Signal &s) {
+  s.plan_mask = s.size < 64 ? (1ULL << s.size) - 1 : ~0ULL;
+  s.plan_sign = s.is_signed ? 1ULL << (s.size - 1) : 0;
+  s.plan_swap = !s.is_little_endian;
+  if (s.is_little_endian) {
+    s.plan_offset = s.lsb / 8;
+    s.plan_end = s.msb / 8 + 1;
+    s.plan_shift = s.lsb % 8;
+  } else {
+    // after the byte swap, byte plan_offset holds the window's most significant bits
+    s.plan_offset = s.msb / 8;
+    s.plan_end = s.lsb / 8 + 1;
+    s.plan_shift = (7 - (s.lsb / 8 - s.plan_offset)) * 8 + (s.lsb % 8);
+  }
+  // only signals of 57+ bits can straddle nine bytes
+  s.plan_fast = (s.plan_end - s.plan_offset) <= 8 && s.plan_shift >= 0 && s.plan_shift + s.size <= 64;
+}
+
+void set_value_defs(Val &val) {
+  // def_val is "<value> <DESCRIPTION> ...", a value without a description is dropped.
+  // tables with a value that isn't an int64 are left to CANDefine, a bad table doesn't stop parsing and packing
+  std::vector<std::string> words;
+  std::istringstream stream(val.def_val);
+  for (std::string w; stream >> w;) words.push_back(w);
+
+  val.defs.clear();
+  val.defs_parsed = false;
+  for (size_t i = 0; i < words.size(); i += 2) {
+    const char *first = words[i].data(), *last = words[i].data() + words[i].size();
+    if (*first == '+') first++;
+    int64_t value;
+    auto [ptr, ec] = std::from_chars(first, last, value);
+    if (ec != std::errc() || ptr != last) {
+      val.defs.clear();
+      return;
+    }
+    if (i + 1 < words.size()) val.defs.push_back({value, words[i + 1]});
+  }
+  val.defs_parsed = true;
+}
+
 DBC* dbc_parse_from_stream(const std::string &dbc_name, std::istream &stream, ChecksumState *checksum, bool allow_duplicate_msg_name) {
   uint32_t address = 0;
   std::set<uint32_t> address_set;
@@ -109,7 +271,6 @@ DBC* dbc_parse_from_stream(const std::string &dbc_name, std::istream &stream, Ch
   std::map<uint32_t, std::vector<Signal>> signals;
   DBC* dbc = new DBC;
   dbc->name = dbc_name;
-  std::setlocale(LC_NUMERIC, "C");
 
   // used to find big endian LSB from MSB and size
   std::vector<int> be_bits;
@@ -121,20 +282,21 @@ DBC* dbc_parse_from_stream(const std::string &dbc_name, std::istream &stream, Ch
 
   std::string line;
   int line_num = 0;
-  std::smatch match;
-  // TODO: see if we can speed up the regex statements in this loop, SG_ is specifically the slowest
+  std::string tokens[3];
+  SignalTokens sig_tokens;
   while (std::getline(stream, line)) {
     line = trim(line);
     line_num += 1;
     if (startswith(line, "BO_ ")) {
       // new group
-      bool ret = std::regex_match(line, match, bo_regexp);
+      bool ret = lex_message(line, tokens[0], tokens[1], tokens[2]);
       DBC_ASSERT(ret, "bad BO: " << line);
 
       Msg& msg = dbc->msgs.emplace_back();
-      address = msg.address = std::stoul(match[1].str());  // could be hex
-      msg.name = match[2].str();
-      msg.size = std::stoul(match[3].str());
+      address = msg.address = std::stoul(tokens[0]);  // could be hex
+      msg.name = tokens[1];
+      msg.size = std::stoul(tokens[2]);
+      DBC_ASSERT(msg.size <= 64, "Message size too large: " << msg.size << " (" << msg.name << ")");
 
       // check for duplicates
       DBC_ASSERT(address_set.find(address) == address_set.end(), "Duplicate message address: " << address << " (" << msg.name << ")");
@@ -146,20 +308,17 @@ DBC* dbc_parse_from_stream(const std::string &dbc_name, std::istream &stream, Ch
       }
     } else if (startswith(line, "SG_ ")) {
       // new signal
-      int offset = 0;
-      if (!std::regex_search(line, match, sg_regexp)) {
-        bool ret = std::regex_search(line, match, sgm_regexp);
-        DBC_ASSERT(ret, "bad SG: " << line);
-        offset = 1;
-      }
+      bool ret = lex_signal(line, sig_tokens);
+      DBC_ASSERT(ret, "bad SG: " << line);
+
       Signal& sig = signals[address].emplace_back();
-      sig.name = match[1].str();
-      sig.start_bit = std::stoi(match[offset + 2].str());
-      sig.size = std::stoi(match[offset + 3].str());
-      sig.is_little_endian = std::stoi(match[offset + 4].str()) == 1;
-      sig.is_signed = match[offset + 5].str() == "-";
-      sig.factor = std::stod(match[offset + 6].str());
-      sig.offset = std::stod(match[offset + 7].str());
+      sig.name = sig_tokens.name;
+      sig.start_bit = std::stoi(sig_tokens.start_bit);
+      sig.size = std::stoi(sig_tokens.size);
+      sig.is_little_endian = std::stoi(sig_tokens.endianness) == 1;
+      sig.is_signed = sig_tokens.sign == '-';
+      sig.factor = parse_double(sig_tokens.factor);
+      sig.offset = parse_double(sig_tokens.offset);
       set_signal_type(sig, checksum, dbc_name, line_num);
       if (sig.is_little_endian) {
         sig.lsb = sig.start_bit;
@@ -170,23 +329,22 @@ DBC* dbc_parse_from_stream(const std::string &dbc_name, std::istream &stream, Ch
         sig.msb = sig.start_bit;
       }
       DBC_ASSERT(sig.lsb < (64 * 8) && sig.msb < (64 * 8), "Signal out of bounds: " << line);
+      set_signal_plan(sig);
 
       // Check for duplicate signal names
       DBC_ASSERT(signal_name_sets[address].find(sig.name) == signal_name_sets[address].end(), "Duplicate signal name: " << sig.name);
       signal_name_sets[address].insert(sig.name);
     } else if (startswith(line, "VAL_ ")) {
       // new signal value/definition
-      bool ret = std::regex_search(line, match, val_regexp);
+      bool ret = lex_values(line, tokens[0], tokens[1], tokens[2]);
       DBC_ASSERT(ret, "bad VAL: " << line);
 
       auto& val = dbc->vals.emplace_back();
-      val.address = std::stoul(match[1].str());  // could be hex
-      val.name = match[2].str();
+      val.address = std::stoul(tokens[0]);  // could be hex
+      val.name = tokens[1];
 
-      auto defvals = match[3].str();
-      std::sregex_token_iterator it{defvals.begin(), defvals.end(), val_split_regexp, -1};
       // convert strings to UPPER_CASE_WITH_UNDERSCORES
-      std::vector<std::string> words{it, {}};
+      std::vector<std::string> words = split_values(tokens[2]);
       for (auto& w : words) {
         w = trim(w);
         std::transform(w.begin(), w.end(), w.begin(), ::toupper);
@@ -197,17 +355,19 @@ DBC* dbc_parse_from_stream(const std::string &dbc_name, std::istream &stream, Ch
       std::copy(words.begin(), words.end(), std::ostream_iterator<std::string>(s, " "));
       val.def_val = s.str();
       val.def_val = trim(val.def_val);
+      set_value_defs(val);
     }
   }
 
+  // signals are only stored once, in their message. parsers and packers point into the DBC
+  dbc->msgs.shrink_to_fit();
+  dbc->vals.shrink_to_fit();
   for (auto& m : dbc->msgs) {
-    m.sigs = signals[m.address];
+    m.sigs = std::move(signals[m.address]);
+    m.sigs.shrink_to_fit();
     dbc->addr_to_msg[m.address] = &m;
     dbc->name_to_msg[m.name] = &m;
   }
-  for (auto& v : dbc->vals) {
-    v.sigs = signals[v.address];
-  }
   return dbc;
 }
 
@@ -216,9 +376,24 @@ DBC* dbc_parse(const std::string& dbc_path) {
   if (!infile) return nullptr;
 
   const std::string dbc_name = std::filesystem::path(dbc_path).filename();
+  std::stringstream content;
+  content << infile.rdbuf();
+
+  // parsed DBCs are cached by content, the text is only parsed after it changes
+  const std::string cache_dir = dbc_cache_dir();
+  const uint64_t hash = dbc_content_hash(dbc_name + "\n" + content.str());
+  if (!cache_dir.empty()) {
+    if (DBC *dbc = dbc_cache_load(cache_dir, dbc_name, hash)) {
+      return dbc;
+    }
+  }
 
   std::unique_ptr<ChecksumState> checksum(get_checksum(dbc_name));
-  return dbc_parse_from_stream(dbc_name, infile, checksum.get());
+  DBC *dbc = dbc_parse_from_stream(dbc_name, content, checksum.get());
+  if (!cache_dir.empty()) {
+    dbc_cache_store(cache_dir, *dbc, hash);
+  }
+  return dbc;
 }
 
 const std::string get_dbc_root_path() {
@@ -230,21 +405,39 @@ const std::string get_dbc_root_path() {
   }
 }
 
-const DBC* dbc_lookup(const std::string& dbc_name) {
-  static std::mutex lock;
-  static std::map<std::string, DBC*> dbcs;
+namespace {
+
+struct DBCEntry {
+  std::once_flag parsed;
+  std::atomic<DBC *> dbc{nullptr};
+};
+std::mutex dbcs_lock;
+std::map<std::string, DBCEntry> dbcs;
 
+}  // namespace
+
+const DBC* dbc_lookup(const std::string& dbc_name) {
+  // the map lock is only held to find the entry, so DBCs are parsed concurrently and a lookup
+  // never waits on the parse of an unrelated DBC
   std::string dbc_file_path = dbc_name;
   if (!std::filesystem::exists(dbc_file_path)) {
     dbc_file_path = get_dbc_root_path() + "/" + dbc_name + ".dbc";
   }
 
-  std::unique_lock lk(lock);
-  auto it = dbcs.find(dbc_name);
-  if (it == dbcs.end()) {
-    it = dbcs.insert(it, {dbc_name, dbc_parse(dbc_file_path)});
+  DBCEntry *entry;
+  {
+    std::unique_lock lk(dbcs_lock);
+    entry = &dbcs[dbc_name];
   }
-  return it->second;
+  // a parse that throws leaves the entry to be retried by the next lookup
+  std::call_once(entry->parsed, [&]() { entry->dbc = dbc_parse(dbc_file_path); });
+  return entry->dbc;
+}
+
+bool dbc_loaded(const std::string& dbc_name) {
+  std::unique_lock lk(dbcs_lock);
+  auto it = dbcs.find(dbc_name);
+  return it != dbcs.end() && it->second.dbc != nullptr;
 }
 
 std::vector<std::string> get_dbc_names() {
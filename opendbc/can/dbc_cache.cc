@@ -0,0 +1,248 @@
+#include <cstdlib>
+#include <cstring>
+#include <filesystem>
+#include <fstream>
+#include <memory>
+#include <stdexcept>
+#include <string>
+
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+#include "opendbc/can/common.h"
+#include "opendbc/can/common_dbc.h"
+
+// Opt-in binary cache of parsed DBCs, so the text is only parsed once per content. A cache file only
+// holds the fields read from the .dbc, everything derived from them (signal types, checksum functions,
+// extraction plans, value tables, lookups) is rebuilt on load by the same code as a parse.
+
+#define DBC_CACHE_MAGIC 0x43434244  // "DBCC"
+// bump whenever the file layout or the meaning of a stored field changes
+// 2: Val value tables parsed on load, signals only stored in their messages
+// 3: signal types and checksums are no longer stored
+#define DBC_CACHE_VERSION 3
+
+uint64_t dbc_content_hash(const std::string &content) {
+  // FNV-1a
+  uint64_t hash = 0xcbf29ce484222325ULL;
+  for (unsigned char c : content) {
+    hash = (hash ^ c) * 0x100000001b3ULL;
+  }
+  return hash;
+}
+
+std::string dbc_cache_dir() {
+  // only used when OPENDBC_CACHE_DIR is set
+  const char *dir = std::getenv("OPENDBC_CACHE_DIR");
+  return dir ? dir : "";
+}
+
+namespace {
+
+class Writer {
+public:
+  std::string buf;
+
+  template <typename T>
+  void put(T v) {
+    buf.append(reinterpret_cast<const char *>(&v), sizeof(v));
+  }
+  void put(const std::string &s) {
+    put<uint32_t>(s.size());
+    buf.append(s);
+  }
+};
+
+class Reader {
+public:
+  Reader(const char *adata, size_t asize) : data(adata), size(asize) {}
+
+  template <typename T>
+  T get() {
+    T v;
+    std::memcpy(&v, take(sizeof(T)), sizeof(T));
+    return v;
+  }
+  std::string get_string() {
+    const uint32_t len = get<uint32_t>();
+    return std::string(take(len), len);
+  }
+  // number of items that follow, each taking at least min_item_size bytes
+  uint32_t get_count(size_t min_item_size) {
+    const uint32_t count = get<uint32_t>();
+    if (count > (size - pos) / min_item_size) {
+      throw std::runtime_error("corrupt DBC cache");
+    }
+    return count;
+  }
+  bool done() const { return pos == size; }
+
+private:
+  const char *data;
+  size_t size;
+  size_t pos = 0;
+
+  const char *take(size_t n) {
+    if (n > size - pos) {
+      throw std::runtime_error("truncated DBC cache");
+    }
+    const char *p = data + pos;
+    pos += n;
+    return p;
+  }
+};
+
+std::string serialize(const DBC &dbc, uint64_t hash) {
+  Writer w;
+  w.put<uint32_t>(DBC_CACHE_MAGIC);
+  w.put<uint32_t>(DBC_CACHE_VERSION);
+  w.put<uint64_t>(hash);
+  w.put(dbc.name);
+
+  w.put<uint32_t>(dbc.msgs.size());
+  for (const auto &msg : dbc.msgs) {
+    w.put(msg.name);
+    w.put<uint32_t>(msg.address);
+    w.put<uint32_t>(msg.size);
+    w.put<uint32_t>(msg.sigs.size());
+    for (const auto &sig : msg.sigs) {
+      w.put(sig.name);
+      w.put<int32_t>(sig.start_bit);
+      w.put<int32_t>(sig.msb);
+      w.put<int32_t>(sig.lsb);
+      w.put<int32_t>(sig.size);
+      w.put<uint8_t>(sig.is_signed);
+      w.put<double>(sig.factor);
+      w.put<double>(sig.offset);
+      w.put<uint8_t>(sig.is_little_endian);
+    }
+  }
+
+  w.put<uint32_t>(dbc.vals.size());
+  for (const auto &val : dbc.vals) {
+    w.put(val.name);
+    w.put<uint32_t>(val.address);
+    w.put(val.def_val);
+  }
+  return w.buf;
+}
+
+DBC *deserialize(const char *data, size_t size, uint64_t hash) {
+  Reader r(data, size);
+  if (r.get<uint32_t>() != DBC_CACHE_MAGIC || r.get<uint32_t>() != DBC_CACHE_VERSION || r.get<uint64_t>() != hash) {
+    return nullptr;
+  }
+
+  auto dbc = std::make_unique<DBC>();
+  dbc->name = r.get_string();
+  std::unique_ptr<ChecksumState> checksum(get_checksum(dbc->name));
+
+  // smallest serialized message, signal and value table: all strings empty
+  dbc->msgs.resize(r.get_count(4 * sizeof(uint32_t)));
+  for (auto &msg : dbc->msgs) {
+    msg.name = r.get_string();
+    msg.address = r.get<uint32_t>();
+    msg.size = r.get<uint32_t>();
+    msg.sigs.resize(r.get_count(sizeof(uint32_t) + 4 * sizeof(int32_t) + 2 * sizeof(uint8_t) + 2 * sizeof(double)));
+    for (auto &sig : msg.sigs) {
+      sig.name = r.get_string();
+      sig.start_bit = r.get<int32_t>();
+      sig.msb = r.get<int32_t>();
+      sig.lsb = r.get<int32_t>();
+      sig.size = r.get<int32_t>();
+      sig.is_signed = r.get<uint8_t>();
+      sig.factor = r.get<double>();
+      sig.offset = r.get<double>();
+      sig.is_little_endian = r.get<uint8_t>();
+      sig.type = DEFAULT;
+      set_signal_type(sig, checksum.get(), dbc->name, 0);
+      set_signal_plan(sig);
+    }
+  }
+
+  dbc->vals.resize(r.get_count(3 * sizeof(uint32_t)));
+  for (auto &val : dbc->vals) {
+    val.name = r.get_string();
+    val.address = r.get<uint32_t>();
+    val.def_val = r.get_string();
+    set_value_defs(val);
+  }
+  if (!r.done()) {
+    return nullptr;
+  }
+
+  for (auto &msg : dbc->msgs) {
+    dbc->addr_to_msg[msg.address] = &msg;
+    dbc->name_to_msg[msg.name] = &msg;
+  }
+  return dbc.release();
+}
+
+std::string cache_path(const std::string &dir, const std::string &dbc_name, uint64_t hash) {
+  char suffix[32];
+  snprintf(suffix, sizeof(suffix), ".%016llx.v%d", (unsigned long long)hash, DBC_CACHE_VERSION);
+  return dir + "/" + dbc_name + suffix;
+}
+
+}  // namespace
+
+DBC *dbc_cache_load(const std::string &dir, const std::string &dbc_name, uint64_t hash) {
+  const std::string path = cache_path(dir, dbc_name, hash);
+  int fd = open(path.c_str(), O_RDONLY);
+  if (fd < 0) {
+    return nullptr;
+  }
+
+  DBC *dbc = nullptr;
+  struct stat st;
+  if (fstat(fd, &st) == 0 && st.st_size > 0) {
+    void *data = mmap(nullptr, st.st_size, PROT_READ, MAP_PRIVATE, fd, 0);
+    if (data != MAP_FAILED) {
+      try {
+        dbc = deserialize((const char *)data, st.st_size, hash);
+      } catch (const std::exception &) {
+        // truncated or corrupt, parse the .dbc instead
+        dbc = nullptr;
+      }
+      munmap(data, st.st_size);
+    }
+  }
+  close(fd);
+  return dbc;
+}
+
+void dbc_cache_store(const std::string &dir, const DBC &dbc, uint64_t hash) {
+  // best effort, a read-only or full disk only costs the parse next time
+  std::error_code ec;
+  std::filesystem::create_directories(dir, ec);
+  if (ec) {
+    return;
+  }
+
+  // write and rename, so concurrent processes never see a partial file
+  const std::string path = cache_path(dir, dbc.name, hash);
+  const std::string tmp_path = path + ".tmp" + std::to_string(getpid());
+  {
+    std::ofstream out(tmp_path, std::ios::binary);
+    const std::string data = serialize(dbc, hash);
+    if (!out.write(data.data(), data.size())) {
+      std::filesystem::remove(tmp_path, ec);
+      return;
+    }
+  }
+  std::filesystem::rename(tmp_path, path, ec);
+  if (ec) {
+    std::filesystem::remove(tmp_path, ec);
+    return;
+  }
+
+  // drop entries for older versions of this DBC
+  for (const auto &entry : std::filesystem::directory_iterator(dir, ec)) {
+    const std::string name = entry.path().filename();
+    if (entry.path() != path && name.rfind(dbc.name + ".", 0) == 0 && name.find(".tmp") == std::string::npos) {
+      std::filesystem::remove(entry.path(), ec);
+    }
+  }
+}
@@ -1,6 +1,7 @@
 #include <algorithm>
 #include <cassert>
 #include <cmath>
+#include <cstring>
 #include <map>
 #include <stdexcept>
 #include <utility>
@@ -8,19 +9,19 @@
 #include "opendbc/can/common.h"
 
 
-void set_value(std::vector<uint8_t> &msg, const Signal &sig, int64_t ival) {
+void set_value_bytewise(uint8_t *dat, size_t len, const Signal &sig, int64_t ival) {
   int i = sig.lsb / 8;
   int bits = sig.size;
   if (sig.size < 64) {
     ival &= ((1ULL << sig.size) - 1);
   }
 
-  while (i >= 0 && i < msg.size() && bits > 0) {
+  while (i >= 0 && i < len && bits > 0) {
     int shift = (int)(sig.lsb / 8) == i ? sig.lsb % 8 : 0;
     int size = std::min(bits, 8 - shift);
 
-    msg[i] &= ~(((1ULL << size) - 1) << shift);
-    msg[i] |= (ival & ((1ULL << size) - 1)) << shift;
+    dat[i] &= ~(((1ULL << size) - 1) << shift);
+    dat[i] |= (ival & ((1ULL << size) - 1)) << shift;
 
     bits -= size;
     ival >>= size;
@@ -28,74 +29,238 @@ void set_value(std::vector<uint8_t> &msg, const Signal &sig, int64_t ival) {
   }
 }
 
-CANPacker::CANPacker(const std::string& dbc_name) {
+void set_value(uint8_t *dat, size_t len, const Signal &sig, int64_t ival) {
+  if (!sig.plan_fast || sig.plan_end > len) {
+    set_value_bytewise(dat, len, sig, ival);
+    return;
+  }
+
+  uint64_t w;
+  std::memcpy(&w, dat + sig.plan_offset, sizeof(w));
+  if (sig.plan_swap) {
+    w = __builtin_bswap64(w);
+  }
+  w = (w & ~(sig.plan_mask << sig.plan_shift)) | (((uint64_t)ival & sig.plan_mask) << sig.plan_shift);
+  if (sig.plan_swap) {
+    w = __builtin_bswap64(w);
+  }
+  std::memcpy(dat + sig.plan_offset, &w, sizeof(w));
+}
+
+CANPacker::CANPacker(const std::string& dbc_name, size_t acache_size) : cache_size(acache_size) {
   dbc = dbc_lookup(dbc_name);
   assert(dbc);
 
   for (const auto& msg : dbc->msgs) {
     for (const auto& sig : msg.sigs) {
-      signal_lookup[std::make_pair(msg.address, sig.name)] = sig;
+      signal_lookup[std::make_pair(msg.address, std::string_view(sig.name))] = &sig;
     }
   }
 }
 
+static int64_t encode_value(const Signal &sig, double value) {
+  int64_t ival = (int64_t)(round((value - sig.offset) / sig.factor));
+  if (ival < 0) {
+    ival = (1ULL << sig.size) + ival;
+  }
+  return ival;
+}
+
+const Signal *CANPacker::lookup_signal(uint32_t address, const std::string &name) const {
+  auto sig_it = signal_lookup.find(std::make_pair(address, std::string_view(name)));
+  return sig_it == signal_lookup.end() ? nullptr : sig_it->second;
+}
+
 std::vector<uint8_t> CANPacker::pack(uint32_t address, const std::vector<SignalPackValue> &signals) {
+  ProfileScope scope("CANPacker::pack", "packer", address);
   auto msg_it = dbc->addr_to_msg.find(address);
   if (msg_it == dbc->addr_to_msg.end()) {
     LOGE("undefined address %d", address);
     return {};
   }
 
-  std::vector<uint8_t> ret(msg_it->second->size, 0);
-
-  // set all values for all given signal/value pairs
+  // padded so every signal window can be written without bounds checks
+  const size_t size = msg_it->second->size;
+  uint8_t dat[64 + 8] = {};
   bool counter_set = false;
-  for (const auto& sigval : signals) {
-    auto sig_it = signal_lookup.find(std::make_pair(address, sigval.name));
-    if (sig_it == signal_lookup.end()) {
-      // TODO: do something more here. invalid flag like CANParser?
-      LOGE("undefined signal %s - %d\n", sigval.name.c_str(), address);
-      continue;
+  const Signal *counter_sig, *checksum_sig;
+
+  auto cache_it = cache.find(address);
+  const SignalPackValue *counter_value = nullptr;
+  if (cache_it != cache.end() && cache_it->second.matches(signals, counter_value)) {
+    PackCacheEntry &entry = cache_it->second;
+    cache_hits++;
+    cache_lru.splice(cache_lru.begin(), cache_lru, entry.lru);
+    std::memcpy(dat, entry.dat, size);
+    counter_sig = entry.counter_sig;
+    checksum_sig = entry.checksum_sig;
+    if (counter_value != nullptr) {
+      set_value(dat, size, *counter_sig, encode_value(*counter_sig, counter_value->value));
+      counters[address] = counter_value->value;
+      counter_set = true;
     }
-    const auto &sig = sig_it->second;
+  } else {
+    // set all values for all given signal/value pairs
+    bool known = true;
+    for (const auto& sigval : signals) {
+      const Signal *sig = lookup_signal(address, sigval.name);
+      if (sig == nullptr) {
+        // TODO: do something more here. invalid flag like CANParser?
+        LOGE("undefined signal %s - %d\n", sigval.name.c_str(), address);
+        known = false;
+        continue;
+      }
+      set_value(dat, size, *sig, encode_value(*sig, sigval.value));
 
-    int64_t ival = (int64_t)(round((sigval.value - sig.offset) / sig.factor));
-    if (ival < 0) {
-      ival = (1ULL << sig.size) + ival;
+      if (sigval.name == "COUNTER") {
+        counters[address] = sigval.value;
+        counter_set = true;
+      }
     }
-    set_value(ret, sig, ival);
+    counter_sig = lookup_signal(address, "COUNTER");
+    checksum_sig = lookup_signal(address, "CHECKSUM");
 
-    if (sigval.name == "COUNTER") {
-      counters[address] = sigval.value;
-      counter_set = true;
+    if (cache_size > 0) {
+      cache_misses++;
+      // keep logging undefined signals on every pack
+      if (known) {
+        cache_store(address, signals, dat, size, counter_sig, checksum_sig);
+      } else if (cache_it != cache.end()) {
+        cache_lru.erase(cache_it->second.lru);
+        cache.erase(cache_it);
+      }
     }
   }
 
-  // set message counter
-  auto sig_it_counter = signal_lookup.find(std::make_pair(address, "COUNTER"));
-  if (!counter_set && sig_it_counter != signal_lookup.end()) {
-    const auto& sig = sig_it_counter->second;
+  finish(address, dat, size, counter_set, counter_sig, checksum_sig);
+  return std::vector<uint8_t>(dat, dat + size);
+}
 
-    if (counters.find(address) == counters.end()) {
-      counters[address] = 0;
+bool PackCacheEntry::matches(const std::vector<SignalPackValue> &signals, const SignalPackValue *&counter) const {
+  counter = nullptr;
+  size_t k = 0;
+  for (const auto &v : signals) {
+    if (!key_signal(v)) {
+      if (v.name == "COUNTER") {
+        // undefined COUNTER, logged by the uncached path
+        if (counter_sig == nullptr) return false;
+        counter = &v;
+      }
+      continue;
+    }
+    if (k == values.size() || values[k].value != v.value || values[k].name != v.name) {
+      return false;
     }
-    set_value(ret, sig, counters[address]);
-    counters[address] = (counters[address] + 1) % (1 << sig.size);
+    k++;
   }
+  return k == values.size();
+}
 
-  // set message checksum
-  auto sig_it_checksum = signal_lookup.find(std::make_pair(address, "CHECKSUM"));
-  if (sig_it_checksum != signal_lookup.end()) {
-    const auto &sig = sig_it_checksum->second;
-    if (sig.calc_checksum != nullptr) {
-      unsigned int checksum = sig.calc_checksum(address, sig, ret);
-      set_value(ret, sig, checksum);
+void CANPacker::cache_store(uint32_t address, const std::vector<SignalPackValue> &signals, const uint8_t *dat, size_t size,
+                            const Signal *counter_sig, const Signal *checksum_sig) {
+  auto [it, inserted] = cache.try_emplace(address);
+  PackCacheEntry &entry = it->second;
+  if (inserted) {
+    if (cache.size() > cache_size) {
+      cache.erase(cache_lru.back());
+      cache_lru.pop_back();
+    }
+    cache_lru.push_front(address);
+    entry.lru = cache_lru.begin();
+  } else {
+    cache_lru.splice(cache_lru.begin(), cache_lru, entry.lru);
+  }
+  entry.counter_sig = counter_sig;
+  entry.checksum_sig = checksum_sig;
+
+  // overwritten in place, the names' storage is reused
+  size_t k = 0;
+  for (const auto &v : signals) {
+    if (!entry.key_signal(v)) continue;
+    if (k == entry.values.size()) {
+      entry.values.push_back(v);
+    } else {
+      entry.values[k].name = v.name;
+      entry.values[k].value = v.value;
     }
+    k++;
   }
+  entry.values.resize(k);
+  std::memcpy(entry.dat, dat, size);
+}
 
+std::vector<std::vector<uint8_t>> CANPacker::pack(const std::vector<std::pair<uint32_t, std::vector<SignalPackValue>>> &msgs) {
+  std::vector<std::vector<uint8_t>> ret;
+  ret.reserve(msgs.size());
+  for (const auto &[address, values] : msgs) {
+    ret.push_back(pack(address, values));
+  }
   return ret;
 }
 
+PreparedMessage CANPacker::prepare(uint32_t address, const std::vector<std::string> &signal_names) const {
+  auto msg_it = dbc->addr_to_msg.find(address);
+  if (msg_it == dbc->addr_to_msg.end()) {
+    throw std::runtime_error("undefined address " + std::to_string(address));
+  }
+
+  PreparedMessage msg = {address, msg_it->second->size, {}, false, lookup_signal(address, "COUNTER"), lookup_signal(address, "CHECKSUM")};
+  for (const auto &name : signal_names) {
+    const Signal *sig = lookup_signal(address, name);
+    if (sig == nullptr) {
+      throw std::runtime_error("undefined signal " + name + " in " + msg_it->second->name);
+    }
+    msg.sigs.push_back(sig);
+    msg.counter_set |= sig == msg.counter;
+  }
+  return msg;
+}
+
+void CANPacker::set_values(const PreparedMessage &msg, const double *values, uint8_t *dat) {
+  for (size_t i = 0; i < msg.sigs.size(); i++) {
+    const Signal &sig = *msg.sigs[i];
+    set_value(dat, msg.size, sig, encode_value(sig, values[i]));
+    if (&sig == msg.counter) {
+      counters[msg.address] = values[i];
+    }
+  }
+}
+
+std::vector<uint8_t> CANPacker::pack(const PreparedMessage &msg, const double *values) {
+  ProfileScope scope("CANPacker::pack", "packer", msg.address);
+  uint8_t dat[64 + 8] = {};
+  set_values(msg, values, dat);
+
+  finish(msg.address, dat, msg.size, msg.counter_set, msg.counter, msg.checksum);
+  return std::vector<uint8_t>(dat, dat + msg.size);
+}
+
+void CANPacker::pack(const PreparedMessage &msg, const double *values, size_t n, uint8_t *out) {
+  ProfileScope scope("CANPacker::pack_array", "packer", msg.address);
+  // same as packing the rows one at a time, without a vector per frame
+  for (size_t row = 0; row < n; row++) {
+    uint8_t dat[64 + 8] = {};
+    set_values(msg, values + row * msg.sigs.size(), dat);
+    finish(msg.address, dat, msg.size, msg.counter_set, msg.counter, msg.checksum);
+    std::memcpy(out + row * msg.size, dat, msg.size);
+  }
+}
+
+void CANPacker::finish(uint32_t address, uint8_t *dat, size_t size, bool counter_set,
+                       const Signal *counter, const Signal *checksum) {
+  // set message counter
+  if (!counter_set && counter != nullptr) {
+    uint32_t &count = counters[address];
+    set_value(dat, size, *counter, count);
+    count = (count + 1) % (1 << counter->size);
+  }
+
+  // set message checksum
+  if (checksum != nullptr && checksum->calc_checksum != nullptr) {
+    set_value(dat, size, *checksum, profiled_checksum(address, *checksum, dat, size));
+  }
+}
+
 // This function has a definition in common.h and is used in PlotJuggler
 const Msg* CANPacker::lookup_message(uint32_t address) {
   return dbc->addr_to_msg.at(address);
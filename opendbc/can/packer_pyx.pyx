@@ -2,42 +2,125 @@
 # cython: c_string_encoding=ascii, language_level=3
 
 from libc.stdint cimport uint8_t, uint32_t
+from libcpp.pair cimport pair
+from libcpp.string cimport string
 from libcpp.vector cimport vector
 
 from .common cimport CANPacker as cpp_CANPacker
-from .common cimport dbc_lookup, SignalPackValue, DBC, Msg
+from .common cimport dbc_lookup, SignalPackValue, DBC, Msg, PreparedMessage as cpp_PreparedMessage, PACK_CACHE_SIZE
+
+import numpy as np
 
 
 cdef class CANPacker:
+  """
+  Packing runs without the GIL, so independent packers can be used from several threads.
+  A single packer must not be used from several threads at once.
+
+  make_can_msg keeps the last values and payload of up to cache_size addresses. Messages sent with
+  the same values again only get a new counter and checksum, cache_size=0 disables this.
+  """
   cdef:
     cpp_CANPacker *packer
     const DBC *dbc
+    bint busy  # packing without the GIL
 
-  def __init__(self, dbc_name):
-    self.dbc = dbc_lookup(dbc_name)
+  def __init__(self, dbc_name, cache_size=PACK_CACHE_SIZE):
+    if cache_size < 0:
+      raise ValueError(f"cache_size must not be negative, got {cache_size}")
+
+    cdef string name = dbc_name
+    cdef size_t cache_size_c = cache_size
+    with nogil:
+      self.dbc = dbc_lookup(name)
     if not self.dbc:
       raise RuntimeError(f"Can't lookup {dbc_name}")
 
-    self.packer = new cpp_CANPacker(dbc_name)
+    with nogil:
+      self.packer = new cpp_CANPacker(name, cache_size_c)
 
   def __dealloc__(self):
     if self.packer:
       del self.packer
 
+  def cache_info(self):
+    """Hits and misses of the repack cache"""
+    return {"hits": self.packer.cache_hits, "misses": self.packer.cache_misses}
+
+  cdef int signal_values(self, values, vector[SignalPackValue] &out) except -1:
+    # filled in place, every copy of the vector would copy the names again
+    out.resize(len(values))
+    cdef size_t i = 0
+    for name, value in values.items():
+      out[i].name = name.encode("utf8")
+      out[i].value = value
+      i += 1
+    return 0
+
+  cdef uint32_t lookup_address(self, name_or_addr):
+    cdef const Msg* m
+    if isinstance(name_or_addr, int):
+      return name_or_addr
+    try:
+      m = self.dbc.name_to_msg.at(name_or_addr.encode("utf8"))
+      return m.address
+    except IndexError:
+      # The C++ pack function will log an error message for invalid addresses
+      return 0
+
   cdef vector[uint8_t] pack(self, addr, values):
     cdef vector[SignalPackValue] values_thing
-    values_thing.reserve(len(values))
-    cdef SignalPackValue spv
+    self.signal_values(values, values_thing)
+    cdef uint32_t address = addr
+    cdef vector[uint8_t] ret
+    if self.busy:
+      raise RuntimeError("CANPacker is being used by another thread")
+    self.busy = True
+    try:
+      with nogil:
+        ret = self.packer.pack(address, values_thing)
+    finally:
+      self.busy = False
+    return ret
+
+  cpdef make_can_msg(self, name_or_addr, bus, values):
+    cdef uint32_t addr = self.lookup_address(name_or_addr)
+    cdef vector[uint8_t] val = self.pack(addr, values)
+    return addr, (<char *>&val[0])[:val.size()], bus
 
-    for name, value in values.iteritems():
-      spv.name = name.encode("utf8")
-      spv.value = value
-      values_thing.push_back(spv)
+  def make_can_msgs(self, msgs):
+    """
+    Pack a list of (name_or_addr, bus, values) in one call into C++, such as a controller's output
+    for one frame. Returns the same (address, data, bus) tuples as make_can_msg, in order.
+    """
+    cdef vector[pair[uint32_t, vector[SignalPackValue]]] requests
+    requests.reserve(len(msgs))
+    buses = []
+    for name_or_addr, bus, values in msgs:
+      requests.resize(requests.size() + 1)
+      requests.back().first = self.lookup_address(name_or_addr)
+      self.signal_values(values, requests.back().second)
+      buses.append(bus)
 
-    return self.packer.pack(addr, values_thing)
+    cdef vector[vector[uint8_t]] vals
+    if self.busy:
+      raise RuntimeError("CANPacker is being used by another thread")
+    self.busy = True
+    try:
+      with nogil:
+        vals = self.packer.pack(requests)
+    finally:
+      self.busy = False
 
-  cpdef make_can_msg(self, name_or_addr, bus, values):
-    cdef uint32_t addr = 0
+    cdef size_t i
+    return [(requests[i].first, (<char *>vals[i].data())[:vals[i].size()], buses[i]) for i in range(vals.size())]
+
+  def prepare(self, name_or_addr, signals):
+    """
+    Resolve a message and its signals once, for messages sent every frame. The returned handle
+    packs a sequence of values in the order of signals, sharing this packer's counters.
+    """
+    cdef uint32_t addr
     cdef const Msg* m
     if isinstance(name_or_addr, int):
       addr = name_or_addr
@@ -46,8 +129,80 @@ cdef class CANPacker:
         m = self.dbc.name_to_msg.at(name_or_addr.encode("utf8"))
         addr = m.address
       except IndexError:
-        # The C++ pack function will log an error message for invalid addresses
-        pass
+        raise RuntimeError(f"could not find message {repr(name_or_addr)} in DBC {self.dbc.name.decode('utf8')}")
 
-    cdef vector[uint8_t] val = self.pack(addr, values)
-    return addr, (<char *>&val[0])[:val.size()], bus
+    cdef vector[string] names = [s.encode("utf8") for s in signals]
+    cdef PreparedMessage handle = PreparedMessage.__new__(PreparedMessage)
+    handle.packer = self
+    handle.msg = self.packer.prepare(addr, names)
+    handle.values.resize(names.size())
+    handle.signals = tuple(signals)
+    return handle
+
+  def pack_array(self, name_or_addr, values, n=None):
+    """
+    Pack n frames of one message at once, e.g. to synthesize logs. values maps signal names to
+    arrays with one value per frame, or scalars for constant signals. n is only needed when no
+    value is an array. Counters and checksums are set as if each frame was packed with
+    make_can_msg in turn. Returns an (n, size) uint8 array of payloads.
+    """
+    columns = {name: np.asarray(v, dtype=np.float64) for name, v in values.items()}
+    if n is None:
+      lengths = {len(c) for c in columns.values() if c.ndim > 0}
+      if len(lengths) != 1:
+        raise ValueError(f"signal arrays must have one common length, got {sorted(lengths)}")
+      n = lengths.pop()
+
+    cdef PreparedMessage handle = self.prepare(name_or_addr, list(columns))
+    cdef double[:, ::1] vals = np.empty((n, len(columns)), dtype=np.float64)
+    for i, column in enumerate(columns.values()):
+      vals.base[:, i] = column
+    cdef uint8_t[:, ::1] out = np.zeros((n, handle.msg.size), dtype=np.uint8)
+    if n == 0:
+      return out.base
+
+    cdef const double *vals_ptr = &vals[0, 0] if vals.shape[1] > 0 else NULL
+    cdef uint8_t *out_ptr = &out[0, 0]
+    if self.busy:
+      raise RuntimeError("CANPacker is being used by another thread")
+    self.busy = True
+    try:
+      with nogil:
+        self.packer.pack(handle.msg, vals_ptr, vals.shape[0], out_ptr)
+    finally:
+      self.busy = False
+    return out.base
+
+
+cdef class PreparedMessage:
+  """A message prepared by CANPacker.prepare"""
+  cdef:
+    CANPacker packer
+    cpp_PreparedMessage msg
+    vector[double] values
+    readonly tuple signals
+
+  @property
+  def address(self):
+    return self.msg.address
+
+  def pack(self, bus, values):
+    """Pack values in signal order, returns the same (address, data, bus) as make_can_msg"""
+    cdef size_t n = self.values.size()
+    if len(values) != n:
+      raise ValueError(f"expected {n} values for {self.signals}, got {len(values)}")
+
+    cdef CANPacker packer = self.packer
+    cdef vector[uint8_t] val
+    cdef size_t i
+    if packer.busy:
+      raise RuntimeError("CANPacker is being used by another thread")
+    packer.busy = True
+    try:
+      for i in range(n):
+        self.values[i] = values[i]
+      with nogil:
+        val = packer.packer.pack(self.msg, self.values.data())
+    finally:
+      packer.busy = False
+    return self.msg.address, (<char *>&val[0])[:val.size()], bus
@@ -1,23 +1,28 @@
 #include <algorithm>
 #include <cassert>
+#include <cmath>
 #include <cstring>
 #include <limits>
+#include <numeric>
+#include <set>
 #include <stdexcept>
 #include <sstream>
 
 #include "opendbc/can/common.h"
 
-int64_t get_raw_value(const std::vector<uint8_t> &msg, const Signal &sig) {
+static_assert(__BYTE_ORDER__ == __ORDER_LITTLE_ENDIAN__, "signal extraction plans assume a little endian host");
+
+int64_t get_raw_value_bytewise(const uint8_t *dat, size_t len, const Signal &sig) {
   int64_t ret = 0;
 
   int i = sig.msb / 8;
   int bits = sig.size;
-  while (i >= 0 && i < msg.size() && bits > 0) {
+  while (i >= 0 && i < len && bits > 0) {
     int lsb = (int)(sig.lsb / 8) == i ? sig.lsb : i*8;
     int msb = (int)(sig.msb / 8) == i ? sig.msb : (i+1)*8 - 1;
     int size = msb - lsb + 1;
 
-    uint64_t d = (msg[i] >> (lsb - (i*8))) & ((1ULL << size) - 1);
+    uint64_t d = (dat[i] >> (lsb - (i*8))) & ((1ULL << size) - 1);
     ret |= d << (bits - size);
 
     bits -= size;
@@ -26,55 +31,183 @@ int64_t get_raw_value(const std::vector<uint8_t> &msg, const Signal &sig) {
   return ret;
 }
 
+int64_t get_raw_value(const uint8_t *dat, size_t len, const Signal &sig) {
+  if (!sig.plan_fast || sig.plan_end > len) {
+    return get_raw_value_bytewise(dat, len, sig);
+  }
+
+  uint64_t w;
+  std::memcpy(&w, dat + sig.plan_offset, sizeof(w));
+  if (sig.plan_swap) {
+    w = __builtin_bswap64(w);
+  }
+  return (w >> sig.plan_shift) & sig.plan_mask;
+}
+
+SignalHistory::SignalHistory(size_t anum_signals, size_t acapacity)
+  : num_signals(anum_signals), capacity(acapacity), vals(anum_signals * 2 * acapacity), nanos(2 * acapacity) {}
+
+void SignalHistory::push(uint64_t t, const double *sample) {
+  if (end == 2 * capacity) {
+    std::memmove(nanos.data(), nanos.data() + capacity, capacity * sizeof(uint64_t));
+    for (size_t i = 0; i < num_signals; i++) {
+      double *row = vals.data() + i * 2 * capacity;
+      std::memmove(row, row + capacity, capacity * sizeof(double));
+    }
+    end = capacity;
+  }
+
+  nanos[end] = t;
+  for (size_t i = 0; i < num_signals; i++) {
+    vals[i * 2 * capacity + end] = sample[i];
+  }
+  end++;
+  count++;
+}
 
 bool MessageState::parse(uint64_t nanos, const std::vector<uint8_t> &dat) {
-  std::vector<double> tmp_vals(parse_sigs.size());
-  bool checksum_failed = false;
-  bool counter_failed = false;
+  bool checksum_valid, counter_valid;
+  decode(dat, tmp_vals.data(), 1, checksum_valid, counter_valid);
+  if (stats) {
+    stats->add_frame(nanos, checksum_valid);
+  }
 
-  for (int i = 0; i < parse_sigs.size(); i++) {
-    const auto &sig = parse_sigs[i];
+  // only update values if both checksum and counter are valid
+  if (!checksum_valid || !counter_valid) {
+    LOGE_100("0x%X message checks failed, checksum failed %d, counter failed %d", address, !checksum_valid, !counter_valid);
+    return false;
+  }
+
+  if (track_changes) {
+    for (size_t i = 0; i < vals.size(); i++) {
+      changed[i] |= !has_sample || tmp_vals[i] != vals[i];
+    }
+  }
+  has_sample = true;
+  vals = tmp_vals;
+  update_vals.insert(update_vals.end(), vals.begin(), vals.end());
+  history->push(nanos, vals.data());
+  update_samples++;
+  last_seen_nanos = nanos;
+
+  return true;
+}
 
-    int64_t tmp = get_raw_value(dat, sig);
-    if (sig.is_signed) {
-      tmp -= ((tmp >> (sig.size-1)) & 0x1) ? (1ULL << sig.size) : 0;
+void MessageState::decode(const std::vector<uint8_t> &dat, double *out, size_t stride, bool &checksum_valid, bool &counter_valid) {
+  checksum_valid = true;
+  counter_valid = true;
+
+  // padded copy so every signal window can be loaded without bounds checks
+  uint8_t buf[64 + 8] = {};
+  const size_t len = std::min<size_t>(dat.size(), 64);
+  std::memcpy(buf, dat.data(), len);
+
+  // compared a word at a time, both payloads are zero padded
+  uint64_t diff = !memo_valid || memo_len != dat.size();
+  for (size_t i = 0; i < len; i += 8) {
+    uint64_t a, b, mask;
+    std::memcpy(&a, buf + i, 8);
+    std::memcpy(&b, memo_dat + i, 8);
+    std::memcpy(&mask, memo_mask + i, 8);
+    diff |= (a ^ b) & mask;
+  }
+  const bool memo_hit = diff == 0;
+  if (memo_hit) {
+    memo_hits++;
+  } else {
+    memo_misses++;
+    std::memcpy(memo_dat, buf, sizeof(memo_dat));
+    memo_len = dat.size();
+    memo_valid = true;
+  }
+
+  for (int i = 0; i < parse_sigs.size(); i++) {
+    if (memo_hit && !memo_decode[i]) {
+      out[i * stride] = memo_vals[i];
+      continue;
     }
+    const auto &sig = *parse_sigs[i];
+
+    int64_t tmp = get_raw_value(buf, dat.size(), sig);
+    tmp = (tmp ^ sig.plan_sign) - sig.plan_sign;
 
     //DEBUG("parse 0x%X %s -> %ld\n", address, sig.name, tmp);
 
     if (!ignore_checksum) {
-      if (sig.calc_checksum != nullptr && sig.calc_checksum(address, sig, dat) != tmp) {
-        checksum_failed = true;
+      if (sig.calc_checksum != nullptr && profiled_checksum(address, sig, dat.data(), dat.size()) != tmp) {
+        checksum_valid = false;
       }
     }
 
     if (!ignore_counter) {
       if (sig.type == SignalType::COUNTER && !update_counter_generic(tmp, sig.size)) {
-        counter_failed = true;
+        counter_valid = false;
       }
     }
 
-    tmp_vals[i] = tmp * sig.factor + sig.offset;
+    out[i * stride] = memo_vals[i] = tmp * sig.factor + sig.offset;
   }
+}
 
-  // only update values if both checksum and counter are valid
-  if (checksum_failed || counter_failed) {
-    LOGE_100("0x%X message checks failed, checksum failed %d, counter failed %d", address, checksum_failed, counter_failed);
-    return false;
+
+void MessageState::init_memo() {
+  std::fill(std::begin(memo_mask), std::end(memo_mask), 0xFF);
+  for (const Signal *sig : parse_sigs) {
+    if (sig->calc_checksum != nullptr || sig->type == SignalType::COUNTER) {
+      std::fill(memo_mask + sig->plan_offset, memo_mask + std::min(sig->plan_end, 64), 0);
+    }
   }
 
-  for (int i = 0; i < parse_sigs.size(); i++) {
-    vals[i] = tmp_vals[i];
-    all_vals[i].push_back(vals[i]);
+  memo_decode.clear();
+  for (const Signal *sig : parse_sigs) {
+    memo_decode.push_back(std::any_of(memo_mask + sig->plan_offset, memo_mask + std::min(sig->plan_end, 64),
+                                      [](uint8_t m) { return m == 0; }));
   }
-  last_seen_nanos = nanos;
+  memo_vals.assign(parse_sigs.size(), 0);
+  memo_valid = false;
+}
 
-  return true;
+void MessageStats::add_frame(uint64_t nanos, bool checksum_valid) {
+  checksum_failures += !checksum_valid;
+  frames++;
+
+  // time going backwards restarts the intervals
+  if (frames > 1 && nanos >= last_nanos) {
+    const uint64_t interval = nanos - last_nanos;
+    if (interval_ewma == 0) {
+      interval_ewma = interval;
+    }
+    const double deviation_us = std::abs(interval - interval_ewma) / 1000.0;
+    const int bin = deviation_us < 1 ? 0 : std::min(JITTER_BINS - 1, 1 + std::ilogb(deviation_us));
+    jitter_bins[bin]++;
+    interval_ewma += EWMA_ALPHA * (interval - interval_ewma);
+  }
+  last_nanos = nanos;
 }
 
+uint64_t MessageStats::jitter_quantile(double q) const {
+  const uint64_t total = std::accumulate(std::begin(jitter_bins), std::end(jitter_bins), uint64_t{0});
+  if (total == 0) {
+    return 0;
+  }
+
+  // the smallest bin with at least q of the intervals at or below it
+  const uint64_t rank = std::max<uint64_t>(1, std::ceil(q * total));
+  uint64_t seen = 0;
+  int bin = 0;
+  for (; bin < JITTER_BINS - 1; bin++) {
+    seen += jitter_bins[bin];
+    if (seen >= rank) break;
+  }
+  return (1ULL << bin) * 1000;
+}
 
 bool MessageState::update_counter_generic(int64_t v, int cnt_size) {
   if (((counter + 1) & ((1 << cnt_size) -1)) != v) {
+    // the first frame has nothing to follow
+    if (stats && stats->frames > 0) {
+      stats->counter_skips++;
+    }
     counter_fail = std::min(counter_fail + 1, MAX_BAD_COUNTER);
     if (counter_fail > 1) {
       INFO("0x%X COUNTER FAIL #%d -- %d -> %d\n", address, counter_fail, counter, (int)v);
@@ -87,22 +220,25 @@ bool MessageState::update_counter_generic(int64_t v, int cnt_size) {
 }
 
 
-CANParser::CANParser(int abus, const std::string& dbc_name, const std::vector<std::pair<uint32_t, int>> &messages)
-  : bus(abus) {
+CANParser::CANParser(int abus, const std::string& dbc_name, const std::vector<std::pair<uint32_t, int>> &messages,
+                     size_t ahistory_size, const std::unordered_map<uint32_t, std::vector<std::string>> &signals)
+  : bus(abus), history_size(std::max<size_t>(ahistory_size, 1)) {
   dbc = dbc_lookup(dbc_name);
   assert(dbc);
 
   bus_timeout_threshold = std::numeric_limits<uint64_t>::max();
 
+  std::set<uint32_t> addresses;
   for (const auto& [address, frequency] : messages) {
     // disallow duplicate message checks
-    if (message_states.find(address) != message_states.end()) {
+    if (!addresses.insert(address).second) {
       std::stringstream is;
       is << "Duplicate Message Check: " << address;
       throw std::runtime_error(is.str());
     }
 
-    MessageState &state = message_states[address];
+    const Msg *msg = dbc->addr_to_msg.at(address);
+    MessageState &state = message_states.emplace_back();
     state.address = address;
     // state.check_frequency = op.check_frequency,
 
@@ -114,20 +250,33 @@ CANParser::CANParser(int abus, const std::string& dbc_name, const std::vector<st
       bus_timeout_threshold = std::min(bus_timeout_threshold, state.check_threshold);
     }
 
-    const Msg *msg = dbc->addr_to_msg.at(address);
-    state.name = msg->name;
+    state.msg = msg;
     state.size = msg->size;
     assert(state.size <= 64);  // max signal size is 64 bytes
 
-    // track all signals for this message
-    state.parse_sigs = msg->sigs;
-    state.vals.resize(msg->sigs.size());
-    state.all_vals.resize(msg->sigs.size());
+    // track all signals for this message, or the subscribed ones and those needed for the checks
+    auto sigs_it = signals.find(address);
+    if (sigs_it != signals.end()) {
+      std::set<std::string> names(sigs_it->second.begin(), sigs_it->second.end());
+      for (const auto &sig : msg->sigs) {
+        if (names.erase(sig.name) > 0 || sig.calc_checksum != nullptr || sig.type == SignalType::COUNTER) {
+          state.parse_sigs.push_back(&sig);
+        }
+      }
+      if (!names.empty()) {
+        throw std::runtime_error("undefined signal " + *names.begin() + " in " + msg->name);
+      }
+    } else {
+      for (const auto &sig : msg->sigs) state.parse_sigs.push_back(&sig);
+    }
+    state.vals.resize(state.parse_sigs.size());
+    state.tmp_vals.resize(state.parse_sigs.size());
   }
+  BuildIndex();
 }
 
 CANParser::CANParser(int abus, const std::string& dbc_name, bool ignore_checksum, bool ignore_counter)
-  : bus(abus) {
+  : bus(abus), history_size(HISTORY_SIZE) {
   // Add all messages and signals
 
   dbc = dbc_lookup(dbc_name);
@@ -135,42 +284,266 @@ CANParser::CANParser(int abus, const std::string& dbc_name, bool ignore_checksum
 
   for (const auto& msg : dbc->msgs) {
     MessageState state = {
-      .name = msg.name,
+      .msg = &msg,
       .address = msg.address,
       .size = msg.size,
       .ignore_checksum = ignore_checksum,
       .ignore_counter = ignore_counter,
     };
 
-    for (const auto& sig : msg.sigs) {
-      state.parse_sigs.push_back(sig);
-      state.vals.push_back(0);
-      state.all_vals.push_back({});
+    for (const auto &sig : msg.sigs) state.parse_sigs.push_back(&sig);
+    state.vals.resize(msg.sigs.size());
+    state.tmp_vals.resize(msg.sigs.size());
+
+    message_states.push_back(std::move(state));
+  }
+  BuildIndex();
+}
+
+void CANParser::BuildIndex() {
+  std::sort(message_states.begin(), message_states.end(), [](const MessageState &a, const MessageState &b) {
+    return a.address < b.address;
+  });
+
+  // standard 11-bit addresses are looked up directly, extended ones by binary search
+  std_address_index.assign(0x800, -1);
+  for (int i = 0; i < message_states.size(); i++) {
+    if (message_states[i].address < std_address_index.size()) {
+      std_address_index[message_states[i].address] = i;
+    }
+  }
+
+  updated.assign(message_states.size(), false);
+  updated_indices.reserve(message_states.size());
+
+  // every checked message starts out missing
+  for (auto &state : message_states) {
+    state.init_memo();
+    state.history = std::make_shared<SignalHistory>(state.parse_sigs.size(), history_size);
+    state.timed_out = state.check_threshold > 0;
+    timed_out_count += state.timed_out;
+  }
+}
+
+int CANParser::StateIndex(uint32_t address) const {
+  if (address < std_address_index.size()) {
+    return std_address_index[address];
+  }
+
+  auto it = std::lower_bound(message_states.begin(), message_states.end(), address, [](const MessageState &state, uint32_t addr) {
+    return state.address < addr;
+  });
+  return (it != message_states.end() && it->address == address) ? it - message_states.begin() : -1;
+}
+
+MessageState *CANParser::getMessageState(uint32_t address) {
+  int idx = StateIndex(address);
+  if (idx < 0) {
+    throw std::out_of_range("no message state for address " + std::to_string(address));
+  }
+  return &message_states[idx];
+}
+
+void CANParser::trackChanges(bool enable) {
+  for (auto &state : message_states) {
+    state.track_changes = enable;
+    state.changed.assign(enable ? state.parse_sigs.size() : 0, 0);
+  }
+}
+
+std::vector<std::pair<uint32_t, int>> CANParser::changes() const {
+  // only messages parsed in the last update can have changed, updated_indices is sorted by UpdatedAddresses
+  std::vector<std::pair<uint32_t, int>> ret;
+  for (int idx : updated_indices) {
+    const MessageState &state = message_states[idx];
+    for (int i = 0; i < state.changed.size(); i++) {
+      if (state.changed[i]) ret.push_back({state.address, i});
     }
+  }
+  return ret;
+}
 
-    message_states[state.address] = state;
+std::pair<uint64_t, uint64_t> CANParser::memoStats() const {
+  uint64_t hits = 0, misses = 0;
+  for (const auto &state : message_states) {
+    hits += state.memo_hits;
+    misses += state.memo_misses;
   }
+  return {hits, misses};
 }
 
-std::set<uint32_t> CANParser::update(const std::vector<CanData> &can_data) {
-  // Clear all_values
+void CANParser::trackStats(bool enable) {
   for (auto &state : message_states) {
-    for (auto &vals : state.second.all_vals) vals.clear();
+    state.stats = enable ? std::make_unique<MessageStats>() : nullptr;
+  }
+}
+
+void CANParser::ClearAllValues() {
+  // only messages parsed in the last update have values to clear
+  for (int idx : updated_indices) {
+    MessageState &state = message_states[idx];
+    state.update_samples = 0;
+    state.update_vals.clear();
+    std::fill(state.changed.begin(), state.changed.end(), 0);
+    updated[idx] = false;
+  }
+  updated_indices.clear();
+}
+
+void CANParser::ParseFrame(int idx, uint64_t nanos, const std::vector<uint8_t> &dat) {
+  MessageState &state = message_states[idx];
+  ProfileScope scope("decode", "parser", state.address);
+
+  const bool counter_failed = state.counter_fail >= MAX_BAD_COUNTER;
+  const bool parsed = state.parse(nanos, dat);
+  counter_fail_count += (state.counter_fail >= MAX_BAD_COUNTER) - counter_failed;
+  if (!parsed) {
+    return;
+  }
+
+  if (!updated[idx]) {
+    updated[idx] = true;
+    updated_indices.push_back(idx);
+  }
+
+  // a message seen at nanos 0 still counts as missing
+  if (state.timed_out && nanos != 0) {
+    state.timed_out = false;
+    timed_out_count--;
+    deadlines.push({nanos + state.check_threshold, idx});
+  }
+}
+
+std::vector<uint32_t> CANParser::UpdatedAddresses() {
+  std::sort(updated_indices.begin(), updated_indices.end());
+
+  std::vector<uint32_t> addresses;
+  addresses.reserve(updated_indices.size());
+  for (int idx : updated_indices) {
+    addresses.push_back(message_states[idx].address);
   }
+  return addresses;
+}
+
+std::vector<uint32_t> CANParser::update(const std::vector<CanData> &can_data) {
+  ProfileScope scope("CANParser::update", "parser");
+  ClearAllValues();
 
-  std::set<uint32_t> updated_addresses;
   for (const auto &c : can_data) {
     if (first_nanos == 0) {
       first_nanos = c.nanos;
     }
 
-    UpdateCans(c, updated_addresses);
+    UpdateCans(c);
     UpdateValid(c.nanos);
   }
-  return updated_addresses;
+  return UpdatedAddresses();
+}
+
+std::vector<uint32_t> CANParser::update(const CanFrameRecord *frames, size_t count) {
+  ProfileScope scope("CANParser::update", "parser");
+  ClearAllValues();
+  frame_dat.reserve(64);
+
+  // consecutive records with the same timestamp make up one step, like a single CanData
+  size_t i = 0;
+  while (i < count) {
+    const uint64_t nanos = frames[i].nanos;
+    if (first_nanos == 0) {
+      first_nanos = nanos;
+    }
+
+    bool bus_empty = true;
+    for (; i < count && frames[i].nanos == nanos; i++) {
+      const CanFrameRecord &frame = frames[i];
+      if (frame.src != bus) {
+        continue;
+      }
+      bus_empty = false;
+
+      int idx = StateIndex(frame.address);
+      if (idx < 0) {
+        continue;
+      }
+      if (frame.len > 64) {
+        DEBUG("got message longer than 64 bytes: 0x%X %u\n", frame.address, frame.len);
+        continue;
+      }
+
+      frame_dat.assign(frame.dat, frame.dat + frame.len);
+      ParseFrame(idx, nanos, frame_dat);
+    }
+
+    UpdateBusTimeout(nanos, bus_empty);
+    UpdateValid(nanos);
+  }
+  return UpdatedAddresses();
+}
+
+CANParserGroup::CANParserGroup(const std::vector<CANParser*> &aparsers) : parsers(aparsers) {
+  for (int i = 0; i < parsers.size(); i++) {
+    const int bus = parsers[i]->bus;
+    if (bus < 0) {
+      throw std::invalid_argument("invalid bus " + std::to_string(bus));
+    }
+    if (bus >= bus_parsers.size()) {
+      bus_parsers.resize(bus + 1);
+    }
+    bus_parsers[bus].push_back(i);
+  }
+  bus_empty.resize(parsers.size());
+}
+
+std::vector<std::vector<uint32_t>> CANParserGroup::update(const std::vector<CanData> &can_data) {
+  ProfileScope scope("CANParserGroup::update", "parser");
+  for (auto parser : parsers) {
+    parser->ClearAllValues();
+  }
+
+  for (const auto &c : can_data) {
+    for (auto parser : parsers) {
+      if (parser->first_nanos == 0) {
+        parser->first_nanos = c.nanos;
+      }
+    }
+    std::fill(bus_empty.begin(), bus_empty.end(), true);
+
+    for (const auto &frame : c.frames) {
+      if (frame.src < 0 || frame.src >= bus_parsers.size()) {
+        continue;
+      }
+
+      for (int i : bus_parsers[frame.src]) {
+        bus_empty[i] = false;
+
+        CANParser *parser = parsers[i];
+        int idx = parser->StateIndex(frame.address);
+        if (idx < 0) {
+          continue;
+        }
+        if (frame.dat.size() > 64) {
+          DEBUG("got message longer than 64 bytes: 0x%X %zu\n", frame.address, frame.dat.size());
+          continue;
+        }
+        parser->ParseFrame(idx, c.nanos, frame.dat);
+      }
+    }
+
+    for (int i = 0; i < parsers.size(); i++) {
+      parsers[i]->UpdateBusTimeout(c.nanos, bus_empty[i]);
+      parsers[i]->UpdateValid(c.nanos);
+    }
+  }
+
+  std::vector<std::vector<uint32_t>> ret;
+  ret.reserve(parsers.size());
+  for (auto parser : parsers) {
+    ret.push_back(parser->UpdatedAddresses());
+  }
+  return ret;
 }
 
-void CANParser::UpdateCans(const CanData &can, std::set<uint32_t> &updated_addresses) {
+void CANParser::UpdateCans(const CanData &can) {
   //DEBUG("got %zu messages\n", can.frames.size());
 
   bool bus_empty = true;
@@ -182,8 +555,8 @@ void CANParser::UpdateCans(const CanData &can, std::set<uint32_t> &updated_addre
     }
     bus_empty = false;
 
-    auto state_it = message_states.find(frame.address);
-    if (state_it == message_states.end()) {
+    int idx = StateIndex(frame.address);
+    if (idx < 0) {
       // DEBUG("skip %d: not specified\n", cmsg.getAddress());
       continue;
     }
@@ -198,43 +571,77 @@ void CANParser::UpdateCans(const CanData &can, std::set<uint32_t> &updated_addre
     //  continue;
     //}
 
-    if (state_it->second.parse(can.nanos, frame.dat)) {
-      updated_addresses.insert(state_it->first);
-    }
+    ParseFrame(idx, can.nanos, frame.dat);
   }
 
-  // update bus timeout
+  UpdateBusTimeout(can.nanos, bus_empty);
+}
+
+void CANParser::UpdateBusTimeout(uint64_t nanos, bool bus_empty) {
   if (!bus_empty) {
-    last_nonempty_nanos = can.nanos;
+    last_nonempty_nanos = nanos;
   }
-  bus_timeout = (can.nanos - last_nonempty_nanos) > bus_timeout_threshold;
+  bus_timeout = (nanos - last_nonempty_nanos) > bus_timeout_threshold;
 }
 
 void CANParser::UpdateValid(uint64_t nanos) {
+  if (nanos < last_valid_nanos || recheck_timeouts) {
+    // time went backwards, the deadlines no longer apply
+    RecheckTimeouts(nanos);
+  } else {
+    // only messages whose deadline passed need a look. each one has a single entry, which
+    // is moved to the current deadline if the message was seen since it was queued
+    while (!deadlines.empty() && deadlines.top().first < nanos) {
+      const int idx = deadlines.top().second;
+      deadlines.pop();
+
+      auto &state = message_states[idx];
+      const uint64_t deadline = state.last_seen_nanos + state.check_threshold;
+      if (deadline < nanos) {
+        state.timed_out = true;
+        timed_out_count++;
+      } else {
+        deadlines.push({deadline, idx});
+      }
+    }
+  }
+  last_valid_nanos = nanos;
+
   const bool show_missing = (nanos - first_nanos) > 8e9;
+  if (timed_out_count > 0 && show_missing && !bus_timeout) {
+    for (const auto& state : message_states) {
+      if (state.timed_out) {
+        if (state.last_seen_nanos == 0) {
+          LOGE_100("0x%X '%s' NOT SEEN", state.address, state.msg->name.c_str());
+        } else {
+          LOGE_100("0x%X '%s' TIMED OUT", state.address, state.msg->name.c_str());
+        }
+      }
+    }
+  }
 
-  bool _valid = true;
-  bool _counters_valid = true;
-  for (const auto& kv : message_states) {
-    const auto& state = kv.second;
+  can_invalid_cnt = timed_out_count == 0 ? 0 : (can_invalid_cnt + 1);
+  can_valid = (can_invalid_cnt < CAN_INVALID_CNT) && counter_fail_count == 0;
+}
 
-    if (state.counter_fail >= MAX_BAD_COUNTER) {
-      _counters_valid = false;
+void CANParser::RecheckTimeouts(uint64_t nanos) {
+  deadlines = {};
+  timed_out_count = 0;
+  recheck_timeouts = false;
+  for (int i = 0; i < message_states.size(); i++) {
+    auto &state = message_states[i];
+    if (state.check_threshold == 0) {
+      continue;
     }
 
+    // a message seen after nanos wraps around and times out, until time catches up with it
     const bool missing = state.last_seen_nanos == 0;
-    const bool timed_out = (nanos - state.last_seen_nanos) > state.check_threshold;
-    if (state.check_threshold > 0 && (missing || timed_out)) {
-      if (show_missing && !bus_timeout) {
-        if (missing) {
-          LOGE_100("0x%X '%s' NOT SEEN", state.address, state.name.c_str());
-        } else if (timed_out) {
-          LOGE_100("0x%X '%s' TIMED OUT", state.address, state.name.c_str());
-        }
-      }
-      _valid = false;
+    state.timed_out = missing || (nanos - state.last_seen_nanos) > state.check_threshold;
+    recheck_timeouts |= state.last_seen_nanos > nanos;
+    if (state.timed_out) {
+      timed_out_count++;
+    } else {
+      deadlines.push({state.last_seen_nanos + state.check_threshold, i});
     }
   }
-  can_invalid_cnt = _valid ? 0 : (can_invalid_cnt + 1);
-  can_valid = (can_invalid_cnt < CAN_INVALID_CNT) && _counters_valid;
 }
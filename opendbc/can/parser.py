@@ -1,2 +1,11 @@
-from opendbc.can.parser_pyx import CANParser, CANDefine  # pylint: disable=no-name-in-module, import-error
-assert CANParser, CANDefine
+from opendbc.can.parser_pyx import (  # pylint: disable=no-name-in-module, import-error
+  CANParser, CANParserGroup, CANDefine, CAN_FRAME_DTYPE, can_frames, decode_log, load_dbc, dbc_loaded, verify_checksums,
+  profile, profile_summary, profile_trace,
+)
+assert CANParser, CANParserGroup
+assert CANDefine
+assert CAN_FRAME_DTYPE, can_frames
+assert decode_log, load_dbc
+assert dbc_loaded, verify_checksums
+assert profile
+assert profile_summary, profile_trace
@@ -1,23 +1,441 @@
 # distutils: language = c++
 # cython: c_string_encoding=ascii, language_level=3
 
+from cython.operator cimport dereference as deref
+from cpython.buffer cimport PyObject_GetBuffer, PyBuffer_FillInfo, PyBuffer_Release, PyBUF_SIMPLE
+from libcpp cimport bool
+from libcpp.memory cimport shared_ptr
 from libcpp.pair cimport pair
 from libcpp.string cimport string
+from libcpp.unordered_map cimport unordered_map
 from libcpp.vector cimport vector
-from libc.stdint cimport uint32_t
+from libc.stdint cimport uint8_t, uint32_t, uint64_t
 
 from .common cimport CANParser as cpp_CANParser
-from .common cimport dbc_lookup, Msg, DBC, CanData
-
+from .common cimport CANParserGroup as cpp_CANParserGroup
+from .common cimport dbc_lookup, dbc_loaded as cpp_dbc_loaded
+from .common cimport verify_checksums as cpp_verify_checksums, calc_checksum_type
+from .common cimport DBC, Msg, Signal, Val, CanData, CanFrameRecord
+from .common cimport MessageState, MessageStats, SignalHistory, HISTORY_SIZE
+from .common cimport HONDA_CHECKSUM, CHRYSLER_CHECKSUM, PEDAL_CHECKSUM
+from .common cimport honda_checksum_bytewise, chrysler_checksum_bitwise, pedal_checksum_bitwise
+from .common cimport ProfileEvent, PROFILE_NO_ADDRESS, profile_enable, profiling, profile_clock, profile_record
+from .common cimport profile_events, profile_dropped
+
+import copy
 import numbers
 from collections import defaultdict
+from collections.abc import Mapping
+
+import numpy as np
+
+# record layout for CANParser.update_buffer, one frame per record
+CAN_FRAME_DTYPE = np.dtype([
+  ("nanos", np.uint64),
+  ("address", np.uint32),
+  ("src", np.uint8),
+  ("len", np.uint8),
+  ("dat", np.uint8, (64,)),
+], align=True)
+assert CAN_FRAME_DTYPE.itemsize == sizeof(CanFrameRecord)
+
+
+def can_frames(strings):
+  """Converts update_strings input into a CAN_FRAME_DTYPE array for CANParser.update_buffer"""
+  if len(strings) and not isinstance(strings[0], (list, tuple)):
+    strings = [strings]
+
+  frames = np.zeros(sum(len(s[1]) for s in strings), dtype=CAN_FRAME_DTYPE)
+  i = 0
+  for nanos, msgs in strings:
+    for address, dat, src in msgs:
+      frames[i] = (nanos, address, src, len(dat), 0)
+      frames["dat"][i, :min(len(dat), 64)] = np.frombuffer(dat[:64], dtype=np.uint8)
+      i += 1
+  return frames
+
+
+cdef struct ColumnOutput:
+  MessageState *state
+  size_t size
+  size_t idx
+  uint64_t *nanos
+  double *vals
+  bool *checksum_valid
+  bool *counter_valid
+
+
+def load_dbc(dbc_name):
+  """Parses a DBC without holding the GIL unless it's already loaded, returns whether it was found"""
+  cdef string name = dbc_name
+  cdef const DBC *dbc
+  with nogil:
+    dbc = dbc_lookup(name)
+  return dbc != NULL
+
+
+def dbc_loaded(dbc_name):
+  """Whether a DBC was already parsed, never parses it"""
+  return cpp_dbc_loaded(dbc_name)
+
+
+def decode_log(dbc_name, frames, messages, bus=0):
+  """
+  Decodes a whole log of CAN_FRAME_DTYPE records into NumPy columns, one dict per message:
+  {"nanos": uint64, "checksum_valid": bool, "counter_valid": bool, <signal>: float64, ...}.
+  Unlike CANParser, frames failing checks are kept, see the validity masks.
+  """
+  cdef string name = dbc_name
+  cdef const DBC *dbc
+  with nogil:
+    dbc = dbc_lookup(name)
+  if not dbc:
+    raise RuntimeError(f"Can't find DBC: {dbc_name}")
+
+  cdef vector[pair[uint32_t, int]] message_v
+  addresses = {}
+  for c in messages:
+    try:
+      m = dbc.addr_to_msg.at(c) if isinstance(c, numbers.Number) else dbc.name_to_msg.at(c)
+    except IndexError:
+      raise RuntimeError(f"could not find message {repr(c)} in DBC {dbc_name}")
+    addresses[m.address] = m.name.decode("utf8")
+    message_v.push_back((m.address, 0))
+
+  cdef int bus_c = bus
+  cdef cpp_CANParser *can
+  with nogil:
+    can = new cpp_CANParser(bus_c, name, message_v)
+  cdef Py_buffer view
+  PyObject_GetBuffer(frames, &view, PyBUF_SIMPLE)
+  try:
+    if view.len % sizeof(CanFrameRecord) != 0:
+      raise ValueError(f"buffer size {view.len} is not a multiple of the {sizeof(CanFrameRecord)} byte frame record")
+    return _decode_columns(can, <const CanFrameRecord*>view.buf, view.len // sizeof(CanFrameRecord), bus, addresses)
+  finally:
+    PyBuffer_Release(&view)
+    del can
+
+
+cdef const Signal *checksum_signal(dbc_name, message, const Msg **msg_out) except NULL:
+  """Looks up a message and its checksum signal"""
+  cdef string name = dbc_name
+  cdef const DBC *dbc
+  with nogil:
+    dbc = dbc_lookup(name)
+  if not dbc:
+    raise RuntimeError(f"Can't find DBC: {dbc_name}")
+
+  cdef const Msg *msg
+  try:
+    msg = dbc.addr_to_msg.at(message) if isinstance(message, numbers.Number) else dbc.name_to_msg.at(message)
+  except IndexError:
+    raise RuntimeError(f"could not find message {repr(message)} in DBC {dbc_name}")
+
+  cdef const Signal *sig = NULL
+  for i in range(msg.sigs.size()):
+    if msg.sigs[i].calc_checksum != NULL:
+      sig = &msg.sigs[i]
+  if sig == NULL:
+    raise ValueError(f"message {msg.name.decode('utf8')} has no checksum")
+  msg_out[0] = msg
+  return sig
+
+
+def verify_checksums(dbc_name, message, payloads):
+  """
+  Checks the checksum of every frame of one message in a single call. payloads is a 2D uint8 array
+  with a frame per row and at least the message's size in columns, e.g. CANPacker.pack_array output
+  or the 'dat' column of CAN_FRAME_DTYPE records. Returns a bool array, True where the checksum matches.
+  """
+  cdef const Msg *msg
+  cdef const Signal *sig = checksum_signal(dbc_name, message, &msg)
+
+  cdef const uint8_t[:, :] dat = payloads
+  if dat.shape[1] < msg.size:
+    raise ValueError(f"payloads have {dat.shape[1]} bytes, {msg.name.decode('utf8')} has {msg.size}")
+  if dat.shape[0] > 0 and dat.strides[1] != 1:
+    dat = np.ascontiguousarray(payloads, dtype=np.uint8)
+
+  cdef size_t n = dat.shape[0]
+  cdef bool[::1] valid = np.zeros(n, dtype=np.bool_)
+  if n == 0:
+    return valid.base
+
+  cdef const uint8_t *dat_p = &dat[0, 0]
+  cdef bool *valid_p = &valid[0]
+  cdef size_t stride = dat.strides[0]
+  with nogil:
+    cpp_verify_checksums(msg.address, deref(sig), dat_p, msg.size, stride, n, valid_p)
+  return valid.base
+
+
+def _checksums(dbc_name, message, payloads, reference=False):
+  """
+  Checksum of each row of payloads, from the message's checksum function or, with reference=True, the
+  original implementation a table-driven one replaced. For testing the tables against them.
+  """
+  cdef const Msg *msg
+  cdef const Signal *sig = checksum_signal(dbc_name, message, &msg)
+  cdef calc_checksum_type calc = sig.calc_checksum
+  if reference:
+    if sig.type == HONDA_CHECKSUM:
+      calc = honda_checksum_bytewise
+    elif sig.type == CHRYSLER_CHECKSUM:
+      calc = chrysler_checksum_bitwise
+    elif sig.type == PEDAL_CHECKSUM:
+      calc = pedal_checksum_bitwise
+    else:
+      raise ValueError(f"{msg.name.decode('utf8')} has no reference checksum")
+
+  cdef const uint8_t[:, ::1] dat = np.ascontiguousarray(payloads, dtype=np.uint8)
+  ret = [calc(msg.address, deref(sig), &dat[i, 0], dat.shape[1]) for i in range(dat.shape[0])]
+  return np.array(ret, dtype=np.uint32)
+
+
+def profile(enable=True):
+  """
+  Turns timing of the parser and packer hot paths on or off, for every CANParser and CANPacker in the
+  process. Turning it on clears the recorded events.
+  """
+  profile_enable(enable)
+
+
+def profile_summary():
+  """
+  Time spent in each profiled section since profiling was turned on:
+  {name: {"count": int, "total_us": float, "max_us": float, "by_address": {address: {...}}}}.
+  Sections for a single message, decode, packing and checksums, are also broken down by address.
+  """
+  cdef vector[ProfileEvent] events = profile_events()
+  ret = {}
+  for i in range(events.size()):
+    e = &events[i]
+    duration_us = e.duration / 1e3
+    totals = [ret.setdefault(e.name.decode("utf8"), {"count": 0, "total_us": 0.0, "max_us": 0.0, "by_address": {}})]
+    if e.address != PROFILE_NO_ADDRESS:
+      totals.append(totals[0]["by_address"].setdefault(e.address, {"count": 0, "total_us": 0.0, "max_us": 0.0}))
+    for t in totals:
+      t["count"] += 1
+      t["total_us"] += duration_us
+      t["max_us"] = max(t["max_us"], duration_us)
+  return ret
+
+
+def profile_trace():
+  """
+  Recorded events in the Chrome trace event format, json.dump it to open in chrome://tracing or Perfetto.
+  Events over the in-memory limit are dropped, see otherData.
+  """
+  cdef vector[ProfileEvent] events = profile_events()
+  trace = []
+  for i in range(events.size()):
+    e = &events[i]
+    event = {"name": e.name.decode("utf8"), "cat": e.category.decode("utf8"), "ph": "X",
+             "ts": e.start / 1e3, "dur": e.duration / 1e3, "pid": 0, "tid": e.tid}  # codespell:ignore dur
+    if e.address != PROFILE_NO_ADDRESS:
+      event["args"] = {"address": e.address}
+    trace.append(event)
+  return {"traceEvents": trace, "displayTimeUnit": "ns", "otherData": {"dropped_events": profile_dropped()}}
+
+
+cdef dict _decode_columns(cpp_CANParser *can, const CanFrameRecord *records, size_t count, uint8_t bus, dict addresses):
+  cdef unordered_map[uint32_t, ColumnOutput] outputs
+  cdef unordered_map[uint32_t, ColumnOutput].iterator it
+  cdef ColumnOutput *out
+  cdef size_t i
+  cdef const CanFrameRecord *rec
+
+  # first pass sizes the columns
+  for address in addresses:
+    outputs[address].state = can.getMessageState(address)
+  for i in range(count):
+    rec = &records[i]
+    if rec.src == bus and rec.len <= 64 and outputs.count(rec.address):
+      outputs[rec.address].size += 1
+
+  ret = {}
+  cdef uint64_t[::1] nanos
+  cdef double[:, ::1] vals
+  cdef bool[::1] checksum_valid, counter_valid
+  for address, name in addresses.items():
+    out = &outputs[address]
+    nanos = np.zeros(out.size, dtype=np.uint64)
+    vals = np.zeros((out.state.parse_sigs.size(), out.size), dtype=np.float64)
+    checksum_valid = np.zeros(out.size, dtype=np.bool_)
+    counter_valid = np.zeros(out.size, dtype=np.bool_)
+    if out.size > 0:
+      out.nanos = &nanos[0]
+      out.vals = &vals[0, 0] if vals.shape[0] > 0 else NULL
+      out.checksum_valid = &checksum_valid[0]
+      out.counter_valid = &counter_valid[0]
+
+    columns = {"nanos": nanos.base, "checksum_valid": checksum_valid.base, "counter_valid": counter_valid.base}
+    for j in range(out.state.parse_sigs.size()):
+      columns[out.state.parse_sigs[j].name.decode("utf8")] = vals.base[j]
+    ret[address] = ret[name] = columns
+
+  # second pass decodes every frame straight into the columns
+  cdef vector[uint8_t] dat
+  dat.reserve(64)
+  with nogil:
+    for i in range(count):
+      rec = &records[i]
+      if rec.src != bus or rec.len > 64:
+        continue
+      it = outputs.find(rec.address)
+      if it == outputs.end():
+        continue
+
+      out = &deref(it).second
+      dat.assign(rec.dat, rec.dat + rec.len)
+      out.nanos[out.idx] = rec.nanos
+      out.state.decode(dat, out.vals + out.idx, out.size, out.checksum_valid[out.idx], out.counter_valid[out.idx])
+      out.idx += 1
+
+  return ret
+
+
+cdef int marshal_strings(strings, const vector[bool] &buses, vector[CanData] &can_data_array) except -1:
+  """Converts update_strings input into CanData, keeping frames from the given buses"""
+  cdef uint64_t start = profile_clock() if profiling() else 0
+  try:
+    if len(strings) and not isinstance(strings[0], (list, tuple)):
+      strings = [strings]
+
+    can_data_array.reserve(len(strings))
+    for s in strings:
+      can_data = &(can_data_array.emplace_back())
+      can_data.nanos = s[0]
+      can_data.frames.reserve(len(s[1]))
+      for address, dat, src in s[1]:
+        source_bus = <uint32_t>src
+        if source_bus < buses.size() and buses[source_bus]:
+          frame = &(can_data.frames.emplace_back())
+          frame.address = address
+          frame.dat = dat
+          frame.src = source_bus
+  except TypeError:
+    raise RuntimeError("invalid parameter")
+  if start != 0:
+    profile_record("marshal_strings", "python", PROFILE_NO_ADDRESS, start, profile_clock())
+  return 0
+
+
+cdef class SignalValues:
+  """
+  Read-only signal name -> value mapping of one message, backed by the parser's C++ message state.
+  Values are only converted to Python objects when read. Use copy.copy() for a dict snapshot.
+  """
+  cdef:
+    MessageState *state
+    dict index
+    object parser  # keeps the message state alive
+
+  @staticmethod
+  cdef SignalValues create(type cls, object parser, MessageState *state, dict index):
+    cdef SignalValues view = cls.__new__(cls)
+    view.parser = parser
+    view.state = state
+    view.index = index
+    return view
+
+  cdef object value(self, int i):
+    return self.state.vals[i]
+
+  def __getitem__(self, name):
+    return self.value(self.index[name])
+
+  def get(self, name, default=None):
+    i = self.index.get(name)
+    return default if i is None else self.value(i)
+
+  def __contains__(self, name):
+    return name in self.index
+
+  def __iter__(self):
+    return iter(self.index)
+
+  def __len__(self):
+    return len(self.index)
+
+  def keys(self):
+    return self.index.keys()
+
+  def values(self):
+    return [self.value(i) for i in self.index.values()]
+
+  def items(self):
+    return [(name, self.value(i)) for name, i in self.index.items()]
+
+  def __eq__(self, other):
+    if not isinstance(other, Mapping):
+      return NotImplemented
+    return dict(self.items()) == dict(other.items())
+
+  def __repr__(self):
+    return repr(dict(self.items()))
+
+  def __copy__(self):
+    return dict(self.items())
+
+  def __deepcopy__(self, memo):
+    return copy.deepcopy(dict(self.items()), memo)
+
+
+cdef class SignalAllValues(SignalValues):
+  """All values of each signal from the last update, oldest first"""
+  cdef object value(self, int i):
+    (<CANParser>self.parser).check_idle()
+    cdef size_t n = self.state.update_samples
+    cdef size_t num_signals = self.state.vals.size()
+    return [self.state.update_vals[k * num_signals + i] for k in range(n)]
+
+
+cdef class SignalTimestamps(SignalValues):
+  """Timestamp of the last valid frame for each signal"""
+  cdef object value(self, int i):
+    return self.state.last_seen_nanos
+
+
+Mapping.register(SignalValues)
+
+
+cdef class HistoryBuffer:
+  """Read-only buffer over a message's ring buffer, keeps it alive for the NumPy views into it"""
+  cdef:
+    shared_ptr[SignalHistory] history
+    bint timestamps
+
+  @staticmethod
+  cdef HistoryBuffer create(shared_ptr[SignalHistory] history, bint timestamps):
+    cdef HistoryBuffer buf = HistoryBuffer.__new__(HistoryBuffer)
+    buf.history = history
+    buf.timestamps = timestamps
+    return buf
+
+  def __getbuffer__(self, Py_buffer *buffer, int flags):
+    cdef SignalHistory *h = self.history.get()
+    if self.timestamps:
+      PyBuffer_FillInfo(buffer, self, h.nanos.data(), h.nanos.size() * sizeof(uint64_t), 1, flags)
+    else:
+      PyBuffer_FillInfo(buffer, self, h.vals.data(), h.vals.size() * sizeof(double), 1, flags)
 
 
 cdef class CANParser:
+  """
+  messages are (name or address, frequency) pairs, or (name or address, frequency, signals) to only
+  decode those signals of the message, plus its COUNTER and CHECKSUM.
+
+  Updates run without the GIL, so independent parsers can be updated from several threads.
+  A single parser must not be used from several threads at once.
+  """
   cdef:
     cpp_CANParser *can
     const DBC *dbc
-    set addresses
+    bint busy  # being updated without the GIL
+    dict change_keys  # address -> (message, signal) of each decoded signal, with track_changes
+    bint track_stats
 
   cdef readonly:
     dict vl
@@ -26,20 +444,24 @@ cdef class CANParser:
     string dbc_name
     uint32_t bus
 
-  def __init__(self, dbc_name, messages, bus=0):
+  def __init__(self, dbc_name, messages, bus=0, history_size=HISTORY_SIZE, track_changes=False, track_stats=False):
+    if history_size < 1:
+      raise ValueError(f"history_size must be positive, got {history_size}")
+
     self.dbc_name = dbc_name
     self.bus = bus
-    self.dbc = dbc_lookup(dbc_name)
+    with nogil:
+      self.dbc = dbc_lookup(self.dbc_name)
     if not self.dbc:
       raise RuntimeError(f"Can't find DBC: {dbc_name}")
 
     self.vl = {}
     self.vl_all = {}
     self.ts_nanos = {}
-    self.addresses = set()
 
     # Convert message names into addresses and check existence in DBC
     cdef vector[pair[uint32_t, int]] message_v
+    cdef unordered_map[uint32_t, vector[string]] signals
     for i in range(len(messages)):
       c = messages[i]
       try:
@@ -47,68 +469,159 @@ cdef class CANParser:
       except IndexError:
         raise RuntimeError(f"could not find message {repr(c[0])} in DBC {self.dbc_name}")
 
-      address = m.address
-      message_v.push_back((address, c[1]))
-      self.addresses.add(address)
-
-      name = m.name.decode("utf8")
-      signal_names = [sig.name.decode("utf-8") for sig in (<Msg*>m).sigs]
-
-      self.vl[address] = {name: 0.0 for name in signal_names}
-      self.vl[name] = self.vl[address]
-      self.vl_all[address] = defaultdict(list)
-      self.vl_all[name] = self.vl_all[address]
-      self.ts_nanos[address] = {name: 0.0 for name in signal_names}
-      self.ts_nanos[name] = self.ts_nanos[address]
-
-    self.can = new cpp_CANParser(bus, dbc_name, message_v)
+      message_v.push_back((m.address, c[1]))
+      if len(c) > 2 and c[2] is not None:
+        signals[m.address] = [s.encode("utf8") for s in c[2]]
+
+    cdef size_t history_size_c = history_size
+    with nogil:
+      self.can = new cpp_CANParser(self.bus, self.dbc_name, message_v, history_size_c, signals)
+
+    # views of the C++ message states, two ways to lookup: address or msg name
+    cdef MessageState *state
+    self.change_keys = {} if track_changes else None
+    for j in range(message_v.size()):
+      address = message_v[j].first
+      state = self.can.getMessageState(address)
+      name = state.msg.name.decode("utf8")
+      index = {state.parse_sigs[i].name.decode("utf8"): i for i in range(state.parse_sigs.size())}
+
+      self.vl[address] = self.vl[name] = SignalValues.create(SignalValues, self, state, index)
+      self.vl_all[address] = self.vl_all[name] = SignalValues.create(SignalAllValues, self, state, index)
+      self.ts_nanos[address] = self.ts_nanos[name] = SignalValues.create(SignalTimestamps, self, state, index)
+      if track_changes:
+        self.change_keys[address] = [(name, sig) for sig in index]
+
+    if track_changes:
+      self.can.trackChanges(True)
+    self.track_stats = track_stats
+    if track_stats:
+      self.can.trackStats(True)
 
   def __dealloc__(self):
     if self.can:
       del self.can
 
+  cdef int check_idle(self) except -1:
+    if self.busy:
+      raise RuntimeError("CANParser is being updated by another thread")
+    return 0
+
   def update_strings(self, strings, sendcan=False):
     # input format:
     # [nanos, [[address, data, src], ...]]
     # [[nanos, [[address, data, src], ...], ...]]
-    for address in self.addresses:
-      self.vl_all[address].clear()
-
     cdef vector[CanData] can_data_array
-
+    cdef vector[uint32_t] updated_addrs
+    cdef vector[bool] buses = vector[bool](self.bus + 1, False)
+    buses[self.bus] = True
+    cdef uint64_t start = profile_clock() if profiling() else 0
+
+    marshal_strings(strings, buses, can_data_array)
+    self.check_idle()
+    self.busy = True
     try:
-      if len(strings) and not isinstance(strings[0], (list, tuple)):
-        strings = [strings]
-
-      can_data_array.reserve(len(strings))
-      for s in strings:
-        can_data = &(can_data_array.emplace_back())
-        can_data.nanos = s[0]
-        can_data.frames.reserve(len(s[1]))
-        for address, dat, src in s[1]:
-          source_bus = <uint32_t>src
-          if source_bus == self.bus:
-            frame = &(can_data.frames.emplace_back())
-            frame.address = address
-            frame.dat = dat
-            frame.src = source_bus
-    except TypeError:
-      raise RuntimeError("invalid parameter")
-
-    updated_addrs = self.can.update(can_data_array)
-    for addr in updated_addrs:
-      vl = self.vl[addr]
-      vl_all = self.vl_all[addr]
-      ts_nanos = self.ts_nanos[addr]
-
-      state = self.can.getMessageState(addr)
-      for i in range(state.parse_sigs.size()):
-        name = <unicode>state.parse_sigs[i].name
-        vl[name] = state.vals[i]
-        vl_all[name] = state.all_vals[i]
-        ts_nanos[name] = state.last_seen_nanos
-
-    return updated_addrs
+      with nogil:
+        updated_addrs = self.can.update(can_data_array)
+    finally:
+      self.busy = False
+    ret = {addr for addr in updated_addrs}
+    if start != 0:
+      profile_record("CANParser.update_strings", "python", PROFILE_NO_ADDRESS, start, profile_clock())
+    return ret
+
+  def update_buffer(self, buf):
+    """
+    Bulk version of update_strings, buf is a C-contiguous buffer of CAN_FRAME_DTYPE records
+    (NumPy structured array, bytes, memoryview). Consecutive records with the same nanos are
+    one step, and frames from all buses may be passed in.
+    """
+    cdef Py_buffer view
+    cdef vector[uint32_t] updated_addrs
+    PyObject_GetBuffer(buf, &view, PyBUF_SIMPLE)
+    try:
+      if view.len % sizeof(CanFrameRecord) != 0:
+        raise ValueError(f"buffer size {view.len} is not a multiple of the {sizeof(CanFrameRecord)} byte frame record")
+
+      self.check_idle()
+      self.busy = True
+      try:
+        with nogil:
+          updated_addrs = self.can.update(<const CanFrameRecord*>view.buf, view.len // sizeof(CanFrameRecord))
+      finally:
+        self.busy = False
+    finally:
+      PyBuffer_Release(&view)
+
+    return {addr for addr in updated_addrs}
+
+  def changes(self):
+    """
+    (message name, signal name) pairs whose value changed in the last update, each sample is compared
+    to the previous valid one. Requires track_changes=True.
+    """
+    if self.change_keys is None:
+      raise RuntimeError("CANParser was created without track_changes")
+    self.check_idle()
+    cdef vector[pair[uint32_t, int]] changes = self.can.changes()
+    return {self.change_keys[c.first][c.second] for c in changes}
+
+  def memo_info(self):
+    """
+    Frames whose signals were reused from the message's previous payload, because only its COUNTER and
+    CHECKSUM bytes changed (hits), and frames decoded in full (misses)
+    """
+    self.check_idle()
+    stats = self.can.memoStats()
+    return {"hits": stats.first, "misses": stats.second}
+
+  def stats(self):
+    """
+    Receive statistics of each message by name, since the parser was created. Requires track_stats=True.
+    rate_hz is from an EWMA of the inter-arrival interval, jitter_ms are quantiles of the intervals'
+    deviation from it, rounded up to a power of two microseconds. Frames failing checks are counted too.
+    """
+    if not self.track_stats:
+      raise RuntimeError("CANParser was created without track_stats")
+    self.check_idle()
+
+    ret = {}
+    cdef SignalValues view
+    cdef MessageStats *s
+    for name, view in self.vl.items():
+      if not isinstance(name, str):
+        continue
+      s = view.state.stats.get()
+      ret[name] = {
+        "frames": s.frames,
+        "rate_hz": 1e9 / s.interval_ewma if s.interval_ewma > 0 else 0.0,
+        "jitter_ms": {f"p{q}": s.jitter_quantile(q / 100) / 1e6 for q in (50, 90, 99)},
+        "counter_skips": s.counter_skips,
+        "checksum_failures": s.checksum_failures,
+      }
+    return ret
+
+  def history(self, msg, n=None):
+    """
+    Last n valid samples of a message, by default all that are kept, as read-only NumPy views of its
+    ring buffer: {"nanos": uint64, <signal>: float64, ...}, oldest first. No copies are made, so the
+    views see the samples overwritten by later updates. Copy them to keep the values.
+    """
+    self.check_idle()
+    cdef SignalValues view = self.vl[msg]
+    cdef shared_ptr[SignalHistory] history = view.state.history
+    cdef SignalHistory *h = history.get()
+
+    cdef size_t count = h.size() if n is None else min(max(n, 0), h.size())
+    cdef size_t start = h.start(count)
+    cdef size_t row = 2 * h.capacity
+
+    ret = {"nanos": np.frombuffer(HistoryBuffer.create(history, True), dtype=np.uint64)[start:start + count]}
+    if h.num_signals > 0:
+      vals = np.frombuffer(HistoryBuffer.create(history, False), dtype=np.float64)
+      for name, i in view.index.items():
+        ret[name] = vals[i * row + start:i * row + start + count]
+    return ret
 
   @property
   def can_valid(self):
@@ -119,7 +632,83 @@ cdef class CANParser:
     return self.can.bus_timeout
 
 
+cdef class CANParserGroup:
+  """
+  Updates several CANParsers, e.g. a car's parser for each bus, from one batch of frames. The frames
+  are marshaled once and routed to the parsers on their bus in a single pass. Each parser keeps its
+  own vl, can_valid and bus_timeout.
+  """
+  cdef:
+    cpp_CANParserGroup *group
+    vector[bool] buses
+    list keys
+    list members  # parsers in keys order
+
+  cdef readonly:
+    dict parsers
+
+  def __init__(self, parsers):
+    """parsers: dict of CANParsers, None values are skipped"""
+    self.parsers = dict(parsers)
+    self.keys = [key for key, cp in self.parsers.items() if cp is not None]
+    self.members = [self.parsers[key] for key in self.keys]
+
+    cdef vector[cpp_CANParser*] parsers_v
+    cdef CANParser cp
+    for key in self.keys:
+      cp = self.parsers[key]
+      parsers_v.push_back(cp.can)
+      if cp.bus >= self.buses.size():
+        self.buses.resize(cp.bus + 1, False)
+      self.buses[cp.bus] = True
+
+    self.group = new cpp_CANParserGroup(parsers_v)
+
+  def __dealloc__(self):
+    if self.group:
+      del self.group
+
+  def update_strings(self, strings):
+    """Same input as CANParser.update_strings, returns the updated addresses for each parser"""
+    cdef vector[CanData] can_data_array
+    cdef vector[vector[uint32_t]] updated_addrs
+    cdef uint64_t start = profile_clock() if profiling() else 0
+
+    marshal_strings(strings, self.buses, can_data_array)
+    cdef CANParser cp
+    for cp in self.members:
+      cp.check_idle()
+    for cp in self.members:
+      cp.busy = True
+    try:
+      with nogil:
+        updated_addrs = self.group.update(can_data_array)
+    finally:
+      for cp in self.members:
+        cp.busy = False
+    ret = {key: {addr for addr in updated_addrs[i]} for i, key in enumerate(self.keys)}
+    if start != 0:
+      profile_record("CANParserGroup.update_strings", "python", PROFILE_NO_ADDRESS, start, profile_clock())
+    return ret
+
+  @property
+  def can_valid(self):
+    return all(self.parsers[key].can_valid for key in self.keys)
+
+  @property
+  def bus_timeout(self):
+    return any(self.parsers[key].bus_timeout for key in self.keys)
+
+
+# CANDefine value tables by DBC name, shared by all instances
+cdef dict _define_cache = {}
+
+
 cdef class CANDefine():
+  """
+  Value tables of a DBC, dv[msg][signal] = {value: description}, looked up by message name or address.
+  Tables are built once per DBC and shared between instances, treat dv as read-only.
+  """
   cdef:
     const DBC *dbc
 
@@ -129,31 +718,35 @@ cdef class CANDefine():
 
   def __init__(self, dbc_name):
     self.dbc_name = dbc_name
+    cached = _define_cache.get(dbc_name)
+    if cached is not None:
+      self.dbc, self.dv = (<CANDefine>cached).dbc, (<CANDefine>cached).dv
+      return
+
     self.dbc = dbc_lookup(dbc_name)
     if not self.dbc:
       raise RuntimeError(f"Can't find DBC: '{dbc_name}'")
 
     dv = defaultdict(dict)
-
-    for i in range(self.dbc[0].vals.size()):
-      val = self.dbc[0].vals[i]
-
-      sgname = val.name.decode("utf8")
-      def_val = val.def_val.decode("utf8")
+    cdef const Val *val
+    cdef const Msg *m
+    for i in range(self.dbc.vals.size()):
+      val = &self.dbc.vals[i]
       address = val.address
       try:
         m = self.dbc.addr_to_msg.at(address)
       except IndexError:
         raise KeyError(address)
-      msgname = m.name.decode("utf-8")
-
-      # separate definition/value pairs
-      def_val = def_val.split()
-      values = [int(v) for v in def_val[::2]]
-      defs = def_val[1::2]
 
       # two ways to lookup: address or msg name
-      dv[address][sgname] = dict(zip(values, defs))
-      dv[msgname][sgname] = dv[address][sgname]
+      if val.defs_parsed:
+        defs = {val.defs[j].first: val.defs[j].second.decode("utf8") for j in range(val.defs.size())}
+      else:
+        # values past int64, or malformed ones which raise here
+        def_val = val.def_val.decode("utf8").split()
+        defs = dict(zip([int(v) for v in def_val[::2]], def_val[1::2]))
+      dv[address][val.name.decode("utf8")] = defs
+      dv[m.name.decode("utf8")][val.name.decode("utf8")] = defs
 
     self.dv = dict(dv)
+    _define_cache[dbc_name] = self
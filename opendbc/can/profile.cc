@@ -0,0 +1,49 @@
+#include <chrono>
+#include <mutex>
+
+#include "opendbc/can/common.h"
+
+std::atomic<bool> profile_enabled = false;
+
+namespace {
+
+std::mutex profile_lock;
+std::vector<ProfileEvent> profile_buffer;
+uint64_t profile_overflow = 0;
+std::atomic<uint32_t> next_tid = 0;
+
+}  // namespace
+
+void profile_enable(bool enable) {
+  std::lock_guard lk(profile_lock);
+  if (enable) {
+    profile_buffer.clear();
+    profile_overflow = 0;
+  }
+  profile_enabled = enable;
+}
+
+uint64_t profile_clock() {
+  return std::chrono::duration_cast<std::chrono::nanoseconds>(std::chrono::steady_clock::now().time_since_epoch()).count();
+}
+
+void profile_record(const char *name, const char *category, uint32_t address, uint64_t start, uint64_t end) {
+  thread_local const uint32_t tid = next_tid++;
+
+  std::lock_guard lk(profile_lock);
+  if (profile_buffer.size() >= PROFILE_MAX_EVENTS) {
+    profile_overflow++;
+    return;
+  }
+  profile_buffer.push_back({name, category, address, tid, start, end - start});
+}
+
+std::vector<ProfileEvent> profile_events() {
+  std::lock_guard lk(profile_lock);
+  return profile_buffer;
+}
+
+uint64_t profile_dropped() {
+  std::lock_guard lk(profile_lock);
+  return profile_overflow;
+}
@@ -0,0 +1,445 @@
+// Micro-benchmarks for the C++ hot paths, built with `scons` and run as ./opendbc/can/tests/benchmark
+// Each benchmark also checks the optimized path against its reference implementation.
+
+#include <algorithm>
+#include <chrono>
+#include <cstdio>
+#include <cstring>
+#include <filesystem>
+#include <fstream>
+#include <memory>
+#include <random>
+#include <sstream>
+#include <string>
+#include <tuple>
+#include <vector>
+
+#include <unistd.h>
+
+#include "opendbc/can/common.h"
+
+template <typename F>
+double time_ns(F f, int iterations) {
+  auto start = std::chrono::steady_clock::now();
+  for (int i = 0; i < iterations; i++) f();
+  auto end = std::chrono::steady_clock::now();
+  return std::chrono::duration<double, std::nano>(end - start).count();
+}
+
+int benchmark_signals() {
+  printf("signal extraction and insertion, bytewise vs extraction plan (ns/signal)\n");
+  printf("%-48s %8s %6s %9s %9s %9s %9s\n", "dbc", "signals", "plan%", "get_old", "get_plan", "set_old", "set_plan");
+
+  std::vector<std::string> names = get_dbc_names();
+  std::sort(names.begin(), names.end());
+
+  std::mt19937 rng(0);
+  int failures = 0;
+  const int iterations = 200;
+  double totals[4] = {};
+  size_t total_signals = 0;
+
+  for (const auto &name : names) {
+    const DBC *dbc = dbc_lookup(name);
+
+    std::vector<std::vector<uint8_t>> payloads;
+    size_t signals = 0, planned = 0;
+    for (const auto &msg : dbc->msgs) {
+      std::vector<uint8_t> &dat = payloads.emplace_back(64 + 8, 0);
+      std::generate(dat.begin(), dat.begin() + msg.size, [&]() { return rng() & 0xFF; });
+
+      for (const auto &sig : msg.sigs) {
+        signals++;
+        planned += sig.plan_fast;
+
+        // truncated payloads exercise the bytewise fallback
+        for (size_t len : {(size_t)msg.size, (size_t)msg.size / 2}) {
+          if (get_raw_value(dat.data(), len, sig) != get_raw_value_bytewise(dat.data(), len, sig)) {
+            printf("get mismatch: %s %s %s len %zu\n", name.c_str(), msg.name.c_str(), sig.name.c_str(), len);
+            failures++;
+          }
+
+          std::vector<uint8_t> a = dat, b = dat;
+          int64_t ival = rng();
+          set_value(a.data(), len, sig, ival);
+          set_value_bytewise(b.data(), len, sig, ival);
+          if (!std::equal(a.begin(), a.begin() + msg.size, b.begin())) {
+            printf("set mismatch: %s %s %s len %zu\n", name.c_str(), msg.name.c_str(), sig.name.c_str(), len);
+            failures++;
+          }
+        }
+      }
+    }
+    if (signals == 0) continue;
+
+    volatile int64_t sink = 0;
+    auto run_get = [&](auto get) {
+      return time_ns([&]() {
+        for (size_t m = 0; m < dbc->msgs.size(); m++) {
+          const auto &msg = dbc->msgs[m];
+          for (const auto &sig : msg.sigs) sink = sink + get(payloads[m].data(), msg.size, sig);
+        }
+      }, iterations) / (iterations * signals);
+    };
+    auto run_set = [&](auto set) {
+      return time_ns([&]() {
+        for (size_t m = 0; m < dbc->msgs.size(); m++) {
+          const auto &msg = dbc->msgs[m];
+          for (const auto &sig : msg.sigs) set(payloads[m].data(), msg.size, sig, sink);
+        }
+      }, iterations) / (iterations * signals);
+    };
+
+    double ns[4] = {
+      run_get(get_raw_value_bytewise),
+      run_get(get_raw_value),
+      run_set(set_value_bytewise),
+      run_set(set_value),
+    };
+    printf("%-48s %8zu %5.0f%% %9.2f %9.2f %9.2f %9.2f\n", name.c_str(), signals, 100.0 * planned / signals, ns[0], ns[1], ns[2], ns[3]);
+
+    for (int i = 0; i < 4; i++) totals[i] += ns[i] * signals;
+    total_signals += signals;
+  }
+
+  printf("%-48s %8zu %6s %9.2f %9.2f %9.2f %9.2f\n\n", "all", total_signals, "",
+         totals[0] / total_signals, totals[1] / total_signals, totals[2] / total_signals, totals[3] / total_signals);
+  return failures;
+}
+
+int benchmark_parser() {
+  printf("CANParser::update throughput, every message in the DBC on the bus, every other one subscribed and checked at 100Hz\n");
+  printf("%-40s %8s %6s %10s %12s\n", "dbc", "signals", "stats", "frames", "frames/sec");
+
+  // all signals of the subscribed messages, or only the first few of each
+  const std::tuple<std::string, size_t, bool> parsers[] = {
+    {"toyota_nodsu_pt_generated", 0, false},
+    {"toyota_nodsu_pt_generated", 0, true},
+    {"hyundai_canfd", 0, false},
+    {"hyundai_canfd", 3, false},
+    {"hyundai_kia_mando_front_radar_generated", 0, false},
+  };
+  for (const auto &[name, max_signals, stats] : parsers) {
+    const DBC *dbc = dbc_lookup(name);
+    CANPacker packer(name);
+
+    std::vector<std::pair<uint32_t, int>> messages;
+    std::unordered_map<uint32_t, std::vector<std::string>> signals;
+    for (size_t i = 0; i < dbc->msgs.size(); i += 2) {
+      const Msg &msg = dbc->msgs[i];
+      messages.push_back({msg.address, 100});
+      if (max_signals > 0) {
+        auto &names = signals[msg.address];
+        for (size_t j = 0; j < std::min(max_signals, msg.sigs.size()); j++) names.push_back(msg.sigs[j].name);
+      }
+    }
+    CANParser parser(0, name, messages, HISTORY_SIZE, signals);
+    parser.trackStats(stats);
+
+    // one step per 10ms with every message, each frame at its own timestamp like a replayed log.
+    // counters and checksums are valid
+    std::vector<CanFrameRecord> frames;
+    for (int step = 0; step < 200; step++) {
+      for (size_t i = 0; i < dbc->msgs.size(); i++) {
+        const auto &msg = dbc->msgs[i];
+        std::vector<uint8_t> dat = packer.pack(msg.address, {});
+        CanFrameRecord &frame = frames.emplace_back();
+        frame.nanos = (step + 1) * 10000000ULL + i * 10000000ULL / dbc->msgs.size();
+        frame.address = msg.address;
+        frame.src = 0;
+        frame.len = dat.size();
+        std::copy(dat.begin(), dat.end(), frame.dat);
+      }
+    }
+
+    // best of several runs, the machine may be shared
+    const int iterations = 20;
+    double ns = 1e18;
+    for (int run = 0; run < 5; run++) {
+      ns = std::min(ns, time_ns([&]() { parser.update(frames.data(), frames.size()); }, iterations));
+    }
+    printf("%-40s %8s %6s %10zu %12.0f\n", name.c_str(), max_signals > 0 ? std::to_string(max_signals).c_str() : "all",
+           stats ? "on" : "off", frames.size(), iterations * frames.size() / (ns * 1e-9));
+  }
+  printf("\n");
+  return 0;
+}
+
+int benchmark_checksums() {
+  printf("checksum verification, one message per algorithm, a vector per frame vs verify_checksums over a batch\n");
+  printf("%-40s %-16s %6s %10s %10s %10s\n", "dbc", "message", "bytes", "vector ns", "batch ns", "batch MB/s");
+
+  const std::pair<std::string, std::string> messages[] = {
+    {"honda_civic_touring_2016_can_generated", "STEERING_CONTROL"},
+    {"toyota_nodsu_pt_generated", "STEERING_LKA"},
+    {"vw_mqb_2010", "HCA_01"},
+    {"vw_golf_mk4", "Lenkhilfe_3"},
+    {"hyundai_canfd", "LKAS"},
+    {"subaru_global_2017_generated", "ES_LKAS"},
+    {"chrysler_pacifica_2017_hybrid_generated", "LKAS_COMMAND"},
+    {"comma_body", "TORQUE_CMD"},
+    {"fca_giorgio", "EPS_3"},
+  };
+
+  int failures = 0;
+  for (const auto &[name, msg_name] : messages) {
+    const Msg *msg = dbc_lookup(name)->name_to_msg.at(msg_name);
+    const Signal *sig = nullptr;
+    for (const auto &s : msg->sigs) {
+      if (s.calc_checksum != nullptr) sig = &s;
+    }
+
+    // valid frames with random payloads
+    const size_t n = 10000;
+    CANPacker packer(name, 0);
+    std::mt19937 rng(0);
+    std::vector<uint8_t> frames(n * msg->size);
+    for (size_t i = 0; i < n; i++) {
+      std::vector<SignalPackValue> values;
+      for (const auto &s : msg->sigs) {
+        if (s.type == SignalType::DEFAULT) values.push_back({s.name, (double)(rng() % (1 << std::min(s.size, 16)))});
+      }
+      std::vector<uint8_t> dat = packer.pack(msg->address, values);
+      std::copy(dat.begin(), dat.end(), frames.begin() + i * msg->size);
+    }
+
+    std::unique_ptr<bool[]> valid(new bool[n]);
+    volatile size_t sink = 0;
+    double ns[2] = {1e18, 1e18};
+    for (int run = 0; run < 5; run++) {
+      ns[0] = std::min(ns[0], time_ns([&]() {
+        for (size_t i = 0; i < n; i++) {
+          std::vector<uint8_t> dat(frames.begin() + i * msg->size, frames.begin() + (i + 1) * msg->size);
+          sink = sink + (sig->calc_checksum(msg->address, *sig, dat.data(), dat.size()) == get_raw_value_bytewise(dat.data(), dat.size(), *sig));
+        }
+      }, 1) / n);
+      ns[1] = std::min(ns[1], time_ns([&]() {
+        sink = sink + verify_checksums(msg->address, *sig, frames.data(), msg->size, msg->size, n, valid.get());
+      }, 1) / n);
+    }
+
+    if (verify_checksums(msg->address, *sig, frames.data(), msg->size, msg->size, n, valid.get()) != n) {
+      printf("invalid checksums: %s %s\n", name.c_str(), msg_name.c_str());
+      failures++;
+    }
+    printf("%-40s %-16s %6u %10.1f %10.1f %10.0f\n", name.c_str(), msg_name.c_str(), msg->size, ns[0], ns[1], msg->size / ns[1] * 1e3);
+  }
+  printf("\n");
+  return failures;
+}
+
+int benchmark_checksum_tables() {
+  printf("table-driven checksums vs their bit/byte-serial references, random payloads of 1-64 bytes (ns/frame)\n");
+  printf("%-12s %10s %10s %10s\n", "checksum", "frames", "reference", "table");
+
+  typedef unsigned int (*checksum_func)(uint32_t address, const Signal &sig, const uint8_t *d, size_t len);
+  const std::tuple<const char *, checksum_func, checksum_func> checksums[] = {
+    {"honda", honda_checksum_bytewise, honda_checksum},
+    {"chrysler", chrysler_checksum_bitwise, chrysler_checksum},
+    {"pedal", pedal_checksum_bitwise, pedal_checksum},
+  };
+
+  std::mt19937 rng(0);
+  const size_t n = 100000;
+  std::vector<uint32_t> addresses(n);
+  std::vector<size_t> lens(n);
+  std::vector<uint8_t> payloads(n * 64);
+  for (size_t i = 0; i < n; i++) {
+    addresses[i] = (i % 2) ? rng() & 0x1FFFFFFF : rng() & 0x7FF;
+    lens[i] = 1 + rng() % 64;
+  }
+  std::generate(payloads.begin(), payloads.end(), [&]() { return rng() & 0xFF; });
+
+  int failures = 0;
+  const Signal sig = {};
+  for (const auto &[name, reference, table] : checksums) {
+    for (size_t i = 0; i < n; i++) {
+      if (reference(addresses[i], sig, &payloads[i * 64], lens[i]) != table(addresses[i], sig, &payloads[i * 64], lens[i])) {
+        printf("checksum mismatch: %s frame %zu\n", name, i);
+        failures++;
+      }
+    }
+
+    volatile unsigned int sink = 0;
+    double ns[2] = {1e18, 1e18};
+    for (int run = 0; run < 3; run++) {
+      int k = 0;
+      for (checksum_func f : {reference, table}) {
+        ns[k] = std::min(ns[k], time_ns([&]() {
+          for (size_t i = 0; i < n; i++) sink = sink + f(addresses[i], sig, &payloads[i * 64], lens[i]);
+        }, 1) / n);
+        k++;
+      }
+    }
+    printf("%-12s %10zu %10.1f %10.1f\n", name, n, ns[0], ns[1]);
+  }
+  printf("\n");
+  return failures;
+}
+
+int benchmark_memo() {
+  printf("MessageState::decode of every message, repeated payloads vs a new value in every frame (ns/frame)\n");
+  printf("%-40s %10s %10s %10s\n", "dbc", "repeated", "changing", "hit rate");
+
+  for (const std::string name : {"toyota_nodsu_pt_generated", "hyundai_canfd", "honda_civic_touring_2016_can_generated"}) {
+    const DBC *dbc = dbc_lookup(name);
+    CANPacker repeated_packer(name), changing_packer(name);
+    std::vector<std::pair<uint32_t, int>> messages;
+    for (const auto &msg : dbc->msgs) messages.push_back({msg.address, 0});
+
+    // 100 frames of each message, counters and checksums are valid
+    std::mt19937 rng(0);
+    std::vector<std::pair<uint32_t, std::vector<uint8_t>>> repeated, changing;
+    for (int step = 0; step < 100; step++) {
+      for (const auto &msg : dbc->msgs) {
+        repeated.push_back({msg.address, repeated_packer.pack(msg.address, {})});
+        std::vector<SignalPackValue> values;
+        for (const auto &sig : msg.sigs) {
+          if (sig.type == SignalType::DEFAULT) values.push_back({sig.name, (double)(rng() % 2)});
+        }
+        changing.push_back({msg.address, changing_packer.pack(msg.address, values)});
+      }
+    }
+
+    double ns[2] = {1e18, 1e18};
+    double hit_rate = 0;
+    int k = 0;
+    for (const auto *frames : {&repeated, &changing}) {
+      CANParser parser(0, name, messages);
+      std::vector<MessageState *> states;
+      for (const auto &[address, dat] : *frames) states.push_back(parser.getMessageState(address));
+
+      double out;
+      bool checksum_valid, counter_valid;
+      for (int run = 0; run < 10; run++) {
+        ns[k] = std::min(ns[k], time_ns([&]() {
+          for (size_t i = 0; i < frames->size(); i++) {
+            states[i]->decode((*frames)[i].second, &out, 0, checksum_valid, counter_valid);
+          }
+        }, 1) / frames->size());
+      }
+      if (frames == &changing) {
+        auto [hits, misses] = parser.memoStats();
+        hit_rate = (double)hits / (hits + misses);
+      }
+      k++;
+    }
+    printf("%-40s %10.1f %10.1f %9.0f%%\n", name.c_str(), ns[0], ns[1], hit_rate * 100);
+  }
+  printf("\n");
+  return 0;
+}
+
+bool same_dbc(const DBC &a, const DBC &b) {
+  auto same_sig = [](const Signal &x, const Signal &y) {
+    return x.name == y.name && x.start_bit == y.start_bit && x.msb == y.msb && x.lsb == y.lsb && x.size == y.size &&
+           x.is_signed == y.is_signed && x.factor == y.factor && x.offset == y.offset &&
+           x.is_little_endian == y.is_little_endian && x.type == y.type && x.calc_checksum == y.calc_checksum &&
+           x.plan_fast == y.plan_fast && x.plan_offset == y.plan_offset && x.plan_shift == y.plan_shift;
+  };
+  if (a.name != b.name || a.msgs.size() != b.msgs.size() || a.vals.size() != b.vals.size()) return false;
+  for (size_t i = 0; i < a.msgs.size(); i++) {
+    const Msg &x = a.msgs[i], &y = b.msgs[i];
+    if (x.name != y.name || x.address != y.address || x.size != y.size || x.sigs.size() != y.sigs.size()) return false;
+    if (!std::equal(x.sigs.begin(), x.sigs.end(), y.sigs.begin(), same_sig)) return false;
+    if (b.addr_to_msg.at(y.address) != &y || b.name_to_msg.at(y.name) != &y) return false;
+  }
+  for (size_t i = 0; i < a.vals.size(); i++) {
+    const Val &x = a.vals[i], &y = b.vals[i];
+    if (x.name != y.name || x.address != y.address || x.def_val != y.def_val || x.defs != y.defs) return false;
+  }
+  return true;
+}
+
+std::string read_dbc(const std::string &name) {
+  std::ifstream infile(DBC_FILE_PATH "/" + name + ".dbc");
+  std::stringstream content;
+  content << infile.rdbuf();
+  return content.str();
+}
+
+DBC *parse_dbc(const std::string &dbc_name, const std::string &content) {
+  std::istringstream stream(content);
+  std::unique_ptr<ChecksumState> checksum(get_checksum(dbc_name));
+  return dbc_parse_from_stream(dbc_name, stream, checksum.get());
+}
+
+int benchmark_dbc_parse() {
+  printf("parsing every DBC from text, generated ones included\n");
+  printf("%-48s %8s %10s\n", "dbc", "lines", "ms");
+
+  std::vector<std::string> names = get_dbc_names();
+  std::sort(names.begin(), names.end());
+
+  std::vector<std::pair<double, std::string>> times;
+  size_t total_lines = 0, total_bytes = 0;
+  double total_ns = 0;
+  for (const auto &name : names) {
+    const std::string content = read_dbc(name);
+    const std::string dbc_name = name + ".dbc";
+
+    // best of several runs, the machine may be shared
+    double ns = 1e18;
+    for (int run = 0; run < 3; run++) {
+      ns = std::min(ns, time_ns([&]() { std::unique_ptr<DBC> dbc(parse_dbc(dbc_name, content)); }, 1));
+    }
+    times.push_back({ns, name});
+    total_lines += std::count(content.begin(), content.end(), '\n');
+    total_bytes += content.size();
+    total_ns += ns;
+  }
+
+  std::sort(times.rbegin(), times.rend());
+  for (size_t i = 0; i < std::min<size_t>(5, times.size()); i++) {
+    const std::string content = read_dbc(times[i].second);
+    printf("%-48s %8zd %10.2f\n", times[i].second.c_str(), std::count(content.begin(), content.end(), '\n'), times[i].first * 1e-6);
+  }
+  printf("%-48s %8zu %10.2f  (%.1f MB/s)\n\n", "all", total_lines, total_ns * 1e-6, total_bytes / (total_ns * 1e-9) / 1e6);
+  return 0;
+}
+
+int benchmark_dbc_cache() {
+  printf("loading every DBC, text parse vs binary cache\n");
+
+  const std::string dir = std::filesystem::temp_directory_path() / ("opendbc_benchmark_cache_" + std::to_string(getpid()));
+  std::vector<std::string> names = get_dbc_names();
+  std::sort(names.begin(), names.end());
+
+  int failures = 0;
+  double parse_ns = 0, load_ns = 0;
+  for (const auto &name : names) {
+    const std::string content = read_dbc(name);
+    const std::string dbc_name = name + ".dbc";
+    const uint64_t hash = dbc_content_hash(dbc_name + "\n" + content);
+
+    std::unique_ptr<DBC> parsed;
+    parse_ns += time_ns([&]() { parsed.reset(parse_dbc(dbc_name, content)); }, 1);
+    dbc_cache_store(dir, *parsed, hash);
+
+    std::unique_ptr<DBC> loaded;
+    load_ns += time_ns([&]() { loaded.reset(dbc_cache_load(dir, dbc_name, hash)); }, 1);
+    if (!loaded || !same_dbc(*parsed, *loaded)) {
+      printf("cache mismatch: %s\n", name.c_str());
+      failures++;
+    }
+  }
+  std::filesystem::remove_all(dir);
+
+  printf("%zu DBCs: parse %.1f ms, cache load %.1f ms\n\n", names.size(), parse_ns * 1e-6, load_ns * 1e-6);
+  return failures;
+}
+
+int main() {
+  int failures = benchmark_signals();
+  failures += benchmark_parser();
+  failures += benchmark_checksums();
+  failures += benchmark_checksum_tables();
+  failures += benchmark_memo();
+  failures += benchmark_dbc_parse();
+  failures += benchmark_dbc_cache();
+  if (failures > 0) {
+    printf("%d mismatches against the reference implementations\n", failures);
+    return 1;
+  }
+  return 0;
+}
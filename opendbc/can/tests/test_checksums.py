@@ -1,5 +1,9 @@
 import copy
-from opendbc.can.parser import CANParser
+import numpy as np
+import pytest
+
+from opendbc.can.parser import CANParser, CAN_FRAME_DTYPE, verify_checksums
+from opendbc.can.parser_pyx import _checksums  # pylint: disable=no-name-in-module, import-error
 from opendbc.can.packer import CANPacker
 
 
@@ -554,3 +558,87 @@ class TestCanChecksums:
       b'\x9b\x3e\x2b\x10\x00\x00\x22\x81',
       b'\x72\x3f\x2b\x10\x00\x00\x22\x81',
     ])
+
+  @pytest.mark.parametrize("dbc_file, msg_name", [
+    ("honda_civic_touring_2016_can_generated", "STEERING_CONTROL"),
+    ("toyota_nodsu_pt_generated", "STEERING_LKA"),
+    ("vw_mqb_2010", "HCA_01"),
+    ("vw_golf_mk4", "Lenkhilfe_3"),
+    ("hyundai_canfd", "LKAS"),
+    ("subaru_global_2017_generated", "ES_LKAS"),
+    ("chrysler_pacifica_2017_hybrid_generated", "LKAS_COMMAND"),
+    ("comma_body", "TORQUE_CMD"),
+    ("fca_giorgio", "EPS_3"),
+  ])
+  def test_verify_checksums(self, dbc_file, msg_name):
+    packer = CANPacker(dbc_file)
+    payloads = packer.pack_array(msg_name, {"COUNTER": np.arange(100) % 4})
+    payloads[1::2, 0] ^= 0x1  # breaks every other checksum
+
+    valid = verify_checksums(dbc_file, msg_name, payloads)
+    assert valid.dtype == np.bool_
+    assert list(valid[::2]) == [True] * 50
+    assert not valid[1::2].any()
+
+    # strided payloads straight from log records
+    frames = np.zeros(len(payloads), dtype=CAN_FRAME_DTYPE)
+    frames['dat'][:, :payloads.shape[1]] = payloads
+    addr = packer.make_can_msg(msg_name, 0, {})[0]
+    assert np.array_equal(verify_checksums(dbc_file, addr, frames['dat']), valid)
+
+  def test_verify_checksums_errors(self):
+    with pytest.raises(RuntimeError):
+      verify_checksums("toyota_nodsu_pt_generated", "NOT_A_MESSAGE", np.zeros((1, 8), dtype=np.uint8))
+    with pytest.raises(ValueError):
+      verify_checksums("toyota_nodsu_pt_generated", "GEAR_PACKET", np.zeros((1, 8), dtype=np.uint8))
+    with pytest.raises(ValueError):
+      verify_checksums("toyota_nodsu_pt_generated", "STEERING_LKA", np.zeros((1, 2), dtype=np.uint8))
+    assert verify_checksums("toyota_nodsu_pt_generated", "STEERING_LKA", np.zeros((0, 5), dtype=np.uint8)).shape == (0,)
+
+  @staticmethod
+  def honda_checksum(address: int, dat: bytes) -> int:
+    s = sum(int(n, 16) for n in f"{address:x}")
+    s += sum((b & 0xF) + (b >> 4) for b in dat[:-1]) + (dat[-1] >> 4)
+    return (8 - s + (3 if address > 0x7FF else 0)) & 0xF
+
+  @staticmethod
+  def crc8(poly: int, init: int, dat: bytes) -> int:
+    crc = init
+    for b in dat:
+      crc ^= b
+      for _ in range(8):
+        crc = ((crc << 1) ^ poly) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+  @pytest.mark.parametrize("dbc_file, msg_name", [
+    ("honda_civic_touring_2016_can_generated", "STEERING_CONTROL"),
+    ("chrysler_pacifica_2017_hybrid_generated", "LKAS_COMMAND"),
+    ("comma_body", "TORQUE_CMD"),
+  ])
+  def test_table_checksums_random(self, dbc_file, msg_name):
+    """Table-driven checksums against bit-serial references on random payloads"""
+    address = CANPacker(dbc_file).make_can_msg(msg_name, 0, {})[0]
+    payloads = np.random.default_rng(0).integers(0, 256, size=(2000, 6), dtype=np.uint8)
+    if dbc_file.startswith("honda"):
+      payloads = payloads[:, :5]
+      for dat in payloads:
+        dat[-1] = (dat[-1] & 0xF0) | self.honda_checksum(address, dat.tobytes())
+    elif dbc_file.startswith("chrysler"):
+      for dat in payloads:
+        dat[-1] = self.crc8(0x1D, 0xFF, dat[:-1].tobytes()) ^ 0xFF
+    else:
+      for dat in payloads:
+        dat[-1] = self.crc8(0xD5, 0xFF, dat[-2::-1].tobytes())
+
+    assert verify_checksums(dbc_file, msg_name, payloads).all()
+    payloads[:, -1] ^= 0x1
+    assert not verify_checksums(dbc_file, msg_name, payloads).any()
+
+    # bit-exact with the original C++ implementations the tables replaced, for every payload length
+    rng = np.random.default_rng(1)
+    for size in range(1, 65):
+      payloads = rng.integers(0, 256, size=(200, size), dtype=np.uint8)
+      assert np.array_equal(_checksums(dbc_file, msg_name, payloads), _checksums(dbc_file, msg_name, payloads, reference=True)), size
+
+    with pytest.raises(ValueError):
+      _checksums("toyota_nodsu_pt_generated", "STEERING_LKA", payloads, reference=True)
@@ -1,6 +1,41 @@
-from opendbc.can.parser import CANParser
+import concurrent.futures
+import os
+import subprocess
+import sys
+
+import pytest
+
+from opendbc.can import preload
+from opendbc.can.packer import CANPacker
+from opendbc.can.parser import CANParser, CANDefine, dbc_loaded
 from opendbc.can.tests import ALL_DBCS
 
+# one DBC per checksum type
+CACHE_TEST_DBCS = ["honda_civic_touring_2016_can_generated", "toyota_nodsu_pt_generated", "hyundai_canfd", "vw_mqb_2010",
+                   "vw_golf_mk4", "subaru_global_2017_generated", "chrysler_pacifica_2017_hybrid_generated", "fca_giorgio", "comma_body"]
+
+# packs and parses every message, prints everything that depends on the loaded DBC
+CACHE_TEST_SCRIPT = """
+import re
+import sys
+from opendbc import DBC_PATH
+from opendbc.can import preload
+from opendbc.can.parser import CANParser, CANDefine
+from opendbc.can.packer import CANPacker
+
+for dbc in sys.argv[1:]:
+  with open(f"{DBC_PATH}/{dbc}.dbc") as f:
+    names = re.findall(r"^BO_ \\w+ (\\w+)", f.read(), re.MULTILINE)
+  packer = CANPacker(dbc)
+  parser = CANParser(dbc, [(name, 0) for name in names], 0)
+  for i, name in enumerate(names):
+    values = {sig: (i * 7 + j * 3) % 4 for j, sig in enumerate(parser.vl[name])}
+    msg = packer.make_can_msg(name, 0, values)
+    parser.update_strings([1000, [msg]])
+    print(dbc, name, msg[1].hex(), dict(parser.vl[name]))
+  print(dbc, CANDefine(dbc).dv)
+"""
+
 
 class TestDBCParser:
   def test_enough_dbcs(self):
@@ -19,3 +54,106 @@ class TestDBCParser:
     for dbc in ALL_DBCS:
       with subtests.test(dbc=dbc):
         CANParser(dbc, [], 0)
+
+  def test_dbc_cache(self, tmp_path):
+    """DBCs loaded from the binary cache behave the same as parsed ones, including checksums"""
+    def run(cache_dir):
+      env = {k: v for k, v in os.environ.items() if k != "OPENDBC_CACHE_DIR"}
+      if cache_dir is not None:
+        env["OPENDBC_CACHE_DIR"] = str(cache_dir)
+      return subprocess.check_output([sys.executable, "-c", CACHE_TEST_SCRIPT, *CACHE_TEST_DBCS], env=env, text=True)
+
+    # opt-in, nothing is written without OPENDBC_CACHE_DIR
+    home = tmp_path / "home"
+    home.mkdir()
+    with pytest.MonkeyPatch.context() as mp:
+      mp.setenv("HOME", str(home))
+      mp.setenv("XDG_CACHE_HOME", str(home / ".cache"))
+      uncached = run(None)
+    assert not any(home.iterdir())
+    assert run("") == uncached
+
+    cache_dir = tmp_path / "cache"
+
+    assert run(cache_dir) == uncached
+    cache_files = {f: f.stat().st_mtime_ns for f in cache_dir.iterdir()}
+    assert len(cache_files) == len(CACHE_TEST_DBCS)
+
+    # warm start reads the cache without rewriting it
+    assert run(cache_dir) == uncached
+    assert {f: f.stat().st_mtime_ns for f in cache_dir.iterdir()} == cache_files
+
+    # corrupt entries are ignored and replaced
+    for f in cache_files:
+      f.write_bytes(f.read_bytes()[:100])
+    assert run(cache_dir) == uncached
+    assert all(f.stat().st_size > 100 for f in cache_files)
+
+    # as are entries with a corrupted message or signal count
+    def count_offsets(data):
+      msg_count = 20 + int.from_bytes(data[16:20], "little")  # after magic, version, hash and DBC name
+      sig_count = msg_count + 16 + int.from_bytes(data[msg_count + 4:msg_count + 8], "little")  # after the first message's name, address, size
+      return msg_count, sig_count
+
+    for i in range(2):
+      for f in cache_files:
+        data = bytearray(f.read_bytes())
+        offset = count_offsets(data)[i]
+        data[offset:offset + 4] = b"\xff" * 4
+        f.write_bytes(data)
+      assert run(cache_dir) == uncached
+
+  def test_preload(self):
+    """DBCs parsed concurrently match the ones parsed one at a time"""
+    env = {**os.environ, "OPENDBC_CACHE_DIR": ""}
+    preloaded_script = "import sys\nfrom opendbc.can import preload\npreload(sys.argv[1:], max_workers=8)\n" + CACHE_TEST_SCRIPT
+    serial = subprocess.check_output([sys.executable, "-c", CACHE_TEST_SCRIPT, *CACHE_TEST_DBCS], env=env, text=True)
+    assert subprocess.check_output([sys.executable, "-c", preloaded_script, *CACHE_TEST_DBCS], env=env, text=True) == serial
+
+    preload({"pt": ALL_DBCS[0], "radar": None})
+    with pytest.raises(RuntimeError, match="not_a_dbc"):
+      preload([ALL_DBCS[0], "not_a_dbc"])
+    assert dbc_loaded(ALL_DBCS[0]) and not dbc_loaded("not_a_dbc")
+
+    # nothing left to parse, no threads are started
+    with pytest.MonkeyPatch.context() as mp:
+      mp.setattr(concurrent.futures, "ThreadPoolExecutor", None)
+      preload({"pt": ALL_DBCS[0], "radar": None})
+
+  def test_dbc_syntax(self, tmp_path):
+    dbc = tmp_path / "syntax.dbc"
+    dbc.write_text("""
+BO_ 100 MUX  : 8 XXX
+ SG_ MODE M : 0|2@1+ (1,0) [0|3] "" XXX
+ SG_ VALUE m1 : 8|16@0- (0.5,-1e+2) [-1E3|1E3] "km/h" XXX
+
+VAL_ 100 MODE 0 "off" 1 "slow speed" 2 "Fast" ;
+""")
+    CANParser(str(dbc), [("MUX", 0)], 0)
+    assert CANDefine(str(dbc)).dv["MUX"]["MODE"] == {0: "OFF", 1: "SLOW_SPEED", 2: "FAST"}
+
+  def test_dbc_value_tables(self, tmp_path):
+    """VAL_ tables past int64 or with malformed values don't get in the way of parsing and packing"""
+    for name, values in [("big", '18446744073709551615 "unset" 0 "off"'), ("malformed", '0 "off" 1.5 "half"')]:
+      dbc = tmp_path / f"{name}.dbc"
+      dbc.write_text(f'\nBO_ 100 MSG: 8 XXX\n SG_ MODE : 0|64@1+ (1,0) [0|0] "" XXX\n\nVAL_ 100 MODE {values} ;\n')
+      parser = CANParser(str(dbc), [("MSG", 0)], 0)
+      parser.update_strings([0, [CANPacker(str(dbc)).make_can_msg("MSG", 0, {"MODE": 3})]])
+      assert parser.vl["MSG"]["MODE"] == 3
+
+    assert CANDefine(str(tmp_path / "big.dbc")).dv["MSG"]["MODE"] == {18446744073709551615: "UNSET", 0: "OFF"}
+    with pytest.raises(ValueError):
+      CANDefine(str(tmp_path / "malformed.dbc"))
+
+  @pytest.mark.parametrize("line, error", [
+    ("BO_ 100 MSG: 8", "[bad.dbc:3] bad BO: BO_ 100 MSG: 8"),
+    (' SG_ SIG : 0|8@1+ (1,0) [0|255] "" ', '[bad.dbc:3] bad SG: SG_ SIG : 0|8@1+ (1,0) [0|255] ""'),
+    (" SG_ SIG : 0|8@1+ (1;0) [0|255] \"\" XXX", "[bad.dbc:3] bad SG: SG_ SIG : 0|8@1+ (1;0) [0|255] \"\" XXX"),
+    ('VAL_ 100 SIG 0 off ;', '[bad.dbc:3] bad VAL: VAL_ 100 SIG 0 off ;'),
+  ])
+  def test_dbc_syntax_errors(self, tmp_path, line, error):
+    dbc = tmp_path / "bad.dbc"
+    dbc.write_text(f"\nBO_ 100 MSG: 8 XXX\n{line}\n")
+    with pytest.raises(RuntimeError) as e:
+      CANParser(str(dbc), [], 0)
+    assert str(e.value) == error
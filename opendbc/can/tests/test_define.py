@@ -24,3 +24,9 @@ class TestCADNDefine:
     for dbc in ALL_DBCS:
       with subtests.test(dbc=dbc):
         CANDefine(dbc)
+
+  def test_shared_tables(self):
+    dbc_file = "toyota_nodsu_pt_generated"
+    defs = CANDefine(dbc_file)
+    assert CANDefine(dbc_file).dv is defs.dv
+    assert CANDefine(dbc_file).dbc_name == defs.dbc_name
@@ -1,7 +1,12 @@
+import copy
+import json
 import pytest
 import random
+import numpy as np
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 
-from opendbc.can.parser import CANParser
+from opendbc.can.parser import CANParser, CANParserGroup, can_frames, decode_log, profile, profile_summary, profile_trace
 from opendbc.can.packer import CANPacker
 from opendbc.can.tests import TEST_DBC
 
@@ -48,6 +53,115 @@ class TestCanParserPacker:
       parser.update_strings([0, [msg]])
       assert parser.vl["CAN_FD_MESSAGE"]["COUNTER"] == ((cnt + i) % 256)
 
+  def test_prepared_message(self):
+    dbc_file = "honda_civic_touring_2016_can_generated"
+    names = ("STEERING_CONTROL", "ACC_HUD", "GAS_PEDAL_2")
+    packer, prepared_packer = CANPacker(dbc_file), CANPacker(dbc_file)
+    parser = CANParser(dbc_file, [(name, 0) for name in names], 0)
+
+    for name in names:
+      signals = [s for s in parser.vl[name] if s not in ("COUNTER", "CHECKSUM")]
+      handle = prepared_packer.prepare(name, signals)
+      assert handle.signals == tuple(signals)
+      for _ in range(20):
+        values = [random.randint(0, 3) for _ in signals]
+        assert handle.pack(1, values) == packer.make_can_msg(name, 1, dict(zip(signals, values, strict=True)))
+
+    # COUNTER overrides and counts on from there, shared with make_can_msg
+    handle = prepared_packer.prepare("STEERING_CONTROL", ["COUNTER", "STEER_TORQUE"])
+    assert handle.pack(0, (2, 10)) == packer.make_can_msg("STEERING_CONTROL", 0, {"COUNTER": 2, "STEER_TORQUE": 10})
+    assert prepared_packer.make_can_msg("STEERING_CONTROL", 0, {}) == packer.make_can_msg("STEERING_CONTROL", 0, {})
+
+    with pytest.raises(ValueError):
+      handle.pack(0, (1,))
+    with pytest.raises(RuntimeError):
+      prepared_packer.prepare("NOT_A_MESSAGE", [])
+    with pytest.raises(RuntimeError):
+      prepared_packer.prepare("STEERING_CONTROL", ["NOT_A_SIGNAL"])
+
+  def test_make_can_msgs(self):
+    dbc_file = "honda_civic_touring_2016_can_generated"
+    packer, batch_packer = CANPacker(dbc_file), CANPacker(dbc_file)
+
+    assert batch_packer.make_can_msgs([]) == []
+    for i in range(20):
+      msgs = [
+        ("STEERING_CONTROL", 0, {"STEER_TORQUE": i, "STEER_TORQUE_REQUEST": 1}),
+        ("ACC_HUD", 0, {"CRUISE_SPEED": i + 10}),
+        (0x1FA, 2, {"COMPUTER_BRAKE": i}),  # BRAKE_COMMAND by address
+        ("STEERING_CONTROL", 1, {"STEER_TORQUE": -i}),  # counter advances within the batch
+      ]
+      assert batch_packer.make_can_msgs(msgs) == [packer.make_can_msg(*m) for m in msgs]
+
+    # counters are shared with make_can_msg
+    assert batch_packer.make_can_msg("ACC_HUD", 0, {}) == packer.make_can_msg("ACC_HUD", 0, {})
+
+  def test_pack_array(self):
+    for dbc_file, name in [("honda_civic_touring_2016_can_generated", "STEERING_CONTROL"),
+                           ("toyota_nodsu_pt_generated", "STEERING_LKA"),
+                           ("hyundai_canfd", "LKAS")]:
+      packer, array_packer = CANPacker(dbc_file), CANPacker(dbc_file)
+      signals = [s for s in CANParser(dbc_file, [(name, 0)], 0).vl[name] if s not in ("COUNTER", "CHECKSUM")][:4]
+      values = {s: np.arange(300) % (i + 3) for i, s in enumerate(signals)}
+      values[signals[-1]] = 1  # constant
+
+      out = array_packer.pack_array(name, values)
+      assert out.shape[0] == 300 and out.dtype == np.uint8
+      for i in range(300):
+        msg = packer.make_can_msg(name, 0, {s: np.broadcast_to(v, 300)[i] for s, v in values.items()})
+        assert out[i].tobytes() == msg[1]
+
+      # explicit counters, and counters carry on in make_can_msg
+      out = array_packer.pack_array(name, {"COUNTER": np.arange(5) % 2}, n=5)
+      assert [packer.make_can_msg(name, 0, {"COUNTER": i % 2})[1] for i in range(5)] == [row.tobytes() for row in out]
+      assert array_packer.make_can_msg(name, 0, {}) == packer.make_can_msg(name, 0, {})
+
+    assert array_packer.pack_array(name, {}, n=3).shape == (3, 16)
+    assert array_packer.pack_array(name, {}, n=0).shape == (0, 16)
+    with pytest.raises(ValueError):
+      array_packer.pack_array(name, {signals[0]: np.zeros(3), signals[1]: np.zeros(4)})
+    with pytest.raises(ValueError):
+      array_packer.pack_array(name, {})
+
+  def test_packer_cache(self):
+    dbc_file = "honda_civic_touring_2016_can_generated"
+    uncached = CANPacker(dbc_file, cache_size=0)
+    for cache_size in (1, 2, 32):
+      packer, reference = CANPacker(dbc_file, cache_size=cache_size), CANPacker(dbc_file, cache_size=0)
+      random.seed(cache_size)
+      for _ in range(1000):
+        name = random.choice(["STEERING_CONTROL", "ACC_HUD", "LKAS_HUD"])
+        values = random.choice([{}, {"COUNTER": 1}, {"COUNTER": random.randint(0, 3)}, {"SET_ME_X41": 0x41, "BEEP": 0},
+                                {"STEER_TORQUE": random.randint(-2, 2)}, {"CRUISE_SPEED": random.randint(0, 2)}])
+        assert packer.make_can_msg(name, 0, values) == reference.make_can_msg(name, 0, values)
+
+      info = packer.cache_info()
+      assert info["hits"] > 0 and info["hits"] + info["misses"] == 1000
+    assert uncached.cache_info() == {"hits": 0, "misses": 0}
+
+    # static message: every pack after the first only updates counter and checksum
+    packer = CANPacker(dbc_file)
+    msgs = [packer.make_can_msg("STEERING_CONTROL", 0, {"STEER_TORQUE": 3}) for _ in range(10)]
+    assert packer.cache_info() == {"hits": 9, "misses": 1}
+    assert msgs == [uncached.make_can_msg("STEERING_CONTROL", 0, {"STEER_TORQUE": 3}) for _ in range(10)]
+
+    # COUNTER passed every frame, it's left out of the cache key like the computed CHECKSUM
+    packer = CANPacker(dbc_file)
+    values = [{"STEER_TORQUE": 3, "COUNTER": i % 4, "CHECKSUM": i} for i in range(10)]
+    msgs = [packer.make_can_msg("STEERING_CONTROL", 0, v) for v in values]
+    assert packer.cache_info() == {"hits": 9, "misses": 1}
+    assert msgs == [uncached.make_can_msg("STEERING_CONTROL", 0, v) for v in values]
+    assert packer.make_can_msg("STEERING_CONTROL", 0, {"STEER_TORQUE": 3}) == uncached.make_can_msg("STEERING_CONTROL", 0, {"STEER_TORQUE": 3})
+
+    # a CHECKSUM computed by the caller is part of the key
+    packer, uncached = CANPacker("byd_general_pt"), CANPacker("byd_general_pt", cache_size=0)
+    values = [{"COUNTER": i % 16, "CHECKSUM": i % 2} for i in range(10)]
+    assert [packer.make_can_msg("STEERING_TORQUE", 0, v) for v in values] == [uncached.make_can_msg("STEERING_TORQUE", 0, v) for v in values]
+    assert packer.cache_info() == {"hits": 0, "misses": 10}
+
+    with pytest.raises(ValueError):
+      CANPacker(dbc_file, cache_size=-1)
+
   def test_parser_can_valid(self):
     msgs = [("CAN_FD_MESSAGE", 10), ]
     packer = CANPacker(TEST_DBC)
@@ -103,6 +217,54 @@ class TestCanParserPacker:
     parser.update_strings([0, [msg]])
     assert parser.can_valid
 
+  def test_parser_can_valid_random(self):
+    """can_valid matches a scan of every message on each step, with drops, bad counters and time jumps"""
+    dbc_file = "honda_civic_touring_2016_can_generated"
+    msgs = [("STEERING_CONTROL", 100), ("VSA_STATUS", 50), ("STEER_MOTOR_TORQUE", 0), ("POWERTRAIN_DATA", 10)]
+    packer = CANPacker(dbc_file)
+    parser = CANParser(dbc_file, msgs, 0)
+
+    thresholds = {name: int(1e9) // freq * 10 if freq > 0 else 0 for name, freq in msgs}
+    last_seen = dict.fromkeys(thresholds, 0)
+    counter = dict.fromkeys(thresholds, 0)
+    counter_fail = dict.fromkeys(thresholds, 0)
+    invalid_cnt = MAX_BAD_COUNTER
+
+    random.seed(0)
+    t = 0
+    for _ in range(5000):
+      r = random.random()
+      if r < 0.01:
+        t = max(t - random.randint(0, int(2e9)), 0)
+      elif r < 0.03:
+        t += random.randint(0, int(3e9))
+      else:
+        t += int(1e7)
+
+      can_msgs = []
+      for name in thresholds:
+        if random.random() < 0.2:
+          continue
+        cnt = (counter[name] + 1) % 4 if random.random() < 0.95 else random.randint(0, 3)
+        can_msgs.append(packer.make_can_msg(name, 0, {"COUNTER": cnt}))
+
+        # reference: MessageState counter check, values and timestamp only commit if it passes
+        if (counter[name] + 1) % 4 != cnt:
+          counter_fail[name] = min(counter_fail[name] + 1, MAX_BAD_COUNTER)
+        elif counter_fail[name] > 0:
+          counter_fail[name] -= 1
+        counter[name] = cnt
+        if counter_fail[name] < MAX_BAD_COUNTER:
+          last_seen[name] = t
+
+      parser.update_strings([t, can_msgs])
+
+      valid = all(thr == 0 or (last_seen[name] != 0 and (t - last_seen[name]) % 2**64 <= thr)
+                  for name, thr in thresholds.items())
+      invalid_cnt = 0 if valid else invalid_cnt + 1
+      expected = invalid_cnt < MAX_BAD_COUNTER and all(f < MAX_BAD_COUNTER for f in counter_fail.values())
+      assert parser.can_valid == expected
+
   def test_parser_no_partial_update(self):
     """
     Ensure that the CANParser doesn't partially update messages with invalid signals (COUNTER/CHECKSUM).
@@ -176,6 +338,197 @@ class TestCanParserPacker:
         for sig in ("STEER_TORQUE", "STEER_TORQUE_REQUEST", "COUNTER", "CHECKSUM"):
           assert parser.vl["STEERING_CONTROL"][sig] == parser.vl[228][sig]
 
+  def test_update_buffer(self):
+    """Bulk ingestion matches update_strings, including frames from other buses"""
+    dbc_file = "honda_civic_touring_2016_can_generated"
+    msgs = [("VSA_STATUS", 50), ("STEERING_CONTROL", 100)]
+    packer = CANPacker(dbc_file)
+    parser_strings = CANParser(dbc_file, msgs, 0)
+    parser_buffer = CANParser(dbc_file, msgs, 0)
+
+    for i in range(100):
+      can_strings = []
+      for j in range(random.randrange(1, 4)):
+        frames = [
+          packer.make_can_msg("VSA_STATUS", 0, {"USER_BRAKE": random.randrange(100)}),
+          packer.make_can_msg("STEERING_CONTROL", random.randrange(3), {"STEER_TORQUE": random.randrange(-256, 256)}),
+        ]
+        can_strings.append((int((i * 3 + j) * 0.01 * 1e9), frames))
+
+      frames = can_frames(can_strings)
+      buffers = (frames, frames.tobytes(), memoryview(frames.tobytes()))
+      assert parser_strings.update_strings(can_strings) == parser_buffer.update_buffer(buffers[i % len(buffers)])
+      assert parser_strings.vl == parser_buffer.vl
+      assert parser_strings.vl_all == parser_buffer.vl_all
+      assert parser_strings.ts_nanos == parser_buffer.ts_nanos
+      assert parser_strings.can_valid == parser_buffer.can_valid
+      assert parser_strings.bus_timeout == parser_buffer.bus_timeout
+
+    with pytest.raises(ValueError):
+      parser_buffer.update_buffer(b'\x00' * 10)
+
+  def test_parser_group(self):
+    """A group of parsers matches updating each one on its own"""
+    dbc_file = "honda_civic_touring_2016_can_generated"
+    packer = CANPacker(dbc_file)
+
+    def make_parsers():
+      return {
+        "pt": CANParser(dbc_file, [("VSA_STATUS", 50), ("STEERING_CONTROL", 100)], 0),
+        "pt_extra": CANParser(dbc_file, [("POWERTRAIN_DATA", 10)], 0),
+        "cam": CANParser(dbc_file, [("STEERING_CONTROL", 100)], 2),
+        "unused": None,
+      }
+    parsers, group_parsers = make_parsers(), make_parsers()
+    group = CANParserGroup(group_parsers)
+
+    random.seed(0)
+    for i in range(1, 500):
+      can_strings = []
+      for step in range(random.randint(1, 3)):
+        can_msgs = []
+        for bus in (0, 1, 2, 3):
+          if random.random() < 0.8 and not 100 < i < 150:
+            for name in ("VSA_STATUS", "STEERING_CONTROL", "POWERTRAIN_DATA"):
+              can_msgs.append(packer.make_can_msg(name, bus, {"USER_BRAKE": i, "STEER_TORQUE": step}))
+        can_strings.append([int(i * 1e8 + step * 1e7), can_msgs])
+
+      updated = group.update_strings(can_strings)
+      assert set(updated) == {"pt", "pt_extra", "cam"}
+      for key, cp in parsers.items():
+        if cp is None:
+          continue
+        assert cp.update_strings(can_strings) == updated[key]
+        assert cp.vl == group_parsers[key].vl
+        assert cp.vl_all == group_parsers[key].vl_all
+        assert cp.can_valid == group_parsers[key].can_valid
+        assert cp.bus_timeout == group_parsers[key].bus_timeout
+
+      assert group.can_valid == all(cp.can_valid for cp in parsers.values() if cp is not None)
+      assert group.bus_timeout == any(cp.bus_timeout for cp in parsers.values() if cp is not None)
+
+  def test_threaded_parsers(self):
+    """Independent parsers and packers updated from a thread pool match running them one by one"""
+    dbc_file = "toyota_nodsu_pt_generated"
+    msgs = [("STEER_ANGLE_SENSOR", 0), ("WHEEL_SPEEDS", 0), ("PCM_CRUISE", 0)]
+
+    def run(seed):
+      packer = CANPacker(dbc_file)
+      parser = CANParser(dbc_file, msgs, 0)
+      rng = random.Random(seed)
+      ret = []
+      for i in range(200):
+        can_msgs = [packer.make_can_msg(name, 0, {"STEER_ANGLE": rng.randint(-500, 500)}) for name, _ in msgs]
+        parser.update_buffer(can_frames([i * 1000, can_msgs]))
+        ret.append((parser.vl["STEER_ANGLE_SENSOR"]["STEER_ANGLE"], parser.can_valid))
+      return ret
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+      threaded = list(executor.map(run, range(8)))
+    assert threaded == [run(seed) for seed in range(8)]
+
+  def test_decode_log(self):
+    """Columnar log decode matches frame by frame parsing and flags bad checksums"""
+    dbc_file = "honda_civic_touring_2016_can_generated"
+    packer, other_bus_packer = CANPacker(dbc_file), CANPacker(dbc_file)
+    parser = CANParser(dbc_file, [("STEERING_CONTROL", 0)], 0)
+
+    can_strings = []
+    for i in range(200):
+      msg = packer.make_can_msg("STEERING_CONTROL", 0, {"STEER_TORQUE": random.randrange(-256, 256)})
+      if i % 10 == 5:
+        dat = bytearray(msg[1])
+        dat[4] = (dat[4] & 0xF0) | ((dat[4] + 1) & 0x0F)
+        msg = (msg[0], bytes(dat), msg[2])
+      other = packer.make_can_msg("VSA_STATUS", 0, {"USER_BRAKE": i})
+      can_strings.append((i * 10_000_000, [msg, other, other_bus_packer.make_can_msg("STEERING_CONTROL", 1, {})]))
+
+    columns = decode_log(dbc_file, can_frames(can_strings), ["STEERING_CONTROL", 0x1A4])
+    steer = columns["STEERING_CONTROL"]
+    assert columns[228] is steer
+    assert steer["nanos"].tolist() == [s[0] for s in can_strings]
+    assert steer["checksum_valid"].tolist() == [i % 10 != 5 for i in range(200)]
+    assert steer["counter_valid"].all()
+    assert columns["VSA_STATUS"]["USER_BRAKE"].tolist() == list(range(200))
+
+    for i, s in enumerate(can_strings):
+      if parser.update_strings([s[0], s[1][:1]]):
+        for sig, val in parser.vl["STEERING_CONTROL"].items():
+          assert steer[sig][i] == val
+
+    with pytest.raises(RuntimeError):
+      decode_log(dbc_file, can_frames(can_strings), ["UNKNOWN_MESSAGE"])
+
+  def test_extended_addresses(self):
+    """Standard and 29-bit extended addresses share the message state index"""
+    dbc_file = "gm_global_a_lowspeed_1818125"
+    msgs = [("OTA_Electric_Pwr_Readiness_LS", 0), ("ODI_CenterStack_2_BCM_LS", 0),
+            ("Smart_High_Beam_Cust_LS", 0), ("CCP_Data_Transmission_Object_LS", 0)]
+    packer = CANPacker(dbc_file)
+    parser = CANParser(dbc_file, msgs, 0)
+
+    can_msgs = [packer.make_can_msg(name, 0, {}) for name, _ in msgs]
+    can_msgs[0] = packer.make_can_msg("OTA_Electric_Pwr_Readiness_LS", 0, {"RmtRflshElecPwrRdness": 1.0})
+    can_msgs.append(packer.make_can_msg("ODI_BCM_2_CenterStack_LS", 0, {}))
+
+    updated = parser.update_strings([0, can_msgs])
+    assert updated == {2152177664, 2159255552, 2152013824, 2034}
+    assert parser.vl["OTA_Electric_Pwr_Readiness_LS"]["RmtRflshElecPwrRdness"] == pytest.approx(1.0)
+    assert parser.vl[2152177664] is parser.vl["OTA_Electric_Pwr_Readiness_LS"]
+
+  def test_signal_views(self):
+    """vl, vl_all and ts_nanos are live read-only views, copies are dict snapshots"""
+    dbc_file = "honda_civic_touring_2016_can_generated"
+    parser = CANParser(dbc_file, [("VSA_STATUS", 50)], 0)
+    packer = CANPacker(dbc_file)
+
+    vl = parser.vl["VSA_STATUS"]
+    assert isinstance(vl, Mapping)
+    assert len(vl) == 8 and "USER_BRAKE" in vl and "UNKNOWN_SIGNAL" not in vl
+    assert vl.get("UNKNOWN_SIGNAL", -1) == -1
+    with pytest.raises(KeyError):
+      vl["UNKNOWN_SIGNAL"]
+
+    parser.update_strings([1000, [packer.make_can_msg("VSA_STATUS", 0, {"USER_BRAKE": 10})]])
+    snapshot = copy.copy(vl)
+    assert type(snapshot) is dict and snapshot == vl
+    assert dict(parser.ts_nanos["VSA_STATUS"]) == dict.fromkeys(vl, 1000)
+
+    parser.update_strings([2000, [packer.make_can_msg("VSA_STATUS", 0, {"USER_BRAKE": 20})]])
+    assert vl["USER_BRAKE"] == 20 and snapshot["USER_BRAKE"] == 10
+    assert parser.vl_all["VSA_STATUS"]["USER_BRAKE"] == [20]
+    assert copy.deepcopy(parser.vl_all["VSA_STATUS"])["USER_BRAKE"] == [20]
+
+  def test_history(self):
+    """history returns the last samples as read-only views, vl_all keeps every sample of an update"""
+    dbc_file = "honda_civic_touring_2016_can_generated"
+    parser = CANParser(dbc_file, [("VSA_STATUS", 50)], 0, history_size=4)
+    packer = CANPacker(dbc_file)
+
+    samples = parser.history("VSA_STATUS")
+    assert len(samples["nanos"]) == 0 and len(samples["USER_BRAKE"]) == 0
+
+    for i in range(1, 7):
+      parser.update_strings([i * 1000, [packer.make_can_msg("VSA_STATUS", 0, {"USER_BRAKE": i})]])
+      samples = parser.history("VSA_STATUS")
+      assert samples["nanos"].tolist() == [t * 1000 for t in range(max(i - 3, 1), i + 1)]
+      assert samples["USER_BRAKE"].tolist() == list(range(max(i - 3, 1), i + 1))
+      assert samples["USER_BRAKE"].dtype == np.float64
+      with pytest.raises(ValueError):
+        samples["USER_BRAKE"][0] = 0
+    assert parser.history("VSA_STATUS", n=2)["USER_BRAKE"].tolist() == [5, 6]
+    assert parser.history(0x1A4, n=100)["USER_BRAKE"].tolist() == [3, 4, 5, 6]
+
+    # more samples in one update than the history holds, vl_all has all of them and the history
+    # keeps its size
+    for _ in range(3):
+      parser.update_strings([[7000 + i, [packer.make_can_msg("VSA_STATUS", 0, {"USER_BRAKE": 10 + i})]] for i in range(6)])
+      assert parser.vl_all["VSA_STATUS"]["USER_BRAKE"] == list(range(10, 16))
+      assert parser.history("VSA_STATUS")["USER_BRAKE"].tolist() == list(range(12, 16))
+
+    with pytest.raises(ValueError):
+      CANParser(dbc_file, [("VSA_STATUS", 50)], 0, history_size=0)
+
   def test_scale_offset(self):
     """Test that both scale and offset are correctly preserved"""
     dbc_file = "honda_civic_touring_2016_can_generated"
@@ -349,6 +702,153 @@ class TestCanParserPacker:
       "CHECKSUM": 0,
     }
 
+  def test_signal_subscriptions(self):
+    dbc_file = "honda_civic_touring_2016_can_generated"
+    packer = CANPacker(dbc_file)
+    parser = CANParser(dbc_file, [("STEERING_CONTROL", 0, ["STEER_TORQUE"]), ("ACC_HUD", 0)])
+    full = CANParser(dbc_file, [("STEERING_CONTROL", 0)])
+
+    # COUNTER and CHECKSUM are always decoded for the checks
+    assert set(parser.vl["STEERING_CONTROL"]) == {"STEER_TORQUE", "COUNTER", "CHECKSUM"}
+    assert set(parser.vl["ACC_HUD"]) == set(CANParser(dbc_file, [("ACC_HUD", 0)]).vl["ACC_HUD"])
+
+    for i in range(10):
+      msg = packer.make_can_msg("STEERING_CONTROL", 0, {"STEER_TORQUE": i, "STEER_TORQUE_REQUEST": 1})
+      for p in (parser, full):
+        p.update_strings([i, [msg]])
+      for name, value in parser.vl["STEERING_CONTROL"].items():
+        assert value == full.vl["STEERING_CONTROL"][name]
+      assert list(parser.history("STEERING_CONTROL")) == ["nanos", "STEER_TORQUE", "COUNTER", "CHECKSUM"]
+
+    # a bad checksum still drops the frame
+    addr, dat, bus = packer.make_can_msg("STEERING_CONTROL", 0, {"STEER_TORQUE": 100})
+    parser.update_strings([10, [(addr, dat[:-1] + bytes([dat[-1] ^ 0x1]), bus)]])
+    assert parser.vl["STEERING_CONTROL"]["STEER_TORQUE"] == 9
+
+    with pytest.raises(RuntimeError):
+      CANParser(dbc_file, [("STEERING_CONTROL", 0, ["NOT_A_SIGNAL"])])
+
+  def test_track_changes(self):
+    dbc_file = "honda_civic_touring_2016_can_generated"
+    packer = CANPacker(dbc_file)
+    parser = CANParser(dbc_file, [("STEERING_CONTROL", 0), ("ACC_HUD", 0)], track_changes=True)
+    torque = ("STEERING_CONTROL", "STEER_TORQUE")
+
+    def update(*torques):
+      parser.update_strings([[i, [packer.make_can_msg("STEERING_CONTROL", 0, {"STEER_TORQUE": t})]] for i, t in enumerate(torques)])
+      return parser.changes()
+
+    assert torque in update(3)
+    changes = update(3)
+    assert torque not in changes and ("STEERING_CONTROL", "COUNTER") in changes
+    assert all(msg == "STEERING_CONTROL" for msg, _ in changes)
+
+    # a change within one update is reported even if the last sample matches the previous update
+    assert torque in update(5, 3)
+    parser.update_strings([0, []])
+    assert parser.changes() == set()
+
+    with pytest.raises(RuntimeError):
+      CANParser(dbc_file, [("STEERING_CONTROL", 0)]).changes()
+
+  def test_track_changes_first_sample(self):
+    # the first valid sample changes every signal, even those decoding to the initial 0
+    parser = CANParser(TEST_DBC, [("CAN_FD_MESSAGE", 0)], track_changes=True)
+    parser.update_strings([0, [(245, b"\x00" * 32, 0)]])
+    assert all(v == 0 for v in parser.vl["CAN_FD_MESSAGE"].values())
+    assert parser.changes() == {("CAN_FD_MESSAGE", sig) for sig in parser.vl["CAN_FD_MESSAGE"]}
+
+    parser.update_strings([1, [(245, b"\x01" + b"\x00" * 31, 0)]])
+    assert parser.changes() == {("CAN_FD_MESSAGE", "COUNTER")}
+
+  def test_memoized_decode(self):
+    dbc_file = "honda_civic_touring_2016_can_generated"
+    msgs = ["STEERING_CONTROL", "ACC_HUD", "SCM_BUTTONS"]
+    packer = CANPacker(dbc_file)
+    parser = CANParser(dbc_file, [(m, 0) for m in msgs])
+
+    # mostly repeated values, so only the COUNTER and CHECKSUM bytes change between frames
+    random.seed(0)
+    values = {m: {} for m in msgs}
+    for i in range(300):
+      name = random.choice(msgs)
+      if random.random() < 0.2:
+        values[name] = {"STEER_TORQUE": random.randint(-10, 10), "CRUISE_SPEED": random.randint(0, 200),
+                        "ACC_ON": random.randint(0, 1), "CRUISE_BUTTONS": random.randint(0, 7)}
+        values[name] = {k: v for k, v in values[name].items() if k in parser.vl[name]}
+      msg = packer.make_can_msg(name, 0, values[name])
+      parser.update_strings([i, [msg]])
+
+      # same values as decoding the frame on its own
+      reference = CANParser(dbc_file, [(name, 0)])
+      reference.update_strings([i, [msg]])
+      assert parser.vl[name] == reference.vl[name]
+
+    info = parser.memo_info()
+    assert info["hits"] > 150 and info["hits"] + info["misses"] == 300
+
+  def test_stats(self):
+    dbc_file = "honda_civic_touring_2016_can_generated"
+    packer = CANPacker(dbc_file)
+    parser = CANParser(dbc_file, [("STEERING_CONTROL", 100), ("ACC_HUD", 0)], track_stats=True)
+
+    # 100Hz with the frames alternately 0.3ms early and late, one dropped frame and one bad checksum
+    for i in range(200):
+      msg = packer.make_can_msg("STEERING_CONTROL", 0, {})
+      if i == 50:
+        continue
+      if i == 100:
+        msg = (msg[0], msg[1][:-1] + bytes([msg[1][-1] ^ 1]), msg[2])
+      parser.update_strings([int(i * 1e7 + (i % 2) * 3e5), [msg]])
+
+    stats = parser.stats()
+    assert set(stats) == {"STEERING_CONTROL", "ACC_HUD"}
+    steer = stats["STEERING_CONTROL"]
+    assert steer["frames"] == 199
+    assert steer["rate_hz"] == pytest.approx(100, rel=0.05)
+    assert steer["jitter_ms"]["p50"] == 0.512
+    assert steer["jitter_ms"]["p99"] >= steer["jitter_ms"]["p90"] >= steer["jitter_ms"]["p50"]
+    assert steer["counter_skips"] == 1
+    assert steer["checksum_failures"] == 1
+    assert stats["ACC_HUD"] == {"frames": 0, "rate_hz": 0.0, "jitter_ms": {"p50": 0.0, "p90": 0.0, "p99": 0.0},
+                                "counter_skips": 0, "checksum_failures": 0}
+
+    with pytest.raises(RuntimeError):
+      CANParser(dbc_file, [("STEERING_CONTROL", 0)]).stats()
+
+  def test_profile(self):
+    dbc_file = "honda_civic_touring_2016_can_generated"
+    packer = CANPacker(dbc_file)
+    parser = CANParser(dbc_file, [("STEERING_CONTROL", 0)])
+    address = 0xE4  # STEERING_CONTROL
+
+    try:
+      profile()
+      for i in range(3):
+        parser.update_strings([i, [packer.make_can_msg("STEERING_CONTROL", 0, {})]])
+    finally:
+      profile(False)
+    parser.update_strings([3, [packer.make_can_msg("STEERING_CONTROL", 0, {})]])
+
+    summary = profile_summary()
+    for name in ("CANParser.update_strings", "marshal_strings", "CANParser::update", "decode", "CANPacker::pack"):
+      assert summary[name]["count"] == 3, name
+    assert summary["honda_checksum"]["count"] == 6  # packed and parsed
+    assert set(summary["decode"]["by_address"]) == {address}
+    assert summary["CANParser::update"]["by_address"] == {}
+    assert summary["CANParser.update_strings"]["total_us"] >= summary["CANParser::update"]["total_us"]
+
+    trace = profile_trace()
+    assert len(trace["traceEvents"]) == 21 and trace["otherData"]["dropped_events"] == 0
+    decode = next(e for e in trace["traceEvents"] if e["name"] == "decode")
+    assert decode["ph"] == "X" and decode["args"] == {"address": address}
+    json.dumps(trace)
+
+    # turning it on again starts over
+    profile()
+    profile(False)
+    assert profile_summary() == {}
+
   def test_disallow_duplicate_messages(self):
     CANParser("toyota_nodsu_pt_generated", [("ACC_CONTROL", 5)])
 
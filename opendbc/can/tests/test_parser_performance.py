@@ -1,13 +1,13 @@
 import pytest
 import time
 
-from opendbc.can.parser import CANParser
+from opendbc.can.parser import CANParser, can_frames
 from opendbc.can.packer import CANPacker
 
 
 @pytest.mark.skip("TODO: varies too much between machines")
 class TestParser:
-  def _benchmark(self, checks, thresholds, n):
+  def _benchmark(self, checks, thresholds, n, buffer=False):
     parser = CANParser('toyota_new_mc_pt_generated', checks, 0)
     packer = CANPacker('toyota_new_mc_pt_generated')
 
@@ -23,10 +23,17 @@ class TestParser:
         strings = []
         for i in range(0, len(can_msgs), n):
           strings.append(can_msgs[i:i + n])
-        t1 = time.process_time_ns()
-        for m in strings:
-          parser.update_strings(m)
-        t2 = time.process_time_ns()
+        if buffer:
+          strings = [can_frames(m) for m in strings]
+          t1 = time.process_time_ns()
+          for m in strings:
+            parser.update_buffer(m)
+          t2 = time.process_time_ns()
+        else:
+          t1 = time.process_time_ns()
+          for m in strings:
+            parser.update_strings(m)
+          t2 = time.process_time_ns()
       else:
         t1 = time.process_time_ns()
         for m in can_msgs:
@@ -37,7 +44,7 @@ class TestParser:
 
     et = sum(ets) / len(ets)
     avg_nanos = et / len(can_msgs)
-    print('%s: [%d] %.1fms to parse %s, avg: %dns' % (self._testMethodName, n, et/1e6, len(can_msgs), avg_nanos))
+    print('%s: [%d%s] %.1fms to parse %s, avg: %dns' % (self._testMethodName, n, ' buffer' if buffer else '', et/1e6, len(can_msgs), avg_nanos))
 
     minn, maxx = thresholds
     assert avg_nanos < maxx
@@ -46,3 +53,7 @@ class TestParser:
   def test_performance_all_signals(self):
     self._benchmark([('ACC_CONTROL', 10)], (10000, 19000), 1)
     self._benchmark([('ACC_CONTROL', 10)], (1300, 5000), 10)
+
+  def test_performance_buffer(self):
+    self._benchmark([('ACC_CONTROL', 10)], (100, 1000), 10, buffer=True)
+    self._benchmark([('ACC_CONTROL', 10)], (50, 600), 1000, buffer=True)
@@ -17,7 +17,8 @@ from opendbc.car.common.conversions import Conversions as CV
 from opendbc.car.common.simple_kalman import KF1D, get_kalman_gain
 from opendbc.car.common.numpy_fast import clip
 from opendbc.car.values import PLATFORMS
-from opendbc.can.parser import CANParser
+from opendbc.can import preload
+from opendbc.can.parser import CANParser, CANParserGroup
 
 GearShifter = structs.CarState.GearShifter
 
@@ -92,8 +93,12 @@ class CarInterfaceBase(ABC):
     self.frame = 0
     self.v_ego_cluster_seen = False
 
+    # parse the platform's DBCs concurrently before the parsers and packers need them
+    preload(PLATFORMS[CP.carFingerprint].config.dbc_dict)
+
     self.CS: CarStateBase = CarState(CP)
     self.can_parsers: dict[StrEnum, CANParser] = self.CS.get_can_parsers(CP)
+    self.can_parser_group = CANParserGroup(self.can_parsers)
 
     dbc_names = {bus: cp.dbc_name for bus, cp in self.can_parsers.items()}
     self.CC: CarControllerBase = CarController(dbc_names, CP)
@@ -220,16 +225,14 @@ class CarInterfaceBase(ABC):
     return self.CS.update(self.can_parsers)
 
   def update(self, can_packets: list[tuple[int, list[CanData]]]) -> structs.CarState:
-    # parse can
-    for cp in self.can_parsers.values():
-      if cp is not None:
-        cp.update_strings(can_packets)
+    # parse can, every bus in one pass
+    self.can_parser_group.update_strings(can_packets)
 
     # get CarState
     ret = self._update()
 
-    ret.canValid = all(cp.can_valid for cp in self.can_parsers.values())
-    ret.canTimeout = any(cp.bus_timeout for cp in self.can_parsers.values())
+    ret.canValid = self.can_parser_group.can_valid
+    ret.canTimeout = self.can_parser_group.bus_timeout
 
     if ret.vEgoCluster == 0.0 and not self.v_ego_cluster_seen:
       ret.vEgoCluster = ret.vEgo
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Packing cost of each brand's controller output per 100 Hz tick, one make_can_msg call per message
+against a single make_can_msgs call per packer.
+"""
+import time
+from collections import defaultdict
+
+from opendbc.can.packer import CANPacker
+from opendbc.car import DT_CTRL, gen_empty_fingerprint, structs
+from opendbc.car.car_helpers import interface_names, interfaces
+
+TICKS = 1000
+RUNS = 5
+
+
+class RecordingPacker:
+  """Stands in for a controller's CANPacker and records every message of the current tick"""
+  def __init__(self, packer: CANPacker, tick: dict):
+    self.packer = packer
+    self.tick = tick
+
+  def make_can_msg(self, name_or_addr, bus, values):
+    self.tick.setdefault(self.packer, []).append((name_or_addr, bus, dict(values)))
+    return self.packer.make_can_msg(name_or_addr, bus, values)
+
+
+def record_ticks(car_name: str) -> list[dict[CANPacker, list]]:
+  CarInterface, CarController, CarState, _ = interfaces[car_name]
+  CP = CarInterface.get_params(car_name, gen_empty_fingerprint(), [], experimental_long=True, docs=False)
+  CI = CarInterface(CP, CarController, CarState)
+
+  tick: dict[CANPacker, list] = {}
+  for name, value in vars(CI.CC).items():
+    if isinstance(value, CANPacker):
+      setattr(CI.CC, name, RecordingPacker(value, tick))
+
+  CC = structs.CarControl()
+  CC.enabled = CC.latActive = CC.longActive = True
+  CC = CC.as_reader()
+
+  ticks = []
+  now_nanos = 0
+  for _ in range(TICKS):
+    tick.clear()
+    CI.update([])
+    CI.apply(CC, now_nanos)
+    ticks.append(dict(tick))
+    now_nanos += int(DT_CTRL * 1e9)
+  return ticks
+
+
+def time_us_per_tick(ticks, pack_tick) -> float:
+  best = float('inf')
+  for _ in range(RUNS):
+    t = time.perf_counter()
+    for tick in ticks:
+      pack_tick(tick)
+    best = min(best, time.perf_counter() - t)
+  return best / len(ticks) * 1e6
+
+
+def pack_each(tick):
+  for packer, msgs in tick.items():
+    for msg in msgs:
+      packer.make_can_msg(*msg)
+
+
+def pack_batch(tick):
+  for packer, msgs in tick.items():
+    packer.make_can_msgs(msgs)
+
+
+if __name__ == "__main__":
+  print(f"{'brand':<12} {'platform':<40} {'msgs/tick':>9} {'each us':>9} {'batch us':>9}")
+  totals: dict[str, float] = defaultdict(float)
+  for brand, models in sorted(interface_names.items()):
+    if not models:
+      continue
+    ticks = record_ticks(models[0])
+    msgs = sum(len(m) for tick in ticks for m in tick.values()) / len(ticks)
+    if msgs == 0:
+      continue
+
+    each, batch = time_us_per_tick(ticks, pack_each), time_us_per_tick(ticks, pack_batch)
+    totals['each'] += each
+    totals['batch'] += batch
+    print(f"{brand:<12} {models[0]:<40} {msgs:9.1f} {each:9.1f} {batch:9.1f}")
+  print(f"{'all':<12} {'':<40} {'':>9} {totals['each']:9.1f} {totals['batch']:9.1f}")
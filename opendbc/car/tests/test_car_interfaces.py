@@ -6,11 +6,13 @@ from parameterized import parameterized
 from collections.abc import Callable
 from typing import Any
 
-from opendbc.car import DT_CTRL, CanData, gen_empty_fingerprint, structs
+from opendbc.can.packer import CANPacker
+from opendbc.can.parser import CANParser
+from opendbc.car import DT_CTRL, Bus, CanData, gen_empty_fingerprint, structs
 from opendbc.car.car_helpers import interfaces
 from opendbc.car.fingerprints import all_known_cars
 from opendbc.car.fw_versions import FW_VERSIONS, FW_QUERY_CONFIGS
-from opendbc.car.interfaces import get_interface_attr
+from opendbc.car.interfaces import CarControllerBase, CarStateBase, get_interface_attr
 from opendbc.car.mock.values import CAR as MOCK
 
 DrawType = Callable[[st.SearchStrategy], Any]
@@ -119,6 +121,55 @@ class TestCarInterfaces:
       rr = radar_interface.update(cans)
       assert rr is None or len(rr.errors) > 0
 
+  def test_can_parser_group(self):
+    """CarInterfaceBase.update parses every bus through one CANParserGroup, same as updating each parser"""
+    dbc = "honda_civic_touring_2016_can_generated"
+
+    class CarState(CarStateBase):
+      def update(self, can_parsers) -> structs.CarState:
+        ret = structs.CarState()
+        ret.steeringTorque = can_parsers[Bus.pt].vl["STEERING_CONTROL"]["STEER_TORQUE"]
+        ret.cruiseState.speed = can_parsers[Bus.cam].vl["ACC_HUD"]["CRUISE_SPEED"]
+        return ret
+
+      @staticmethod
+      def get_can_parsers(CP):
+        return {
+          Bus.pt: CANParser(dbc, [("STEERING_CONTROL", 100)], 0),
+          Bus.cam: CANParser(dbc, [("ACC_HUD", 10)], 2),
+          Bus.radar: None,
+        }
+
+    class CarController(CarControllerBase):
+      def update(self, CC, CS, now_nanos):
+        return CC.actuators, []
+
+    CarInterface = interfaces[MOCK.MOCK][0]
+    car_params = CarInterface.get_params(MOCK.MOCK, gen_empty_fingerprint(), [], experimental_long=False, docs=False)
+    car_interface = CarInterface(car_params, CarController, CarState)
+    parsers = [cp for cp in CarState.get_can_parsers(car_params).values() if cp is not None]
+
+    # the camera stops sending halfway through, frames on other buses are ignored
+    packer = CANPacker(dbc)
+    states = set()
+    for i in range(300):
+      frames = [CanData(*packer.make_can_msg("STEERING_CONTROL", 0, {"STEER_TORQUE": i % 100})), CanData(0xE4, b"\x00" * 5, 1)]
+      if i < 150 and i % 10 == 0:
+        frames.append(CanData(*packer.make_can_msg("ACC_HUD", 2, {"CRUISE_SPEED": i // 10})))
+      can_packets = [(int(i * DT_CTRL * 1e9), frames)]
+
+      for cp in parsers:
+        cp.update_strings(can_packets)
+      ret = car_interface.update(can_packets)
+
+      assert ret.steeringTorque == parsers[0].vl["STEERING_CONTROL"]["STEER_TORQUE"] == i % 100
+      assert ret.cruiseState.speed == parsers[1].vl["ACC_HUD"]["CRUISE_SPEED"]
+      assert ret.canValid == all(cp.can_valid for cp in parsers)
+      assert ret.canTimeout == any(cp.bus_timeout for cp in parsers)
+      states.add((ret.canValid, ret.canTimeout))
+
+    assert (True, False) in states and (False, True) in states
+
   def test_interface_attrs(self):
     """Asserts basic behavior of interface attribute getter"""
     num_brands = len(get_interface_attr('CAR'))
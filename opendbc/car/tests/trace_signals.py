@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Derives the minimal CANParser signal subscriptions of each brand by tracing which signals
+CarState.update reads from its parsers' vl, vl_all and ts_nanos, over every platform of the brand.
+The output can be pasted into get_can_parsers as (message, frequency, signals) entries.
+
+Only reads on the code paths taken with all-zero signal values are seen, review the result
+against the branches in CarState.update before using it.
+"""
+import argparse
+import copy
+from collections import defaultdict
+from collections.abc import Mapping
+
+from opendbc.car import gen_empty_fingerprint
+from opendbc.car.car_helpers import interface_names, interfaces
+
+TICKS = 10
+
+
+class TracingValues(Mapping):
+  """Stands in for one message's view in vl, vl_all or ts_nanos and records the signals read"""
+  def __init__(self, view, reads: set[str]):
+    self.view = view
+    self.reads = reads
+
+  def __getitem__(self, name):
+    value = self.view[name]
+    self.reads.add(name)
+    return value
+
+  def __contains__(self, name):
+    return name in self.view
+
+  def __iter__(self):
+    return iter(self.view)
+
+  def __len__(self):
+    return len(self.view)
+
+  def __copy__(self):
+    # copies are usually forwarded to the car, every signal is needed
+    self.reads.update(self.view)
+    return copy.copy(self.view)
+
+
+def trace_platform(car_name: str, reads: dict, signals: dict) -> None:
+  CarInterface, CarController, CarState, _ = interfaces[car_name]
+  CP = CarInterface.get_params(car_name, gen_empty_fingerprint(), [], experimental_long=True, docs=False)
+  CI = CarInterface(CP, CarController, CarState)
+
+  for bus, cp in CI.can_parsers.items():
+    for views in (cp.vl, cp.vl_all, cp.ts_nanos):
+      # each message is keyed by both name and address
+      names = {id(view): key for key, view in views.items() if isinstance(key, str)}
+      for key, view in views.items():
+        msg = (bus.name, cp.dbc_name, names[id(view)])
+        signals[msg] = set(view)
+        views[key] = TracingValues(view, reads[msg])
+
+  for _ in range(TICKS):
+    CI.update([])
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("brands", nargs="*", help="brands to trace, all by default")
+  args = parser.parse_args()
+
+  for brand, models in sorted(interface_names.items()):
+    if not models or (args.brands and brand not in args.brands):
+      continue
+
+    reads: dict[tuple, set[str]] = defaultdict(set)
+    signals: dict[tuple, set[str]] = {}
+    for car_name in models:
+      trace_platform(car_name, reads, signals)
+
+    total = sum(len(s) for s in signals.values())
+    read = sum(len(reads[msg]) for msg in signals)
+    print(f"# {brand}: {read} of {total} signals read, over {len(models)} platforms")
+    for bus, dbc_name, msg in sorted(signals):
+      used = sorted(reads[(bus, dbc_name, msg)])
+      print(f"  {bus:<8} {dbc_name:<48} {msg!r}: {used!r},{'  # not read' if not used else ''}")
+    print()
+
+
+if __name__ == "__main__":
+  main()